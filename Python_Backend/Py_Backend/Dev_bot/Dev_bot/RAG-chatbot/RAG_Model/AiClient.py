@@ -3,22 +3,74 @@ import sys
 import os
 from dotenv import load_dotenv
 load_dotenv()
-from sentence_transformers import SentenceTransformer
+
+from RAG_Model.lazy import LazyComponent
 
 OPENROUTER_API_KEY=os.getenv("OPENROUTER_API_KEY")
 
 if not OPENROUTER_API_KEY :
-    print("Error: OPENROUTER_KEY environment variable is not set", file=sys.stderr)
-    sys.exit(1)
+    print("Warning: OPENROUTER_API_KEY environment variable is not set", file=sys.stderr)
 
 from openai import OpenAI as ORClient
-OR_client = ORClient(
-    api_key=OPENROUTER_API_KEY,
-    base_url="https://openrouter.ai/api/v1"
-)
 
-bge = SentenceTransformer("BAAI/bge-small-en-v1.5")
+EMBED_MODEL_REPO = "BAAI/bge-small-en-v1.5"
+# torch (SentenceTransformer), onnx, or onnx-int8 (see logic/onnx_embedder.py)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+# Identity of the vector space, used in embedding / query cache keys: int8
+# vectors differ slightly from the float model's, so they're cached apart.
+EMBED_MODEL_NAME = EMBED_MODEL_REPO + ("#int8" if EMBED_BACKEND == "onnx-int8" else "")
+
+# OpenAI-compatible endpoint and the models to try, in order (the first is
+# the primary; the rest are fallbacks used by the async gateway).
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MODELS = [m.strip() for m in os.getenv("LLM_MODELS", "tngtech/deepseek-r1t2-chimera:free").split(",") if m.strip()]
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+
+# Both clients are created on first use (or by the startup warmup) instead of
+# at import, so importing this module is cheap and never blocks a reload.
+def _load_llm_client():
+    if not OPENROUTER_API_KEY:
+        raise RuntimeError("OPENROUTER_API_KEY environment variable is not set")
+    return ORClient(
+        api_key=OPENROUTER_API_KEY,
+        base_url=LLM_BASE_URL,
+        timeout=LLM_TIMEOUT_S
+    )
+
+def _load_llm_gateway():
+    from RAG_Model.llm_gateway import LLMGateway
+    if not OPENROUTER_API_KEY:
+        raise RuntimeError("OPENROUTER_API_KEY environment variable is not set")
+    return LLMGateway(
+        api_key=OPENROUTER_API_KEY,
+        base_url=LLM_BASE_URL,
+        models=LLM_MODELS,
+        timeout=LLM_TIMEOUT_S
+    )
+
+def load_embedder(backend: str = EMBED_BACKEND, threads: int = 0):
+    """
+    A fresh embedding model for `backend`; `threads` > 0 caps its intra-op
+    threads (used by the bulk-embedding worker processes).
+    """
+    if backend in ("onnx", "onnx-int8"):
+        from RAG_Model.logic.onnx_embedder import load_onnx_embedder
+        kwargs = {"threads": threads} if threads else {}
+        return load_onnx_embedder(EMBED_MODEL_REPO, quantized=backend == "onnx-int8", **kwargs)
+    if backend != "torch":
+        raise RuntimeError(f"Unknown EMBED_BACKEND {backend!r} (torch, onnx, onnx-int8)")
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBED_MODEL_REPO)
+
+def _load_embedder():
+    return load_embedder(EMBED_BACKEND)
 
+OR_client = LazyComponent("llm_client", _load_llm_client)
 
+# Async, pooled client used by the /query handlers (see llm_gateway.py).
+llm_gateway = LazyComponent("llm_gateway", _load_llm_gateway)
 
- 
+bge = LazyComponent("embedder", _load_embedder)
@@ -0,0 +1,180 @@
+import os
+import time
+import random
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from pymilvus import MilvusException
+except ImportError:  # VECTOR_BACKEND=embedded doesn't need pymilvus
+    MilvusException = None
+
+logger = logging.getLogger(__name__)
+
+# --- Columnar, byte-size-aware Milvus insert engine ---
+# Must stay below the grpc.max_send_message_length set in connectMilvus.py.
+MILVUS_MAX_MESSAGE_BYTES = 100 * 1024 * 1024
+INSERT_TARGET_BYTES = int(os.getenv("MILVUS_INSERT_BATCH_BYTES", str(16 * 1024 * 1024)))
+INSERT_MAX_IN_FLIGHT = int(os.getenv("MILVUS_INSERT_IN_FLIGHT", "4"))
+INSERT_MAX_RETRIES = int(os.getenv("MILVUS_INSERT_RETRIES", "4"))
+INSERT_BACKOFF_S = 0.5
+# Per-row protobuf framing / scalar fields not covered by the estimate below.
+ROW_OVERHEAD_BYTES = 64
+# Failures worth a retry from either backend: Milvus RPC errors, or the
+# embedded store's SQLite index staying locked past its busy timeout.
+RETRYABLE_ERRORS = tuple(e for e in (MilvusException, sqlite3.OperationalError) if e is not None)
+
+
+def estimate_row_bytes(
+    ids: Sequence[str],
+    texts: Sequence[str],
+    doc_names: Sequence[str],
+    doc_ids: Sequence[str],
+    dim: int
+) -> np.ndarray:
+    """Approximate serialized size of every row (vector + UTF-8 strings + int64s)."""
+    fixed = dim * 4 + 2 * 8 + ROW_OVERHEAD_BYTES
+    return np.fromiter(
+        (
+            fixed + len(i) + len(t.encode("utf-8")) + len(n.encode("utf-8")) + len(d)
+            for i, t, n, d in zip(ids, texts, doc_names, doc_ids)
+        ),
+        dtype=np.int64,
+        count=len(ids)
+    )
+
+
+def plan_batches(row_bytes: np.ndarray, target_bytes: int = INSERT_TARGET_BYTES) -> List[Tuple[int, int]]:
+    """
+    Greedy [start, end) row ranges whose estimated size stays under
+    `target_bytes` (a single oversized row still gets its own batch).
+    """
+    target_bytes = min(target_bytes, MILVUS_MAX_MESSAGE_BYTES)
+    batches: List[Tuple[int, int]] = []
+    start, acc = 0, 0
+    for i, b in enumerate(row_bytes.tolist()):
+        if acc and acc + b > target_bytes:
+            batches.append((start, i))
+            start, acc = i, 0
+        acc += b
+    if start < len(row_bytes):
+        batches.append((start, len(row_bytes)))
+    return batches
+
+
+def _insert_with_retry(collection, data: List[Any], label: str, max_retries: int) -> int:
+    # A failed insert (e.g. a timeout) may still have been applied server-side.
+    # Retries upsert instead: ids are deterministic, so a batch that did land
+    # is overwritten rather than written twice.
+    attempt = 0
+    while True:
+        try:
+            if attempt:
+                collection.upsert(data)
+            else:
+                collection.insert(data)
+            return attempt
+        except RETRYABLE_ERRORS as e:
+            attempt += 1
+            if attempt > max_retries:
+                logger.error("Batch %s failed after %d attempts: %s", label, attempt, e)
+                raise
+            delay = INSERT_BACKOFF_S * (2 ** (attempt - 1)) * (0.5 + random.random())
+            logger.warning("Batch %s failed (%s); retry %d/%d in %.2f s", label, e, attempt, max_retries, delay)
+            time.sleep(delay)
+
+
+def insert_columnar(
+    collection,
+    ids: Sequence[str],
+    embeddings: np.ndarray,
+    texts: Sequence[str],
+    doc_names: Sequence[str],
+    doc_ids: Sequence[str],
+    chunk_indices: Sequence[int],
+    pages: Sequence[int],
+    target_bytes: int = INSERT_TARGET_BYTES,
+    max_in_flight: int = INSERT_MAX_IN_FLIGHT,
+    max_retries: int = INSERT_MAX_RETRIES,
+    job=None,
+    flush: bool = True
+) -> Dict[str, Any]:
+    """
+    Inserts column arrays into `collection` (schema order: id, embedding,
+    text, doc_name, doc_id, chunk_index, page).
+
+    Embeddings stay one contiguous float32 array; each batch passes row views
+    of it.  Batches are cut by estimated byte size, up to `max_in_flight` run
+    concurrently, and failed batches are retried (as upserts) with jittered
+    backoff.
+
+    :return: stats dict (rows, batches, bytes, seconds, rows_per_s, retries).
+    """
+    n = len(ids)
+    if not n:
+        return {"rows": 0, "batches": 0, "bytes": 0, "seconds": 0.0, "rows_per_s": 0.0, "retries": 0}
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if embeddings.shape[0] != n:
+        raise ValueError(f"Number of ids ({n}) and embeddings ({embeddings.shape[0]}) must match")
+
+    row_bytes = estimate_row_bytes(ids, texts, doc_names, doc_ids, embeddings.shape[1])
+    batches = plan_batches(row_bytes, target_bytes)
+    logger.info(
+        "Inserting %d rows (~%.1f MB) in %d batches, %d in flight",
+        n, row_bytes.sum() / 1e6, len(batches), max_in_flight
+    )
+
+    def columns(start: int, end: int) -> List[Any]:
+        return [
+            list(ids[start:end]),
+            list(embeddings[start:end]),
+            list(texts[start:end]),
+            list(doc_names[start:end]),
+            list(doc_ids[start:end]),
+            [int(x) for x in chunk_indices[start:end]],
+            [int(x) for x in pages[start:end]],
+        ]
+
+    t0 = time.time()
+    retries = 0
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="milvus-insert") as pool:
+        try:
+            for start, end in batches:
+                if job is not None:
+                    job.check_cancelled()
+                while len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        rows = pending.pop(fut)
+                        retries += fut.result()
+                        if job is not None:
+                            job.advance("insert", rows)
+                fut = pool.submit(_insert_with_retry, collection, columns(start, end), f"{start}–{end - 1}", max_retries)
+                pending[fut] = end - start
+            for fut in list(pending):
+                rows = pending.pop(fut)
+                retries += fut.result()
+                if job is not None:
+                    job.advance("insert", rows)
+        finally:
+            # Let in-flight batches settle before the caller rolls back or reports.
+            wait(pending)
+
+    if flush:
+        collection.flush()
+    elapsed = time.time() - t0
+    stats = {
+        "rows": n,
+        "batches": len(batches),
+        "bytes": int(row_bytes.sum()),
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(n / elapsed, 1) if elapsed else float(n),
+        "retries": retries,
+    }
+    logger.info("Inserted %d rows in %.2f s (%.1f rows/s, %d retries)", n, elapsed, stats["rows_per_s"], retries)
+    return stats
@@ -1,3 +1,4 @@
+import os
 import numpy as np
 from pymilvus import (
     connections, FieldSchema, CollectionSchema,
@@ -5,69 +6,130 @@ from pymilvus import (
 )
 from pymilvus import utility
 
-try:
-    connections.connect(
-        alias="default",
-        host="milvus.upvoteconsulting.com",  # Your subdomain
-        port=9007,
-        secure=False,
-        channel_options=[
-        # -1 means “unlimited”, or you can pick a byte-size like 100*1024*1024
-          ("grpc.max_send_message_length", 100 * 1024 * 1024),
-         ("grpc.max_receive_message_length", 100 * 1024 * 1024),
-        ]
-    )
-    """
-    Connect to remote Milvus instance and get or create the collection for document embeddings.
-    Returns the collection or raises the original error with traceback.
-    """
-   
-    print(f"✅ Connected to Milvus ")
+from RAG_Model.lazy import LazyComponent
+from RAG_Model.VectorDb.index_profiles import get_index_profile
+from RAG_Model.VectorDb.vector_store import COLLECTION_NAME
+
+MILVUS_HOST = "milvus.upvoteconsulting.com"  # Your subdomain
+MILVUS_PORT = 9007
 
-    # utility.drop_collection("rag_chunks")
-    # print("ℹ️ Dropped existing collection 'rag_chunks' if it existed.")
+# --- Collection layout ---
+# doc_id is the partition key: Milvus hashes each doc_id into one of
+# MILVUS_NUM_PARTITIONS partitions, so `doc_id in [...]` searches and
+# `doc_id == "..."` deletes only touch the partitions those ids live in.  The
+# scalar index on doc_id then avoids scanning the rest of those partitions.
+MILVUS_PARTITION_KEY = os.getenv("MILVUS_PARTITION_KEY", "1") == "1"
+MILVUS_NUM_PARTITIONS = int(os.getenv("MILVUS_NUM_PARTITIONS", "64"))
+# INVERTED needs Milvus >= 2.4; use Trie on 2.3.
+MILVUS_SCALAR_INDEX = os.getenv("MILVUS_SCALAR_INDEX", "INVERTED")
+# Memory-map collection data instead of loading it all into RAM (Milvus >= 2.4).
+MILVUS_MMAP = os.getenv("MILVUS_MMAP", "0") == "1"
 
 
-        # 2. Define schema
+def build_schema(partition_key: bool = MILVUS_PARTITION_KEY, dim: int = 384) -> CollectionSchema:
     fields = [
           FieldSchema(name="id", dtype=DataType.VARCHAR, is_primary=True, auto_id=False, max_length=36),
-          FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=384),  # Adjust dim if needed
+          FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dim),  # Adjust dim if needed
           FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
           FieldSchema(name="doc_name", dtype=DataType.VARCHAR,max_length=255),
-          FieldSchema(name="doc_id", dtype=DataType.VARCHAR, max_length=64),  # Important: searchable filter
+          FieldSchema(name="doc_id", dtype=DataType.VARCHAR, max_length=64, is_partition_key=partition_key),  # Important: searchable filter
           FieldSchema(name="chunk_index", dtype=DataType.INT64, is_primary=False),
           FieldSchema(name="page", dtype=DataType.INT64, is_primary=False),
          ]
 
          # Create the collection schema
-    schema = CollectionSchema(
+    return CollectionSchema(
           fields=fields,
           description="Chunks of documents for RAG retrieval"
        )
 
-        # Create the collection
-    collection = Collection(
-           name="rag_chunks1",
-           schema=schema
-        )
-    
-    if not collection.has_index():
-            index_params = {
-                "index_type": "IVF_FLAT",
-                "metric_type": "COSINE",
-                "params": {"M": 16, "efConstruction": 200}
-            }
-            collection.create_index(field_name="embedding", index_params=index_params)
-            print("✅ Created index on 'embedding'")
+
+def has_partition_key(collection) -> bool:
+    return any(getattr(f, "is_partition_key", False) for f in collection.schema.fields)
+
+
+def ensure_indexes(collection, name: str):
+    """Vector index from the collection's index profile + scalar index on doc_id."""
+    indexed = {idx.field_name: idx for idx in collection.indexes}
+    profile = get_index_profile(name)
+    if "embedding" not in indexed:
+            collection.create_index(field_name="embedding", index_params=profile.index_params(), index_name="embedding_idx")
+            print(f"✅ Created {profile.index_type} index on 'embedding'")
     else:
-            print("ℹ️ Index on 'embedding' already exists.")
+            built = indexed["embedding"].params.get("index_type")
+            print(f"ℹ️ Index on 'embedding' already exists ({built}).")
+            if built and built != profile.index_type:
+                print(f"⚠️ Index profile '{profile.name}' expects {profile.index_type}; "
+                      f"run benchmarks/bench_ann_profiles.py or rebuild the index to switch.")
+
+    if "doc_id" not in indexed and MILVUS_SCALAR_INDEX:
+        try:
+            collection.create_index(field_name="doc_id", index_params={"index_type": MILVUS_SCALAR_INDEX}, index_name="doc_id_idx")
+            print(f"✅ Created {MILVUS_SCALAR_INDEX} index on 'doc_id'")
+        except Exception as e:
+            # Older servers / loaded collections; filtering still works, just unindexed.
+            print(f"⚠️ Could not create scalar index on 'doc_id': {e}")
+
+
+def connect_collection(name=COLLECTION_NAME):
+    """
+    Connect to remote Milvus instance and get or create the collection for document embeddings.
+    Returns the collection or raises the original error with traceback.
+    """
+    try:
+        connections.connect(
+            alias="default",
+            host=MILVUS_HOST,
+            port=MILVUS_PORT,
+            secure=False,
+            channel_options=[
+            # -1 means “unlimited”, or you can pick a byte-size like 100*1024*1024
+              ("grpc.max_send_message_length", 100 * 1024 * 1024),
+             ("grpc.max_receive_message_length", 100 * 1024 * 1024),
+            ]
+        )
+
+        print(f"✅ Connected to Milvus ")
+
+        # utility.drop_collection("rag_chunks")
+        # print("ℹ️ Dropped existing collection 'rag_chunks' if it existed.")
+
+
+        # 2. Get the collection, creating it with the current layout if missing
+        if utility.has_collection(name):
+            collection = Collection(name=name)
+            if not has_partition_key(collection):
+                print(f"⚠️ Collection '{name}' predates the doc_id partition-key layout; "
+                      f"run `python -m RAG_Model.VectorDb.migrate_partitions` to migrate it.")
+        else:
+            collection = Collection(
+                   name=name,
+                   schema=build_schema(),
+                   **({"num_partitions": MILVUS_NUM_PARTITIONS} if MILVUS_PARTITION_KEY else {})
+                )
+            print(f"✅ Created collection '{name}'")
+
+        ensure_indexes(collection, name)
+
+        if MILVUS_MMAP:
+            # Raw vectors / index served from memory-mapped files; with an
+            # IVF_SQ8 profile only the int8 index stays hot and the float
+            # vectors are read back just for re-ranking.
+            try:
+                collection.set_properties({"mmap.enabled": True})
+            except Exception as e:
+                print(f"⚠️ Could not enable mmap on '{name}': {e}")
+
+        collection.load()
+        print(f"✅ Collection '{name}' is ready for use.")
+        return collection
 
-    collection.load()
-    print("✅ Collection 'rag_chunks1' is ready for use.")
-    
-except Exception as e:  
-    print("\n❌ Milvus Connection or Collection Setup Failed!")
-    print(f"🔍 Error Message: {str(e)}")
-    raise  # Re-raise to propagate the error if needed
+    except Exception as e:
+        print("\n❌ Milvus Connection or Collection Setup Failed!")
+        print(f"🔍 Error Message: {str(e)}")
+        raise  # Re-raise to propagate the error if needed
 
 
+# Connected on first use (or by the startup warmup) instead of at import, so a
+# Milvus outage no longer prevents the API process from starting.
+collection = LazyComponent("vector_store", connect_collection)
@@ -0,0 +1,600 @@
+import os
+import re
+import json
+import logging
+import sqlite3
+import threading
+import math
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction assumes a single process per store
+    fcntl = None
+
+from RAG_Model.VectorDb.vector_store import SCHEMA_FIELDS, VectorStore
+from RAG_Model.VectorDb.quantization import VECTOR_QUANTIZATION, QUANT_OVERFETCH, approximate_top, get_quantizer
+
+logger = logging.getLogger(__name__)
+
+# --- Embedded, in-process vector store ---
+# Vectors live in a memory-mapped float32 file (one row per chunk, grown by
+# doubling); chunk metadata lives in SQLite next to it.  Search is exact
+# brute force over the (doc_id-filtered) rows, switching to an in-memory IVF
+# index (built in a background thread) once the rows to search are numerous
+# enough for that to pay off.  Deleted rows are reclaimed by compaction.  With
+# VECTOR_QUANTIZATION set, a compact code file is scored first and only the
+# over-fetched candidates are read back from the float file for re-ranking.
+# Rows are allocated in SQLite transactions, so several processes (uvicorn
+# workers, the lexical-index rebuild CLI) can share one store directory.
+EMBEDDED_STORE_DIR = os.getenv(
+    "EMBEDDED_STORE_DIR",
+    str(Path(__file__).resolve().parent.parent / "cache" / "vector_store")
+)
+# Below this many live rows brute force is as fast as IVF and exact.
+EMBEDDED_IVF_MIN_ROWS = int(os.getenv("EMBEDDED_IVF_MIN_ROWS", "50000"))
+# Rebuild the IVF index once this fraction of rows was added after the build.
+EMBEDDED_IVF_REBUILD_FRACTION = 0.2
+EMBEDDED_IVF_DEFAULT_NPROBE = 16
+# flush() compacts the store once this fraction of allocated rows is deleted.
+EMBEDDED_COMPACT_FRACTION = float(os.getenv("EMBEDDED_COMPACT_FRACTION", "0.25"))
+EMBEDDED_COMPACT_MIN_ROWS = 1024
+KMEANS_ITERS = 10
+KMEANS_SAMPLE = 20000
+
+_META_FIELDS = ["id", "text", "doc_name", "doc_id", "chunk_index", "page"]
+_EXPR = re.compile(r'^\s*(\w+)\s*(==|in)\s*(.+?)\s*$', re.DOTALL)
+
+
+def parse_expr(expr: Optional[str]) -> Optional[Tuple[str, List[Any]]]:
+    """
+    Parses the filter expressions this codebase issues:
+    `field == "x"` and `field in ["x", "y"]`.  Returns (field, values) or None.
+    """
+    if not expr or not expr.strip():
+        return None
+    m = _EXPR.match(expr)
+    if not m:
+        raise ValueError(f"Unsupported filter expression: {expr!r}")
+    field, op, raw = m.groups()
+    value = json.loads(raw)
+    values = value if op == "in" else [value]
+    if not isinstance(values, list):
+        raise ValueError(f"Unsupported filter expression: {expr!r}")
+    return field, values
+
+
+class _Entity:
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def get(self, name: str, default=None):
+        return self.fields.get(name, default)
+
+
+class Hit:
+    __slots__ = ("id", "distance", "entity")
+
+    def __init__(self, id: str, distance: float, fields: Dict[str, Any]):
+        self.id = id
+        self.distance = distance
+        self.entity = _Entity(fields)
+
+
+class _DeleteResult:
+    def __init__(self, delete_count: int):
+        self.delete_count = delete_count
+
+
+class _IvfIndex:
+    """Inverted-file index: k-means centroids + row lists per centroid."""
+
+    def __init__(self, centroids: np.ndarray, lists: List[np.ndarray], built_rows: int):
+        self.centroids = centroids
+        self.lists = lists
+        self.built_rows = built_rows
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, rows: np.ndarray, nlist: int, seed: int = 0) -> "_IvfIndex":
+        rng = np.random.default_rng(seed)
+        sample = rows if len(rows) <= KMEANS_SAMPLE else rng.choice(rows, KMEANS_SAMPLE, replace=False)
+        data = np.asarray(vectors[np.sort(sample)])
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERS):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assign == c]
+                if len(members):
+                    v = members.mean(axis=0)
+                    centroids[c] = v / (np.linalg.norm(v) or 1.0)
+        assign = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), 65536):
+            part = rows[start:start + 65536]
+            assign[start:start + len(part)] = np.argmax(np.asarray(vectors[part]) @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        lists = [rows[order[bounds[c]:bounds[c + 1]]] for c in range(nlist)]
+        return cls(centroids, lists, int(rows.max()) + 1 if len(rows) else 0)
+
+    def candidates(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        probe = np.argsort(-(self.centroids @ q))[:nprobe]
+        return np.concatenate([self.lists[c] for c in probe]) if len(probe) else np.empty(0, dtype=np.int64)
+
+
+class EmbeddedCollection(VectorStore):
+    """
+    Collection-compatible vector store that needs no external service.
+    Several processes can open the same store directory (they must use the
+    same quantization).
+
+    :param name: collection name (a sub-directory of `root`)
+    :param root: storage directory
+    :param dim:  vector dimension; taken from the first insert if unknown
+    :param quantization: "none", "int8" or "binary" first-pass codes
+    :param overfetch:    candidates re-ranked per hit (default per quantizer)
+    """
+
+    def __init__(self, name: str, root: str = EMBEDDED_STORE_DIR, dim: Optional[int] = None,
+                 quantization: str = VECTOR_QUANTIZATION, overfetch: Optional[int] = QUANT_OVERFETCH):
+        self.name = name
+        self.quantization = quantization
+        self.overfetch = overfetch
+        self.path = Path(root) / name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        # Autocommit mode: transactions are opened explicitly with _write().
+        self._db = sqlite3.connect(
+            str(self.path / "meta.sqlite"), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, text TEXT, doc_name TEXT,"
+                " doc_id TEXT, chunk_index INTEGER, page INTEGER)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS chunks_doc ON chunks(doc_id)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+            if dim:
+                self._db.execute("INSERT OR IGNORE INTO meta VALUES ('dim', ?)", (dim,))
+
+        self.dim: Optional[int] = None
+        self._size = 0                  # rows ever allocated (incl. deleted)
+        self._capacity = 0
+        self._generation: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._quantizer = None
+        self._codes: Optional[np.memmap] = None
+        self._live = np.zeros(0, dtype=bool)
+        self._doc_rows: Dict[str, List[int]] = {}
+        self._ivf: Optional[_IvfIndex] = None
+        self._ivf_building = False
+        self._compactions = 0
+        # Held shared for the store's lifetime; compaction needs it exclusively.
+        self._lock_file = open(self.path / ".lock", "a")
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+        with self._lock, self._transaction():
+            self._sync()
+            if self.dim:
+                self._grow(max(self._size, 1024))
+
+    # --- cross-process state ---
+    # Row allocation (`size`), the dimension and a `generation` counter live
+    # in the SQLite meta table and only change inside BEGIN IMMEDIATE
+    # transactions, so processes sharing the directory never hand out the
+    # same row.  Each process keeps the live-row mask and doc_id -> rows map
+    # in memory and reloads them when it sees another process's generation.
+    @contextmanager
+    def _transaction(self):
+        """Write transaction; BEGIN IMMEDIATE serialises writers across processes."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    @contextmanager
+    def _write(self):
+        """
+        Write transaction on up-to-date state that publishes the change to
+        other processes.  Callers hold self._lock.
+        """
+        try:
+            with self._transaction():
+                self._sync()
+                yield
+                self._save_meta()
+                self._db.execute(
+                    "INSERT INTO meta VALUES ('generation', 1) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+                )
+                generation = self._db.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()[0]
+        except BaseException:
+            # In-memory state may be half updated: reload it on next use.
+            self._generation = None
+            raise
+        self._generation = generation
+
+    def _sync(self):
+        """Reloads row state written by other processes.  Callers hold self._lock."""
+        own_txn = not self._db.in_transaction
+        if own_txn:
+            # One snapshot for meta + chunks.
+            self._db.execute("BEGIN")
+        try:
+            meta = dict(self._db.execute("SELECT name, value FROM meta").fetchall())
+            generation = meta.get("generation", 0)
+            if generation == self._generation:
+                return
+            self.dim = self.dim or meta.get("dim")
+            self._size = meta.get("size", 0)
+            if self.dim and (self.path / "vectors.f32").exists():
+                self._map()
+            self._load_rows()
+            if meta.get("compactions", 0) != self._compactions:
+                # Row numbers changed: the IVF lists are meaningless now.
+                self._compactions = meta.get("compactions", 0)
+                self._ivf = None
+            self._generation = generation
+        finally:
+            if own_txn:
+                self._db.execute("COMMIT")
+
+    # --- storage helpers ---
+    @staticmethod
+    def _grow_file(path: Path, nbytes: int):
+        # Grow only, never truncate: other processes may have the file mapped.
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < nbytes:
+                os.ftruncate(fd, nbytes)
+        finally:
+            os.close(fd)
+
+    def _grow(self, capacity: int):
+        """Makes room for `capacity` rows (inside _write())."""
+        self._grow_file(self.path / "vectors.f32", capacity * self.dim * 4)
+        if self._quantizer is None:
+            self._quantizer = get_quantizer(self.quantization, self.dim)
+        if self._quantizer is not None:
+            code_file = self.path / f"codes.{self._quantizer.mode}"
+            fresh = not code_file.exists()
+            self._grow_file(code_file, capacity * self._quantizer.code_bytes)
+            if fresh and self._size:
+                # Quantization switched on for an existing store: backfill codes.
+                self._map()
+                logger.info("Encoding %d existing vectors of %s as %s codes", self._size, self.name, self._quantizer.mode)
+                for start in range(0, self._size, 65536):
+                    stop = min(start + 65536, self._size)
+                    self._codes[start:stop] = self._quantizer.encode(self._vectors[start:stop])
+        self._map()
+
+    def _map(self):
+        """(Re)maps the vector and code files at their current size."""
+        vec_file = self.path / "vectors.f32"
+        capacity = os.path.getsize(vec_file) // (self.dim * 4)
+        if self._quantizer is None:
+            self._quantizer = get_quantizer(self.quantization, self.dim)
+        code_file = self.path / f"codes.{self._quantizer.mode}" if self._quantizer is not None else None
+        if code_file is not None:
+            capacity = min(capacity, os.path.getsize(code_file) // self._quantizer.code_bytes)
+        if self._vectors is not None and capacity == self._capacity:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+        if self._codes is not None:
+            self._codes.flush()
+        self._capacity = capacity
+        self._vectors = np.memmap(vec_file, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        if code_file is not None:
+            self._codes = np.memmap(code_file, dtype=np.uint8, mode="r+", shape=(capacity, self._quantizer.code_bytes))
+        live = np.zeros(capacity, dtype=bool)
+        live[: len(self._live)] = self._live[:capacity]
+        self._live = live
+
+    def _load_rows(self):
+        self._doc_rows = {}
+        self._live = np.zeros(self._capacity, dtype=bool)
+        for row, doc_id in self._db.execute("SELECT row, doc_id FROM chunks ORDER BY row"):
+            self._doc_rows.setdefault(doc_id, []).append(row)
+            if row < len(self._live):
+                self._live[row] = True
+
+    def _save_meta(self):
+        if self.dim:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (self.dim,))
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('size', ?)", (self._size,))
+
+    @staticmethod
+    def _columns(data: List[Any]) -> Dict[str, List[Any]]:
+        if data and isinstance(data[0], dict):
+            return {f: [r[f] for r in data] for f in SCHEMA_FIELDS}
+        return dict(zip(SCHEMA_FIELDS, data))
+
+    def _rows_for(self, expr: Optional[str]) -> Optional[np.ndarray]:
+        """Live rows matching `expr`, or None meaning "every live row"."""
+        parsed = parse_expr(expr)
+        if parsed is None:
+            return None
+        field, values = parsed
+        if field == "doc_id":
+            rows = [r for v in values for r in self._doc_rows.get(v, ())]
+        elif field in _META_FIELDS:
+            placeholders = ",".join("?" * len(values))
+            rows = [r for (r,) in self._db.execute(f"SELECT row FROM chunks WHERE {field} IN ({placeholders})", values)]
+        else:
+            raise ValueError(f"Cannot filter on field {field!r}")
+        return np.asarray(sorted(rows), dtype=np.int64)
+
+    def _fetch(self, rows: Iterable[int], output_fields: Optional[List[str]]) -> Dict[int, Dict[str, Any]]:
+        rows = [int(r) for r in rows]
+        fields = [f for f in (output_fields or []) if f in _META_FIELDS]
+        cols = ["row"] + list(dict.fromkeys(["id"] + fields))
+        out: Dict[int, Dict[str, Any]] = {}
+        for start in range(0, len(rows), 900):
+            part = rows[start:start + 900]
+            q = f"SELECT {','.join(cols)} FROM chunks WHERE row IN ({','.join('?' * len(part))})"
+            for rec in self._db.execute(q, part):
+                out[rec[0]] = dict(zip(cols[1:], rec[1:]))
+        if output_fields and "embedding" in output_fields:
+            for r, rec in out.items():
+                rec["embedding"] = np.array(self._vectors[r])
+        return out
+
+    # --- VectorStore API ---
+    def insert(self, data: List[Any]):
+        with self._lock:
+            with self._write():
+                self._insert(self._columns(data))
+            self._schedule_ivf()
+
+    def _insert(self, cols: Dict[str, List[Any]]):
+        # Inside _write().
+        n = len(cols["id"])
+        if not n:
+            return
+        vecs = np.asarray([np.asarray(v, dtype=np.float32) for v in cols["embedding"]], dtype=np.float32)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs / np.where(norms == 0, 1.0, norms)  # cosine == dot product
+        if self.dim is None:
+            self.dim = int(vecs.shape[1])
+            self._grow(1024)
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"Collection {self.name} has dim={self.dim}, got {vecs.shape[1]}")
+        if self._size + n > self._capacity:
+            self._grow(max(self._capacity * 2, self._size + n))
+        rows = range(self._size, self._size + n)
+        self._vectors[self._size:self._size + n] = vecs
+        if self._codes is not None:
+            self._codes[self._size:self._size + n] = self._quantizer.encode(vecs)
+        # Other processes read the rows as soon as the transaction commits.
+        self._vectors.flush()
+        if self._codes is not None:
+            self._codes.flush()
+        self._db.executemany(
+            "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (r, cols["id"][i], cols["text"][i], cols["doc_name"][i], cols["doc_id"][i],
+                 int(cols["chunk_index"][i]), int(cols["page"][i]))
+                for i, r in enumerate(rows)
+            ]
+        )
+        for i, r in enumerate(rows):
+            self._doc_rows.setdefault(cols["doc_id"][i], []).append(r)
+        self._live[self._size:self._size + n] = True
+        self._size += n
+
+    def upsert(self, data: List[Any]):
+        cols = self._columns(data)
+        with self._lock:
+            with self._write():
+                ids = list(cols["id"])
+                for start in range(0, len(ids), 900):
+                    self._delete(f"id in {json.dumps(ids[start:start + 900])}")
+                self._insert(cols)
+            self._schedule_ivf()
+
+    def delete(self, expr: str) -> _DeleteResult:
+        with self._lock, self._write():
+            return _DeleteResult(self._delete(expr))
+
+    def _delete(self, expr: str) -> int:
+        # Inside _write().
+        rows = self._rows_for(expr)
+        if rows is None:
+            raise ValueError("Refusing to delete without a filter expression")
+        rows = [int(r) for r in rows if self._live[r]]
+        if not rows:
+            return 0
+        touched_docs = set()
+        for start in range(0, len(rows), 900):
+            part = rows[start:start + 900]
+            marks = ','.join('?' * len(part))
+            touched_docs.update(d for (d,) in self._db.execute(f"SELECT DISTINCT doc_id FROM chunks WHERE row IN ({marks})", part))
+            self._db.execute(f"DELETE FROM chunks WHERE row IN ({marks})", part)
+        dead = set(rows)
+        self._live[rows] = False
+        for doc_id in touched_docs:
+            kept = [r for r in self._doc_rows[doc_id] if r not in dead]
+            if kept:
+                self._doc_rows[doc_id] = kept
+            else:
+                del self._doc_rows[doc_id]
+        return len(rows)
+
+    def query(self, expr: str, output_fields: Optional[List[str]] = None,
+              offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._sync()
+            rows = self._rows_for(expr)
+            if rows is None:
+                rows = np.flatnonzero(self._live[: self._size])
+            rows = rows[offset: offset + limit if limit is not None else None]
+            fetched = self._fetch(rows, output_fields or ["id"])
+            return [fetched[int(r)] for r in rows if int(r) in fetched]
+
+    def search(self, data, anns_field: str = "embedding", param: Optional[Dict[str, Any]] = None,
+               limit: int = 10, expr: Optional[str] = None, output_fields: Optional[List[str]] = None):
+        queries = np.asarray([np.asarray(q, dtype=np.float32) for q in data], dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+        nprobe = ((param or {}).get("params") or {}).get("nprobe", EMBEDDED_IVF_DEFAULT_NPROBE)
+
+        with self._lock:
+            self._sync()
+            if self._vectors is None or self._size == 0:
+                return [[] for _ in queries]
+            filtered = self._rows_for(expr)
+            base = np.flatnonzero(self._live[: self._size]) if filtered is None else filtered
+            ivf = self._ivf if len(base) >= EMBEDDED_IVF_MIN_ROWS else None
+            if ivf is not None:
+                if filtered is None:
+                    allowed = self._live
+                else:
+                    allowed = np.zeros(self._size, dtype=bool)
+                    allowed[filtered] = True
+                # Probe more lists under a filter so the expected number of
+                # matching candidates stays about the same.
+                live = int(self._live[: self._size].sum())
+                probes = min(len(ivf.lists), math.ceil(nprobe * live / max(1, len(base))))
+            else:
+                self._schedule_ivf()
+
+            results = []
+            for q in queries:
+                cand = base
+                if ivf is not None:
+                    # Probed lists + rows added since the index was built,
+                    # restricted to live rows matching the filter.
+                    probed = np.concatenate([ivf.candidates(q, probes), np.arange(ivf.built_rows, self._size)])
+                    probed = probed[allowed[probed]]
+                    if len(probed) >= limit:
+                        cand = probed
+                results.append(self._top_k(q, cand, limit))
+
+            wanted = {int(r) for hits in results for r, _ in hits}
+            fetched = self._fetch(wanted, output_fields)
+            return [
+                [Hit(fetched[r]["id"], s, fetched[r]) for r, s in hits if r in fetched]
+                for hits in results
+            ]
+
+    def _top_k(self, q: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if not len(rows):
+            return []
+        if self._codes is not None:
+            # First pass on the codes, exact re-rank of the survivors.
+            rows = np.sort(approximate_top(self._quantizer, q, self._codes, rows, k * (self.overfetch or self._quantizer.overfetch)))
+        sims = np.asarray(self._vectors[rows]) @ q
+        k = min(k, len(rows))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(int(rows[i]), float(sims[i])) for i in top]
+
+    # --- IVF index ---
+    def _schedule_ivf(self):
+        """
+        Starts a background (re)build of the IVF index when the store is
+        large enough and the index is missing or stale.  Searches keep using
+        the previous index (or brute force) until the new one is swapped in.
+        Callers hold self._lock.
+        """
+        if self._ivf_building or self._vectors is None:
+            return
+        if self._ivf is not None and self._size - self._ivf.built_rows <= EMBEDDED_IVF_REBUILD_FRACTION * self._ivf.built_rows:
+            return
+        rows = np.flatnonzero(self._live[: self._size])
+        if len(rows) < EMBEDDED_IVF_MIN_ROWS:
+            return
+        self._ivf_building = True
+        threading.Thread(
+            target=self._build_ivf, args=(self._vectors, rows, self._compactions),
+            name=f"ivf-{self.name}", daemon=True
+        ).start()
+
+    def _build_ivf(self, vectors: np.memmap, rows: np.ndarray, compactions: int):
+        index = None
+        try:
+            nlist = int(max(16, min(4096, 4 * np.sqrt(len(rows)))))
+            logger.info("Building IVF index for %s: %d rows, nlist=%d", self.name, len(rows), nlist)
+            index = _IvfIndex.build(vectors, rows, nlist)
+        except Exception as e:
+            logger.error("IVF build for %s failed: %s", self.name, e, exc_info=True)
+        finally:
+            with self._lock:
+                self._ivf_building = False
+                # A compaction during the build renumbered the rows.
+                if index is not None and compactions == self._compactions:
+                    self._ivf = index
+
+    # --- compaction ---
+    def compact(self) -> int:
+        """
+        Moves live rows down over deleted ones so their space is reused, and
+        returns the number of rows reclaimed.  Needs the store to itself:
+        skipped (returns 0) while another process has it open.
+        """
+        with self._lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.debug("Not compacting %s: open in another process", self.name)
+                    fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+                    return 0
+            try:
+                with self._write():
+                    return self._compact()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+
+    def _compact(self) -> int:
+        # Inside _write().  Live rows keep their order, so row i moves to a
+        # slot <= i and each block only overwrites rows already moved.
+        rows = np.flatnonzero(self._live[: self._size])
+        reclaimed = self._size - len(rows)
+        if not reclaimed:
+            return 0
+        logger.info("Compacting %s: %d live rows, %d reclaimed", self.name, len(rows), reclaimed)
+        for start in range(0, len(rows), 65536):
+            src = rows[start:start + 65536]
+            self._vectors[start:start + len(src)] = self._vectors[src]
+            if self._codes is not None:
+                self._codes[start:start + len(src)] = self._codes[src]
+        self._vectors.flush()
+        if self._codes is not None:
+            self._codes.flush()
+        self._db.executemany(
+            "UPDATE chunks SET row = ? WHERE row = ?",
+            [(new, int(old)) for new, old in enumerate(rows) if new != old]
+        )
+        self._size = len(rows)
+        self._compactions += 1
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('compactions', ?)", (self._compactions,))
+        self._ivf = None
+        self._load_rows()
+        return reclaimed
+
+    def flush(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            if self._codes is not None:
+                self._codes.flush()
+            dead = self._size - int(self._live[: self._size].sum())
+            if dead >= EMBEDDED_COMPACT_MIN_ROWS and dead > EMBEDDED_COMPACT_FRACTION * self._size:
+                self.compact()
+
+    @property
+    def num_entities(self) -> int:
+        with self._lock:
+            self._sync()
+            return int(self._live[: self._size].sum())
@@ -0,0 +1,115 @@
+import os
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- ANN index profiles ---
+# A profile pairs the Milvus index build parameters with the search parameters
+# that go with it, so the two can't drift apart (e.g. HNSW's M/efConstruction
+# passed to an IVF index).  The profile is chosen per collection:
+#   VECTOR_INDEX_PROFILE=ivf_flat                          default for every collection
+#   VECTOR_INDEX_PROFILES=rag_chunks1=hnsw,archive=ivf_pq   per-collection overrides
+# The default matches the IVF_FLAT index existing deployments already have.
+VECTOR_INDEX_PROFILE = os.getenv("VECTOR_INDEX_PROFILE", "ivf_flat")
+VECTOR_INDEX_PROFILES = os.getenv("VECTOR_INDEX_PROFILES", "")
+METRIC_TYPE = "COSINE"
+
+
+class IndexProfile:
+    """
+    :param name:          profile name used in config / benchmark output
+    :param index_type:    Milvus index type
+    :param build_params:  `params` for `create_index`
+    :param search_params: `params` for `search`
+    :param sweep:         search-parameter name and values the benchmark tries
+    """
+
+    def __init__(self, name: str, index_type: str, build_params: Dict[str, Any],
+                 search_params: Dict[str, Any], sweep: Optional[Dict[str, List[int]]] = None):
+        self.name = name
+        self.index_type = index_type
+        self.build_params = build_params
+        self.search_params = search_params
+        self.sweep = sweep or {}
+
+    def index_params(self) -> Dict[str, Any]:
+        return {"index_type": self.index_type, "metric_type": METRIC_TYPE, "params": dict(self.build_params)}
+
+    def search_param(self, **overrides) -> Dict[str, Any]:
+        params = dict(self.search_params)
+        params.update(overrides)
+        return {"metric_type": METRIC_TYPE, "params": params}
+
+    def estimate_memory_bytes(self, rows: int, dim: int) -> int:
+        """Rough in-memory size of the index for `rows` vectors of `dim` floats."""
+        raw = rows * dim * 4
+        nlist = self.build_params.get("nlist", 0)
+        centroids = nlist * dim * 4
+        if self.index_type == "HNSW":
+            # float vectors + ~2*M neighbour ids on level 0 (upper levels are ~1/M of that)
+            return raw + rows * self.build_params["M"] * 2 * 4
+        if self.index_type == "IVF_FLAT":
+            return raw + centroids + rows * 8
+        if self.index_type == "IVF_SQ8":
+            return rows * dim + centroids + rows * 8 + dim * 8
+        if self.index_type == "IVF_PQ":
+            m, nbits = self.build_params["m"], self.build_params["nbits"]
+            codebooks = m * (2 ** nbits) * (dim // m) * 4
+            return rows * m * nbits // 8 + codebooks + centroids + rows * 8
+        return raw
+
+    def __repr__(self):
+        return f"<IndexProfile {self.name} {self.index_type} build={self.build_params} search={self.search_params}>"
+
+
+INDEX_PROFILES: Dict[str, IndexProfile] = {
+    "flat": IndexProfile("flat", "FLAT", {}, {}),
+    "hnsw": IndexProfile(
+        "hnsw", "HNSW",
+        {"M": 16, "efConstruction": 200},
+        {"ef": 64},
+        sweep={"ef": [16, 32, 64, 128, 256]}
+    ),
+    "ivf_flat": IndexProfile(
+        "ivf_flat", "IVF_FLAT",
+        {"nlist": 1024},
+        {"nprobe": 16},
+        sweep={"nprobe": [4, 8, 16, 32, 64, 128]}
+    ),
+    "ivf_sq8": IndexProfile(
+        "ivf_sq8", "IVF_SQ8",
+        {"nlist": 1024},
+        {"nprobe": 16},
+        sweep={"nprobe": [4, 8, 16, 32, 64, 128]}
+    ),
+    # m must divide the embedding dim (384 for bge-small).
+    "ivf_pq": IndexProfile(
+        "ivf_pq", "IVF_PQ",
+        {"nlist": 1024, "m": 48, "nbits": 8},
+        {"nprobe": 32},
+        sweep={"nprobe": [8, 16, 32, 64, 128]}
+    ),
+}
+
+
+def _overrides() -> Dict[str, str]:
+    out = {}
+    for item in VECTOR_INDEX_PROFILES.split(","):
+        if "=" in item:
+            coll, prof = item.split("=", 1)
+            out[coll.strip()] = prof.strip()
+    return out
+
+
+def get_index_profile(collection_name: Optional[str] = None) -> IndexProfile:
+    """Profile configured for `collection_name` (or the default profile)."""
+    name = _overrides().get(collection_name or "", VECTOR_INDEX_PROFILE).lower()
+    if name not in INDEX_PROFILES:
+        raise ValueError(f"Unknown index profile '{name}'; expected one of {sorted(INDEX_PROFILES)}")
+    return INDEX_PROFILES[name]
+
+
+def search_params_for(collection) -> Dict[str, Any]:
+    """Search `param` dict matching the index profile of `collection`."""
+    return get_index_profile(getattr(collection, "name", None)).search_param()
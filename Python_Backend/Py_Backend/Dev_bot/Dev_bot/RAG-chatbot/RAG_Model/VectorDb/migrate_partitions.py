@@ -0,0 +1,100 @@
+"""
+Copies an existing chunk collection into the doc_id partition-key layout
+(see connectMilvus.build_schema) and optionally swaps the two.
+
+Run from the RAG-chatbot directory:
+
+    python -m RAG_Model.VectorDb.migrate_partitions --source rag_chunks1 --target rag_chunks1_pk
+    python -m RAG_Model.VectorDb.migrate_partitions --source rag_chunks1 --target rag_chunks1_pk --swap
+
+With --swap the source is renamed to `<source>_backup_<timestamp>` and the
+target takes over the source name, so VECTOR_COLLECTION needs no change.
+Stop ingestion while migrating: rows written to the source after the copy
+starts are not picked up.
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+from pymilvus import Collection, utility
+
+from RAG_Model.VectorDb.bulk_insert import insert_columnar
+from RAG_Model.VectorDb.connectMilvus import connect_collection, has_partition_key
+from RAG_Model.VectorDb.vector_store import COLLECTION_NAME, SCHEMA_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(source_name: str, target_name: str, batch_size: int = 2000) -> int:
+    """Copies every row of `source_name` into `target_name`; returns the rows copied."""
+    target = connect_collection(target_name)  # creates it with the partition-key layout
+    if not has_partition_key(target):
+        raise RuntimeError(f"Target '{target_name}' exists without a doc_id partition key")
+    if target.num_entities:
+        raise RuntimeError(f"Target '{target_name}' already holds {target.num_entities} rows; drop it or pick another name")
+
+    source = Collection(name=source_name)
+    source.load()
+    total = source.num_entities
+    print(f"Copying ~{total} rows from '{source_name}' to '{target_name}'")
+
+    copied = 0
+    t0 = time.time()
+    it = source.query_iterator(batch_size=batch_size, expr="", output_fields=SCHEMA_FIELDS)
+    try:
+        while True:
+            rows = it.next()
+            if not rows:
+                break
+            insert_columnar(
+                target,
+                ids=[r["id"] for r in rows],
+                embeddings=np.asarray([r["embedding"] for r in rows], dtype=np.float32),
+                texts=[r["text"] for r in rows],
+                doc_names=[r["doc_name"] for r in rows],
+                doc_ids=[r["doc_id"] for r in rows],
+                chunk_indices=[r["chunk_index"] for r in rows],
+                pages=[r["page"] for r in rows],
+                flush=False
+            )
+            copied += len(rows)
+            rate = copied / max(time.time() - t0, 1e-6)
+            print(f"  {copied}/{total} rows ({rate:.0f} rows/s)")
+    finally:
+        it.close()
+
+    target.flush()
+    if target.num_entities != copied:
+        raise RuntimeError(f"Row count mismatch after copy: copied {copied}, target has {target.num_entities}")
+    print(f"✅ Copied {copied} rows in {time.time() - t0:.1f}s")
+    return copied
+
+
+def swap(source_name: str, target_name: str) -> str:
+    backup = f"{source_name}_backup_{time.strftime('%Y%m%d%H%M%S')}"
+    Collection(name=source_name).release()
+    utility.rename_collection(source_name, backup)
+    utility.rename_collection(target_name, source_name)
+    Collection(name=source_name).load()
+    print(f"✅ '{target_name}' is now '{source_name}'; old data kept as '{backup}'")
+    return backup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=COLLECTION_NAME, help="collection to migrate")
+    parser.add_argument("--target", help="new collection (default: <source>_pk)")
+    parser.add_argument("--batch-size", type=int, default=2000, help="rows read per query_iterator page")
+    parser.add_argument("--swap", action="store_true", help="rename target to the source name afterwards")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    target = args.target or f"{args.source}_pk"
+    migrate(args.source, target, batch_size=args.batch_size)
+    if args.swap:
+        swap(args.source, target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import logging
+from typing import Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Quantized vector codes + two-stage search ---
+# First pass scores compact codes (int8: dim+4 bytes/row, binary: dim/8
+# bytes/row, vs dim*4 for float32) to pick QUANT_OVERFETCH * k candidates;
+# second pass re-ranks only those with exact cosine on the float vectors.
+#   VECTOR_QUANTIZATION   none | int8 | binary   (embedded store codes)
+#   QUANT_OVERFETCH       candidates kept per final hit (default per mode)
+#   VECTOR_RERANK         re-rank Milvus hits from quantized indexes (IVF_SQ8 / IVF_PQ)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+QUANT_OVERFETCH = int(os.getenv("QUANT_OVERFETCH", "0")) or None
+# Over-fetch for Milvus' quantized indexes when QUANT_OVERFETCH is unset.
+INDEX_OVERFETCH = 4
+VECTOR_RERANK = os.getenv("VECTOR_RERANK", "1") == "1"
+QUANTIZED_INDEX_TYPES = {"IVF_SQ8", "IVF_PQ"}
+
+# Rows scored per block in the first pass, bounding the float32 temporaries.
+SCORE_BLOCK_ROWS = 65536
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class Int8Quantizer:
+    """
+    Symmetric per-row int8 codes: `round(x / max|x| * 127)` followed by the
+    row scale as 4 float32 bytes, all packed in one uint8 row.
+    """
+    mode = "int8"
+    overfetch = 4
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    def code_bytes(self) -> int:
+        return self.dim + 4
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scale = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+        scale[scale == 0] = 1.0
+        q = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+        out = np.empty((len(vectors), self.code_bytes), dtype=np.uint8)
+        out[:, :self.dim] = q.view(np.uint8)
+        out[:, self.dim:] = scale.astype(np.float32).view(np.uint8)
+        return out
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        q = np.ascontiguousarray(codes[:, :self.dim]).view(np.int8).astype(np.float32)
+        scale = np.ascontiguousarray(codes[:, self.dim:]).view(np.float32)[:, 0]
+        return (q @ query) * scale
+
+
+class BinaryQuantizer:
+    """Sign-bit codes (dim/8 bytes per row) scored by Hamming similarity."""
+    mode = "binary"
+    # 1 bit per dim loses much more ranking information than int8.
+    overfetch = 20
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    def code_bytes(self) -> int:
+        return (self.dim + 7) // 8
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        qbits = np.packbits(np.asarray(query) > 0)
+        hamming = _POPCOUNT[np.bitwise_xor(codes, qbits)].sum(axis=1, dtype=np.int32)
+        return (self.dim - 2 * hamming).astype(np.float32)
+
+
+QUANTIZERS = {"int8": Int8Quantizer, "binary": BinaryQuantizer}
+
+
+def get_quantizer(mode: Optional[str], dim: int):
+    """Quantizer for `mode`, or None for "none" / unset."""
+    if not mode or mode == "none":
+        return None
+    if mode not in QUANTIZERS:
+        raise ValueError(f"Unknown VECTOR_QUANTIZATION '{mode}'; expected none, int8 or binary")
+    return QUANTIZERS[mode](dim)
+
+
+def approximate_top(quantizer, query: np.ndarray, codes, rows: np.ndarray, n: int) -> np.ndarray:
+    """The `n` rows (subset of `rows`) with the best code scores, unordered."""
+    if len(rows) <= n:
+        return rows
+    scores = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+        part = rows[start:start + SCORE_BLOCK_ROWS]
+        scores[start:start + len(part)] = quantizer.scores(query, np.asarray(codes[part]))
+    return rows[np.argpartition(-scores, n - 1)[:n]]
+
+
+def memory_bytes(mode: str, rows: int, dim: int) -> int:
+    """Bytes the first-pass search keeps hot for `rows` vectors."""
+    quantizer = get_quantizer(mode, dim)
+    return rows * (quantizer.code_bytes if quantizer else dim * 4)
+
+
+def needs_rerank(index_type: Optional[str]) -> bool:
+    return VECTOR_RERANK and (index_type or "").upper() in QUANTIZED_INDEX_TYPES
+
+
+def rerank_hits(query: np.ndarray, hits: List[Any], k: int) -> List[Any]:
+    """
+    Re-orders Milvus hits (fetched with "embedding" in output_fields) by exact
+    cosine to `query`, keeping the top `k`.  Returns (hit, score) pairs.
+    """
+    if not hits:
+        return []
+    vecs = np.asarray([h.entity.get("embedding") for h in hits], dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=1)
+    sims = (vecs @ np.asarray(query, dtype=np.float32)) / np.where(norms == 0, 1.0, norms)
+    order = np.argsort(-sims)[:k]
+    return [(hits[i], float(sims[i])) for i in order]
@@ -0,0 +1,77 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from RAG_Model.lazy import LazyComponent
+
+# --- Pluggable vector store ---
+# The retrieval / ingestion code talks to a "collection" object.  Milvus'
+# `pymilvus.Collection` already has this shape; `VectorStore` pins down the
+# subset we rely on so other backends (see embedded_store.py) can stand in.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "milvus")  # milvus | embedded
+COLLECTION_NAME = os.getenv("VECTOR_COLLECTION", "rag_chunks1")
+
+# Column order used by every columnar insert/upsert.
+SCHEMA_FIELDS = ["id", "embedding", "text", "doc_name", "doc_id", "chunk_index", "page"]
+
+
+class VectorStore(ABC):
+    """Operations `search_similar_chunks_multi`, the insert path and /delete need."""
+
+    @abstractmethod
+    def insert(self, data: List[Any]):
+        """`data` is either columns in SCHEMA_FIELDS order or a list of row dicts."""
+
+    @abstractmethod
+    def upsert(self, data: List[Any]):
+        """Like `insert`, replacing rows whose id already exists."""
+
+    @abstractmethod
+    def search(self, data, anns_field: str, param: Dict[str, Any], limit: int,
+               expr: Optional[str] = None, output_fields: Optional[List[str]] = None):
+        """Returns one hit list per query vector; hits expose `.id`, `.distance`, `.entity.get()`."""
+
+    @abstractmethod
+    def query(self, expr: str, output_fields: Optional[List[str]] = None,
+              offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows matching a scalar filter expression."""
+
+    @abstractmethod
+    def delete(self, expr: str):
+        """Deletes rows matching `expr`; the result exposes `.delete_count`."""
+
+    @abstractmethod
+    def flush(self):
+        """Makes previous writes durable."""
+
+    def load(self):
+        pass
+
+    def has_index(self) -> bool:
+        return True
+
+
+_stores: Dict[str, Any] = {}
+_stores_lock = threading.Lock()
+
+
+def get_collection(name: str = COLLECTION_NAME, backend: str = VECTOR_BACKEND):
+    """
+    Returns the collection object for `name` on the configured backend
+    (`VECTOR_BACKEND=milvus` or `embedded`).  Instances are shared per process
+    and wrapped in a LazyComponent: nothing is opened or connected until the
+    first call on it (or `lazy_get()`).
+    """
+    key = f"{backend}:{name}"
+    with _stores_lock:
+        if key not in _stores:
+            if backend == "embedded":
+                from RAG_Model.VectorDb.embedded_store import EmbeddedCollection
+                _stores[key] = LazyComponent("vector_store", lambda: EmbeddedCollection(name))
+            elif backend == "milvus":
+                from RAG_Model.VectorDb.connectMilvus import collection, connect_collection
+                _stores[key] = collection if name == COLLECTION_NAME else LazyComponent("vector_store", lambda: connect_collection(name))
+            else:
+                raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+        return _stores[key]
@@ -74,12 +74,41 @@ import shutil
 import traceback
 
 # Local imports
-from  RAG_Model.VectorDb.connectMilvus import collection
-from RAG_Model.logic.code import process_pdf_for_doc, process_query
-from RAG_Model.AiClient import bge, OR_client
+from RAG_Model.VectorDb.vector_store import get_collection
+from RAG_Model.VectorDb.index_profiles import search_params_for
+from RAG_Model.logic.code import process_pdf_for_doc, reingest_doc, process_query_async, process_query_batch, stream_query
+from RAG_Model.logic.metrics import render_metrics
+from RAG_Model.logic.admission import AdmissionController, Overloaded
+from RAG_Model.logic.embedding_service import PRIORITY_INGEST, PRIORITY_QUERY, get_embedder
+from RAG_Model.logic.bulk_embedder import get_bulk_embedder
+from RAG_Model.AiClient import bge, OR_client, llm_gateway
+from RAG_Model.logic.jobs import IngestJob, JobQueueFull, ingest_jobs
+from RAG_Model.logic.query_cache import QUERY_WARMUP_FILE, get_query_cache
+from RAG_Model.logic.embedding_cache import get_embedding_cache
+from RAG_Model.logic.answer_cache import get_answer_cache
+from RAG_Model.logic.lexical_index import get_lexical_index
+from RAG_Model.logic.ocr import get_ocr_service
+from RAG_Model.logic.extract_text import shutdown_extract_pools
+from RAG_Model.AiClient import EMBED_MODEL_NAME
+import threading
+import time
+import logging
 from typing import List
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import json
 
+# Milvus or the embedded store, per VECTOR_BACKEND
+collection = get_collection()
+
+# Queries and ingestion share one micro-batching embedding service (queries
+# are served first); with EMBED_BATCHING=0 both are plain `bge`.  With
+# BULK_EMBED_WORKERS > 0 ingestion uses the multi-process bulk engine instead.
+query_embedder = get_embedder(PRIORITY_QUERY)
+ingest_embedder = get_bulk_embedder() or get_embedder(PRIORITY_INGEST)
+
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -92,6 +121,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Startup warmup / readiness ---
+# Model, LLM client and vector store are lazy; a background thread loads them
+# and runs one dummy encode + search so the first real request doesn't pay
+# for it.  /ready reports 503 until every step has finished.
+WARMUP_STEPS = ("embedder", "vector_store", "llm_client", "query_cache")
+_warmup = {step: {"ready": False, "seconds": None, "error": None} for step in WARMUP_STEPS}
+
+def _warm_step(name, fn):
+    t0 = time.time()
+    try:
+        fn()
+        _warmup[name]["ready"] = True
+    except Exception as e:
+        _warmup[name]["error"] = str(e)
+        logger.error("Warmup step %s failed: %s", name, e)
+    finally:
+        _warmup[name]["seconds"] = round(time.time() - t0, 3)
+
+def _warm_embedder():
+    bge.lazy_get()
+    _warmup["embedder"]["dim"] = int(bge.encode(["warmup"], normalize_embeddings=True).shape[1])
+
+def _warm_vector_store():
+    collection.lazy_get()
+    dim = _warmup["embedder"].get("dim") or 384
+    collection.search(
+        data=[[0.0] * (dim - 1) + [1.0]],
+        anns_field="embedding",
+        param=search_params_for(collection),
+        limit=1,
+        output_fields=["doc_id"]
+    )
+
+def _warm_query_cache():
+    # Frequent queries (one per line) pre-embedded into the query cache.
+    if QUERY_WARMUP_FILE:
+        get_query_cache().warm(QUERY_WARMUP_FILE, bge, EMBED_MODEL_NAME)
+
+def _warm_llm_clients():
+    OR_client.lazy_get()
+    llm_gateway.lazy_get()
+
+def run_warmup():
+    _warm_step("embedder", _warm_embedder)
+    _warm_step("vector_store", _warm_vector_store)
+    _warm_step("llm_client", _warm_llm_clients)
+    if _warmup["embedder"]["ready"]:
+        _warm_step("query_cache", _warm_query_cache)
+
+@app.on_event("startup")
+async def start_warmup():
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+async def close_llm_gateway():
+    if llm_gateway.lazy_loaded:
+        await llm_gateway.aclose()
+
+@app.on_event("shutdown")
+def stop_bulk_embedder():
+    bulk = get_bulk_embedder()
+    if bulk is not None:
+        bulk.close()
+
+@app.on_event("shutdown")
+def stop_extract_pools():
+    shutdown_extract_pools()
+
+@app.get("/ready")
+async def ready():
+    components = {
+        "embedder": bge.lazy_status(),
+        "vector_store": collection.lazy_status(),
+        "llm_client": OR_client.lazy_status(),
+        "llm_gateway": llm_gateway.lazy_status(),
+    }
+    is_ready = all(step["ready"] for step in _warmup.values())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "components": components, "warmup": _warmup}
+    )
+
 # Directory for saving uploaded documents
 def ensure_docs_directory():
     docs_dir = Path(__file__).resolve().parent / "docs"
@@ -103,68 +214,220 @@ class QueryRequest(BaseModel):
     query: str
     doc_id: str
 
+def _run_ingest(job, reingest: bool, **kwargs):
+    try:
+        return (reingest_doc if reingest else process_pdf_for_doc)(job=job, **kwargs)
+    finally:
+        # Cached answers over this document may now be stale (even a failed
+        # or cancelled run can leave the stored chunks different).
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            answer_cache.invalidate_docs([kwargs["doc_id"]])
+
 # Upload + ingestion endpoint
+# The heavy extract → chunk → embed → insert work runs on the ingestion worker
+# pool; this handler only saves the upload and returns a job id right away.
 @app.post("/ingest")
 async def ingest(
     file: UploadFile = File(...),
     doc_id: str = Form(...),
-    title: str = Form(...)
+    title: str = Form(...),
+    reingest: bool = Form(False)
 ):
     try:
         docs_dir = ensure_docs_directory()
         save_path = docs_dir / f"{doc_id}_{file.filename}"
 
+        # Large uploads are spooled to disk; copy them off the event loop.
         with open(save_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
 
-        # Process PDF: extract → chunk → embed → insert
-        process_pdf_for_doc(
+        # reingest=True diffs against the chunks already stored for doc_id
+        # and only deletes/embeds/inserts what changed.  A plain upload of a
+        # doc_id that already has chunks takes the same path (see
+        # process_pdf_for_doc).
+        job = ingest_jobs.submit(
+            _run_ingest,
+            IngestJob(doc_id=doc_id, title=title, file_name=file.filename),
+            reingest=reingest,
             file_path=save_path,
             doc_id=doc_id,
             title=title,
-            embedder=bge,
+            embedder=ingest_embedder,
             collection=collection
         )
 
         return JSONResponse(
-            status_code=200,
+            status_code=202,
             content={
-                "status": "success",
-                "message": f"Document '{file.filename}' ingested successfully.",
-                "doc_id": doc_id
+                "status": "accepted",
+                "message": f"Document '{file.filename}' queued for ingestion.",
+                "doc_id": doc_id,
+                "job_id": job.id
             }
         )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# Ingestion job status / cancellation
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return job.to_dict()
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = ingest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return job.to_dict()
+
+# --- Admission control for the query endpoints ---
+# A burst beyond QUERY_MAX_CONCURRENCY running + QUERY_MAX_QUEUE waiting gets
+# a fast 429 (queue full) or 503 (waited QUERY_MAX_WAIT_S) with Retry-After
+# instead of piling up; in-flight / queue depth / wait time are on /metrics.
+query_admission = AdmissionController("query")
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"status": "error", "message": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Query endpoint with doc_id filtering
 
 class QueryRequest(BaseModel):
     query: str
     doc_id: List[str]
 
+# The LLM call goes through the async gateway (pooled connections, deadline,
+# retries, model fallback), so a slow upstream no longer blocks the worker.
 @app.post("/query")
 async def query_endpoint(request: QueryRequest):
+    async with query_admission.slot():
+        try:
+            result = await process_query_async(
+                query=request.query,
+                doc_id=request.doc_id,
+                embedder=query_embedder,
+                llm_gateway=llm_gateway,
+                collection=collection
+            )
+            return result
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class _GuardedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that calls `on_close` once the response is over,
+    however it ended: body finished, client gone before the body was ever
+    iterated, or an error while sending.  Background tasks and the body's
+    own `finally` are both skipped in some of those cases.
+    """
+
+    def __init__(self, *args, on_close, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._on_close()
+
+# Same request as /query, answered as Server-Sent Events: an `item` event per
+# answer object as soon as the LLM closes it, then `done` (sources, cached,
+# ttfi_ms, total_ms) or `error`.  Retrieval runs on the query executors and
+# the answer streams from the LLM gateway, so the event loop never blocks;
+# the admission slot is held until the stream finishes.  The slot is
+# released as soon as the body ends, and otherwise when the response itself
+# is done: a generator that never started never reaches its `finally`.
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest):
+    admitted_at = await query_admission.acquire()
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            query_admission.release(admitted_at)
+
     try:
-        result = process_query(
+        events = stream_query(
             query=request.query,
             doc_id=request.doc_id,
-            embedder=bge,
-            llm_client=OR_client,
+            embedder=query_embedder,
+            llm_gateway=llm_gateway,
             collection=collection
         )
-        return result
-    except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+
+        async def body():
+            try:
+                async for event, data in events:
+                    yield _sse(event, data)
+            finally:
+                release()
+                await events.aclose()  # client gone mid-stream: drop the LLM connection now
+
+        return _GuardedStreamingResponse(
+            body(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            on_close=release
+        )
+    except BaseException:
+        release()
+        raise
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    doc_id: List[str]
+    top_k: int = 5
+
+# Many questions over one doc_id set: one encode, one nq=N search, bounded
+# concurrent LLM calls; per-item errors stay in their own result slot.
+@app.post("/query/batch")
+async def query_batch_endpoint(request: BatchQueryRequest):
+    async with query_admission.slot():
+        try:
+            results = await process_query_batch(
+                queries=request.queries,
+                doc_id=request.doc_id,
+                embedder=query_embedder,
+                llm_gateway=llm_gateway,
+                collection=collection,
+                top_k=request.top_k
+            )
+            return {"status": "success", "results": results}
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/delete/{doc_id}")
 async def delete_chunks(doc_id: str):
     try:
+        # doc_id is the partition key, so this only touches doc_id's partition.
+        # No flush(): deletes are already durable and visible to searches.
         expr = f'doc_id == "{doc_id}"'  # use == not 'in' unless you're passing a list
         delete_result = collection.delete(expr)
-        collection.flush()
+        lexical = get_lexical_index()
+        if lexical is not None:
+            lexical.remove_doc(doc_id)
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            answer_cache.invalidate_docs([doc_id])
 
         return JSONResponse(
             status_code=200,
@@ -175,7 +438,26 @@ async def delete_chunks(doc_id: str):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/cache/stats")
+async def cache_stats():
+    emb_cache = get_embedding_cache()
+    return {
+        "query_embeddings": get_query_cache().stats(),
+        "chunk_embeddings": emb_cache.stats() if emb_cache else None,
+        "ocr": get_ocr_service().stats(),
+        "answers": get_answer_cache().stats() if get_answer_cache() else None,
+        "lexical": get_lexical_index().stats() if get_lexical_index() else None,
+    }
+
+# Prometheus text format: streaming time-to-first-item / total latency,
+# admission queue depth / wait time, LLM gateway counters and anything else
+# registered in RAG_Model.logic.metrics.
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Dev mode
 if __name__ == "__main__": 
     import uvicorn
     uvicorn.run("backend:app", host="0.0.0.0", port=8000, reload=True)
+
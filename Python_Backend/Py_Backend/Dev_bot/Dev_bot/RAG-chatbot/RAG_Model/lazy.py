@@ -0,0 +1,63 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyComponent:
+    """
+    Thread-safe load-on-first-use wrapper for expensive singletons (models,
+    clients, DB connections).
+
+    Attribute access is forwarded to the loaded object, so a LazyComponent
+    can be passed anywhere the real object is expected.  Its own members are
+    prefixed with `lazy_` to stay out of the wrapped object's namespace.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self._lazy_name = name
+        self._lazy_loader = loader
+        self._lazy_obj: Any = None
+        self._lazy_lock = threading.Lock()
+        self._lazy_error: Optional[str] = None
+        self._lazy_load_s: Optional[float] = None
+
+    def lazy_get(self) -> Any:
+        obj = self._lazy_obj
+        if obj is not None:
+            return obj
+        with self._lazy_lock:
+            if self._lazy_obj is None:
+                logger.info("Initializing %s", self._lazy_name)
+                t0 = time.time()
+                try:
+                    self._lazy_obj = self._lazy_loader()
+                except Exception as e:
+                    self._lazy_error = str(e)
+                    logger.error("Initializing %s failed: %s", self._lazy_name, e)
+                    raise
+                self._lazy_error = None
+                self._lazy_load_s = round(time.time() - t0, 3)
+                logger.info("%s ready in %.2f s", self._lazy_name, self._lazy_load_s)
+            return self._lazy_obj
+
+    @property
+    def lazy_loaded(self) -> bool:
+        return self._lazy_obj is not None
+
+    def lazy_status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.lazy_loaded,
+            "load_s": self._lazy_load_s,
+            "error": self._lazy_error,
+        }
+
+    def __getattr__(self, item):
+        if item.startswith("_lazy_"):
+            raise AttributeError(item)
+        return getattr(self.lazy_get(), item)
+
+    def __repr__(self):
+        return f"<LazyComponent {self._lazy_name} loaded={self.lazy_loaded}>"
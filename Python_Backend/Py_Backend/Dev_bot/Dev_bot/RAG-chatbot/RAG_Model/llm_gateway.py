@@ -0,0 +1,375 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import httpx
+
+from RAG_Model.logic import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Async LLM gateway ---
+# One pooled httpx.AsyncClient for every chat completion.  Each call gets an
+# overall deadline; 429 / 5xx / transport errors are retried with jittered
+# exponential backoff (honouring Retry-After), a second "hedge" request can
+# be fired when the first is slow, and the call falls through LLM_MODELS in
+# order when a model keeps failing.  `chat_stream()` applies the same
+# deadline, retries and fallback up to the first streamed token (no hedging).
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))           # per model
+LLM_RETRY_BASE_S = float(os.getenv("LLM_RETRY_BASE_S", "0.5"))
+LLM_RETRY_MAX_S = float(os.getenv("LLM_RETRY_MAX_S", "8"))
+LLM_CONNECT_TIMEOUT_S = float(os.getenv("LLM_CONNECT_TIMEOUT_S", "5"))
+# Start a duplicate request when the first hasn't answered after this many
+# seconds; the slower one is cancelled.  0 disables hedging.
+LLM_HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_S", "0"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "32"))
+LLM_KEEPALIVE = int(os.getenv("LLM_KEEPALIVE", "16"))
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+# Errors that won't go away on retry but may on another model
+# (unknown / unavailable model, context too long for this model, ...).
+FALLBACK_STATUS = {400, 404, 413, 422}
+
+_requests = metrics.counter("rag_llm_requests_total", "LLM HTTP attempts by model and outcome", ("model", "outcome"))
+_latency = metrics.histogram("rag_llm_call_seconds", "End-to-end LLM call time including retries", ("outcome",))
+_hedges = metrics.counter("rag_llm_hedges_total", "Hedge requests started and won", ("result",))
+_fallbacks = metrics.counter("rag_llm_fallbacks_total", "Calls that moved on to the next model", ("from_model",))
+
+
+class LLMError(RuntimeError):
+    """An LLM call failed for good (all retries and fallback models used, or the deadline passed)."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class _AttemptError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, base: float = LLM_RETRY_BASE_S, cap: float = LLM_RETRY_MAX_S) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LLMGateway:
+    """
+    Async chat-completions client for an OpenAI-compatible endpoint
+    (OpenRouter by default; any `base_url`, e.g. a local stub server).
+
+    `chat()` returns the assistant message text; `chat_stream()` yields it
+    in pieces as they arrive.  Usage:
+
+        text = await gateway.chat(messages, temperature=0.0, timeout=30)
+        async for delta in gateway.chat_stream(messages, temperature=0.0):
+            ...
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: str,
+        models: Sequence[str],
+        timeout: float,
+        max_retries: int = LLM_MAX_RETRIES,
+        hedge_after: float = LLM_HEDGE_AFTER_S,
+        pool_size: int = LLM_POOL_SIZE,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if not models:
+            raise ValueError("LLMGateway needs at least one model")
+        self.models = list(models)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT_S),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=LLM_KEEPALIVE),
+            transport=transport,
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.0,
+        timeout: Optional[float] = None,
+        models: Optional[Sequence[str]] = None,
+        **params: Any,
+    ) -> str:
+        """
+        One chat completion under an overall deadline of `timeout` seconds
+        (default: the gateway timeout), covering retries, hedges and fallbacks.
+
+        :raises LLMError: when every model failed or the deadline passed.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        t0 = time.perf_counter()
+        last: Optional[_AttemptError] = None
+        models = list(models or self.models)
+
+        for m_idx, model in enumerate(models):
+            payload = {"model": model, "messages": messages, "temperature": temperature, **params}
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    text = await asyncio.wait_for(self._hedged(payload, remaining), remaining)
+                    _requests.inc(model=model, outcome="ok")
+                    _latency.observe(time.perf_counter() - t0, outcome="ok")
+                    return text
+                except asyncio.TimeoutError:
+                    _requests.inc(model=model, outcome="timeout")
+                    last = _AttemptError(f"{model}: deadline exceeded")
+                    break
+                except _AttemptError as e:
+                    _requests.inc(model=model, outcome=str(e.status or "error"))
+                    last = e
+                    if not await self._wait_to_retry(model, attempt, e, deadline):
+                        break
+
+            if not self._fall_back(models, m_idx, last, deadline):
+                break
+
+        _latency.observe(time.perf_counter() - t0, outcome="error")
+        raise self._failure(last, timeout, deadline)
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.0,
+        timeout: Optional[float] = None,
+        models: Optional[Sequence[str]] = None,
+        **params: Any,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming chat completion: yields content deltas as they arrive.
+        Retries and model fallback work as in `chat()` until the first delta
+        has been yielded; after that a failure ends the stream.  The
+        deadline covers the whole stream.
+
+        :raises LLMError: when every model failed, the deadline passed, or
+                          the stream broke after it had started.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        t0 = time.perf_counter()
+        last: Optional[_AttemptError] = None
+        models = list(models or self.models)
+
+        for m_idx, model in enumerate(models):
+            payload = {"model": model, "messages": messages, "temperature": temperature, **params, "stream": True}
+            for attempt in range(self.max_retries + 1):
+                if deadline - loop.time() <= 0:
+                    break
+                started = False
+                deltas = self._stream(payload, deadline)
+                try:
+                    async for delta in deltas:
+                        started = True
+                        yield delta
+                    _requests.inc(model=model, outcome="ok")
+                    _latency.observe(time.perf_counter() - t0, outcome="ok")
+                    return
+                except asyncio.TimeoutError:
+                    _requests.inc(model=model, outcome="timeout")
+                    last = _AttemptError(f"{model}: deadline exceeded")
+                    if started:
+                        _latency.observe(time.perf_counter() - t0, outcome="error")
+                        raise LLMError(f"{last} (mid-stream)")
+                    break
+                except _AttemptError as e:
+                    _requests.inc(model=model, outcome=str(e.status or "error"))
+                    if started:
+                        # Part of the answer is already out; a retry would repeat it.
+                        _latency.observe(time.perf_counter() - t0, outcome="error")
+                        raise LLMError(f"{e} (mid-stream)", status=e.status)
+                    last = e
+                    if not await self._wait_to_retry(model, attempt, e, deadline):
+                        break
+                finally:
+                    # Also runs when the consumer stops early: releases the connection.
+                    await deltas.aclose()
+
+            if not self._fall_back(models, m_idx, last, deadline):
+                break
+
+        _latency.observe(time.perf_counter() - t0, outcome="error")
+        raise self._failure(last, timeout, deadline)
+
+    async def _wait_to_retry(self, model: str, attempt: int, e: _AttemptError, deadline: float) -> bool:
+        """Sleeps the backoff and returns True when attempt `attempt` may be retried on `model`."""
+        loop = asyncio.get_running_loop()
+        if not e.retryable or attempt == self.max_retries:
+            return False
+        delay = e.retry_after if e.retry_after is not None else backoff_delay(attempt)
+        if loop.time() + delay >= deadline:
+            return False
+        logger.warning("LLM %s attempt %d failed (%s); retrying in %.2fs", model, attempt + 1, e, delay)
+        await asyncio.sleep(delay)
+        return True
+
+    def _fall_back(self, models: List[str], m_idx: int, last: Optional[_AttemptError], deadline: float) -> bool:
+        """True when the call should move on to the model after models[m_idx]."""
+        if asyncio.get_running_loop().time() >= deadline:
+            return False
+        if last is not None and last.status is not None and last.status not in RETRYABLE_STATUS | FALLBACK_STATUS:
+            return False  # e.g. 401: no other model will do better
+        if m_idx + 1 < len(models):
+            _fallbacks.inc(from_model=models[m_idx])
+            logger.warning("LLM %s failed (%s); falling back to %s", models[m_idx], last, models[m_idx + 1])
+        return True
+
+    def _failure(self, last: Optional[_AttemptError], timeout: Optional[float], deadline: float) -> LLMError:
+        if last is None or asyncio.get_running_loop().time() >= deadline:
+            return LLMError(f"LLM call exceeded its {timeout or self.timeout:.1f}s deadline"
+                            + (f" (last error: {last})" if last else ""))
+        return LLMError(str(last), status=last.status)
+
+    async def _hedged(self, payload: Dict[str, Any], remaining: float) -> str:
+        """One attempt, duplicated after `hedge_after` s if the first is still pending."""
+        if not self.hedge_after or self.hedge_after >= remaining:
+            return await self._post(payload)
+
+        first = asyncio.ensure_future(self._post(payload))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if done:
+                return first.result()
+
+            _hedges.inc(result="started")
+            second = asyncio.ensure_future(self._post(payload))
+            tasks.append(second)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            _hedges.inc(result="won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The loser (or both, if the caller's deadline cancelled us).
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _post(self, payload: Dict[str, Any]) -> str:
+        try:
+            response = await self._client.post("/chat/completions", json=payload)
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            raise _AttemptError(f"{payload['model']}: {type(e).__name__}: {e}", retryable=True)
+
+        if response.status_code != 200:
+            raise _status_error(payload, response)
+
+        try:
+            body = response.json()
+            _raise_body_error(payload, body)
+            content = body["choices"][0]["message"]["content"]
+        except _AttemptError:
+            raise
+        except Exception as e:
+            raise _AttemptError(f"{payload['model']}: malformed response ({e})", retryable=True)
+        if not content:
+            raise _AttemptError(f"{payload['model']}: empty completion", retryable=True)
+        return content
+
+    async def _stream(self, payload: Dict[str, Any], deadline: float) -> AsyncIterator[str]:
+        """One streaming attempt: content deltas of the SSE response, each read under the deadline."""
+        loop = asyncio.get_running_loop()
+
+        def remaining() -> float:
+            left = deadline - loop.time()
+            if left <= 0:
+                raise asyncio.TimeoutError()
+            return left
+
+        request = self._client.build_request("POST", "/chat/completions", json=payload)
+        try:
+            response = await asyncio.wait_for(self._client.send(request, stream=True), remaining())
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            raise _AttemptError(f"{payload['model']}: {type(e).__name__}: {e}", retryable=True)
+
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                raise _status_error(payload, response)
+
+            lines = response.aiter_lines()
+            produced = False
+            while True:
+                try:
+                    line = await asyncio.wait_for(lines.__anext__(), remaining())
+                except StopAsyncIteration:
+                    break
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    raise _AttemptError(f"{payload['model']}: {type(e).__name__}: {e}", retryable=True)
+                # Blank separators and ": keep-alive" comments carry no data.
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError as e:
+                    raise _AttemptError(f"{payload['model']}: malformed stream chunk ({e})", retryable=True)
+                _raise_body_error(payload, chunk)
+                choices = chunk.get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta:
+                    produced = True
+                    yield delta
+            if not produced:
+                raise _AttemptError(f"{payload['model']}: empty completion", retryable=True)
+        finally:
+            await response.aclose()
+
+
+def _status_error(payload: Dict[str, Any], response: httpx.Response) -> _AttemptError:
+    status = response.status_code
+    return _AttemptError(
+        f"{payload['model']}: HTTP {status}: {response.text[:300]}",
+        status=status,
+        retryable=status in RETRYABLE_STATUS,
+        retry_after=_retry_after(response) if status in (429, 503) else None,
+    )
+
+
+def _raise_body_error(payload: Dict[str, Any], body: Dict[str, Any]):
+    # OpenRouter reports some upstream failures inside a 200 body (or chunk).
+    if "error" in body and not body.get("choices"):
+        err = body["error"] or {}
+        code = err.get("code") if isinstance(err.get("code"), int) else None
+        raise _AttemptError(f"{payload['model']}: {err.get('message', err)}", status=code,
+                            retryable=code is None or code in RETRYABLE_STATUS)
@@ -1,40 +1,119 @@
 # --- Chunking and Semantic Grouping ---
 import re
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from RAG_Model.AiClient import bge
+from RAG_Model.AiClient import bge, EMBED_MODEL_NAME
+from RAG_Model.logic.embedding_cache import cached_encode
+# Span-based chunkers, re-exported under their original names.
+from RAG_Model.logic.span_chunker import add_overlap, section_based_chunker
+from RAG_Model.logic.query_cache import get_query_cache
 import numpy as np
 from typing import List
 #from RAG_Model.logic.extract_text import load_documents
-from RAG_Model.VectorDb.connectMilvus import Collection
+from RAG_Model.VectorDb.vector_store import get_collection
+from RAG_Model.VectorDb.index_profiles import get_index_profile
+from RAG_Model.logic.lexical_index import (
+    FUSION_DEPTH, LEXICAL_FAST_PATH, get_lexical_index, identifier_terms, is_keyword_query,
+    reciprocal_rank_fusion, tokenize
+)
+from RAG_Model.VectorDb.quantization import INDEX_OVERFETCH, QUANT_OVERFETCH, needs_rerank, rerank_hits
 from PyPDF2 import PdfReader
 from typing import List, Dict, Optional
 import numpy as np
 
-def split_and_group_chunks(texts, bge, chunk_size=1000, threshold=0.9):
+# Anchor similarities are computed for this many following chunks at once;
+# longer runs are extended block by block for the anchors that start a group.
+GROUP_BAND = 16
+
+
+def anchor_runs(embeddings: np.ndarray, threshold: float, band: int = GROUP_BAND) -> np.ndarray:
+    """
+    For every chunk i, how many chunks from i onwards stay at cosine >=
+    `threshold` with chunk i (itself included), stopping at the first miss
+    and looking at most `band` chunks ahead (so values are <= band + 1).
+
+    `embeddings` must be L2-normalized.  Similarities are taken as the first
+    `band` diagonals of the Gram matrix, one row-wise dot per offset over all
+    chunks at once, instead of one `np.dot` call per pair.
+    """
+    E = np.asarray(embeddings, dtype=np.float32)
+    n = len(E)
+    # sims[i, d-1] = E[i] . E[i+d]; offsets past the end count as a miss.
+    sims = np.full((n, band), -np.inf, dtype=np.float32)
+    for d in range(1, min(band, n - 1) + 1):
+        sims[:n - d, d - 1] = np.einsum("ij,ij->i", E[:-d], E[d:])
+    misses = sims < threshold
+    return np.where(misses.any(axis=1), misses.argmax(axis=1), band) + 1
+
+
+def group_by_anchor(embeddings: np.ndarray, threshold: float = 0.9, band: int = GROUP_BAND):
+    """
+    Greedy anchor grouping: a group starts at chunk i and takes the following
+    chunks while each stays at cosine >= `threshold` with chunk i.
+
+    :return: list of (start, end) index ranges covering every chunk, in order
+    """
+    E = np.asarray(embeddings, dtype=np.float32)
+    runs = anchor_runs(E, threshold, band)
+    spans = []
+    i, n = 0, len(E)
+    while i < n:
+        j = i + int(runs[i])
+        if runs[i] > band:
+            # Whole band matched: keep scanning from the anchor.
+            while j < n:
+                below = np.flatnonzero(E[j:j + band] @ E[i] < threshold)
+                if len(below):
+                    j += int(below[0])
+                    break
+                j += band
+        j = min(j, n)
+        spans.append((i, j))
+        i = j
+    return spans
+
+
+def split_and_group_chunks(texts, bge, chunk_size=1000, threshold=0.9,
+                           return_embeddings=False, group_embedding="mean"):
+    """
+    Splits `texts` into ~`chunk_size` chunks and merges runs of consecutive
+    chunks that stay similar (cosine >= `threshold`) to the run's first chunk.
+
+    :param return_embeddings: also return one normalized vector per group, so
+                              the groups don't have to be embedded again
+    :param group_embedding: "mean" pools the members' vectors (renormalized);
+                            "encode" re-embeds only the groups that merged.
+                            Single-chunk groups always keep their own vector.
+    :return: grouped texts, or (grouped texts, float32 array) with
+             `return_embeddings`
+    """
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=0)
     chunks = splitter.split_text('\n'.join(texts))
-    print(f"\n--- {len(chunks)} Chunks Generated ---\n")
-    for i, ch in enumerate(chunks):
-        print(f"\n--- Chunk {i} ---\n{ch[:500]}...\n")
     if not chunks:
-        return []
-    embeddings = bge.encode(chunks, batch_size=32, normalize_embeddings=True)
-    grouped = []
-    N = len(chunks)
-    i = 0
-    while i < N:
-        group = [chunks[i]]
-        j = i + 1
-        while j < N:
-            sim = np.dot(embeddings[i], embeddings[j])
-            if sim >= threshold:
-                group.append(chunks[j])
-                j += 1
-            else:
-                break
-        grouped.append('\n'.join(group))
-        i = j
-    return grouped
+        return ([], np.empty((0, 0), dtype=np.float32)) if return_embeddings else []
+    embeddings = cached_encode(bge, chunks, EMBED_MODEL_NAME, batch_size=32, normalize_embeddings=True)
+    spans = group_by_anchor(embeddings, threshold)
+    grouped = ['\n'.join(chunks[i:j]) for i, j in spans]
+    if not return_embeddings:
+        return grouped
+
+    vectors = np.empty((len(spans), embeddings.shape[1]), dtype=np.float32)
+    merged = [g for g, (i, j) in enumerate(spans) if j - i > 1]
+    singles = [g for g, (i, j) in enumerate(spans) if j - i == 1]
+    vectors[singles] = embeddings[[spans[g][0] for g in singles]]
+    if merged and group_embedding == "encode":
+        vectors[merged] = cached_encode(
+            bge, [grouped[g] for g in merged], EMBED_MODEL_NAME, batch_size=32, normalize_embeddings=True
+        )
+    elif merged:
+        # Segment sums over the (contiguous) member rows.
+        starts = np.array([spans[g][0] for g in merged])
+        ends = np.array([spans[g][1] for g in merged])
+        csum = np.vstack([np.zeros((1, embeddings.shape[1]), dtype=np.float64),
+                          np.cumsum(embeddings, axis=0, dtype=np.float64)])
+        pooled = csum[ends] - csum[starts]
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        vectors[merged] = pooled
+    return grouped, vectors
 
 
 # def find_most_similar_chunks(query_embedding, chunk_embeddings, chunks, k=3):
@@ -55,6 +134,7 @@ def search_similar_chunks_multi(
     embedder,
     top_k: int = 5,
     doc_id: Optional[List[str]] = None,
+    query_emb: Optional[np.ndarray] = None,
 ) -> List[Dict]:
     """
     Search for the most similar chunks to `query` across the given Milvus collection.
@@ -64,27 +144,76 @@ def search_similar_chunks_multi(
       - doc_id:    your document identifier
       - file_name: the original PDF filename (doc_name metadata)
       - page_no:   the page number where this chunk came from
-      - score:     Milvus distance (lower = more similar for COSINE)
+      - chunk_index: position of the chunk in its document
+      - score:     Milvus distance (lower = more similar for COSINE), or the
+                   reciprocal-rank-fusion score when the lexical index is on
+
+    Keyword-style queries (part numbers, clause IDs) whose terms all
+    appear in the best lexical hit are answered from the lexical index alone,
+    without a model call.
 
     :param query:      the user’s search query
-    :param collection: an _instance_ of pymilvus.Collection already connected
+    :param collection: a pymilvus.Collection or any other `VectorStore` backend
     :param embedder:   any model with `encode(list[str], …) -> np.ndarray`
     :param top_k:      how many hits to return
     :param doc_id:    optional filter: only search chunks whose doc_id is in this list
+    :param query_emb: precomputed query vector; skips embedding when given
     """
-    # 1) Embed the query
-    query_emb = embedder.encode(
-        [query],
-        batch_size=32,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    )[0]  # shape (D,)
-
-    # 2) Build Milvus search parameters and filter expression
-    search_params = {"metric_type": "COSINE", "params": {"nprobe": 16}}
+    # 1) Embed the query (repeated / near-identical queries hit the LRU cache)
+    if query_emb is None:
+        fast = lexical_fast_path(query, doc_id, top_k)
+        if fast is not None:
+            return fast
+        query_emb = get_query_cache().embed_one(query, embedder, EMBED_MODEL_NAME)  # shape (D,)
+
+    return search_similar_chunks_batch(
+        queries=[query],
+        collection=collection,
+        embedder=embedder,
+        top_k=top_k,
+        doc_id=doc_id,
+        query_embs=np.asarray(query_emb, dtype=np.float32)[None, :]
+    )[0]
+
+
+def search_similar_chunks_batch(
+    queries: List[str],
+    collection,
+    embedder,
+    top_k: int = 5,
+    doc_id: Optional[List[str]] = None,
+    query_embs: Optional[np.ndarray] = None,
+) -> List[List[Dict]]:
+    """
+    Multi-query form of `search_similar_chunks_multi`: embeds every query in
+    one call (unless `query_embs` is given) and runs a single Milvus search
+    with nq=len(queries).  Returns one hit list per query, in order.
+
+    With the lexical index enabled, dense and BM25 hits (each FUSION_DEPTH *
+    top_k deep) are merged by reciprocal-rank fusion.
+    """
+    if not queries:
+        return []
+    if query_embs is None:
+        query_embs = get_query_cache().embed(queries, embedder, EMBED_MODEL_NAME)
+
+    # 2) Search parameters come from the collection's index profile.  For
+    #    quantized indexes (IVF_SQ8 / IVF_PQ) over-fetch and re-rank the
+    #    candidates with exact cosine on their stored float vectors.
+    profile = get_index_profile(getattr(collection, "name", None))
+    search_params = profile.search_param()
+    rerank = needs_rerank(profile.index_type)
+    output_fields = ["text", "doc_id", "doc_name", "page", "chunk_index"]
+    lexical = get_lexical_index()
+    depth = top_k * FUSION_DEPTH if lexical is not None else top_k
+    limit = depth
+    if rerank:
+        output_fields.append("embedding")
+        limit = depth * (QUANT_OVERFETCH or INDEX_OVERFETCH)
     expr = None
     if doc_id:
-        # e.g. doc_id in ["abc","def","ghi"]
+        # e.g. doc_id in ["abc","def","ghi"]; doc_id is the partition key, so
+        # Milvus only searches the partitions these ids hash to.
         safe_list = ",".join(f'"{d}"' for d in doc_id)
         expr = f'doc_id in [{safe_list}]'
 
@@ -95,75 +224,82 @@ def search_similar_chunks_multi(
     #      - "doc_name": VARCHAR, the PDF filename
     #      - "page":     INT64, the page number
     results = collection.search(
-        data=[query_emb],
+        data=[q for q in query_embs],
         anns_field="embedding",
         param=search_params,
-        limit=top_k,
+        limit=limit,
         expr=expr,
-        output_fields=["text", "doc_id", "doc_name", "page"]
+        output_fields=output_fields
     )
 
     # 4) Parse hits
-    output: List[Dict] = []
-    for hit in results[0]:
-        ent = hit.entity
-        output.append({
-            "chunk_text": ent.get("text"),
-            "doc_id":     ent.get("doc_id"),
-            "file_name":  ent.get("doc_name"),
-            "page_no":    ent.get("page"),
-            "score":      hit.distance
-        })
-    return output
-
-
-def section_based_chunker(text, min_len=200):
+    batch_output: List[List[Dict]] = []
+    for query, q, hits in zip(queries, query_embs, results):
+        scored = rerank_hits(q, list(hits), depth) if rerank else [(hit, hit.distance) for hit in hits]
+        output: List[Dict] = []
+        for hit, score in scored:
+            ent = hit.entity
+            output.append({
+                "chunk_id":   hit.id,
+                "chunk_text": ent.get("text"),
+                "doc_id":     ent.get("doc_id"),
+                "file_name":  ent.get("doc_name"),
+                "page_no":    ent.get("page"),
+                "chunk_index": ent.get("chunk_index"),
+                "score":      score
+            })
+        if lexical is not None:
+            output = reciprocal_rank_fusion([output, lexical.search(query, doc_id, depth)], top_k)
+        batch_output.append(output)
+    return batch_output
+
+
+def lexical_fast_path(query: str, doc_id: Optional[List[str]], top_k: int = 5) -> Optional[List[Dict]]:
     """
-    Splits document text into chunks by detecting section headers,
-    falls back to paragraph-based split if not found.
+    BM25-only hits for keyword-style queries, or None when the query should
+    go through dense search (not keyword-like, or the best lexical hit does
+    not contain every identifier in the query).
     """
-    # Regex: Match lines that look like headings (all caps, or start with "Section", or numbered, etc)
-    pattern = re.compile(r'^(?:[A-Z][A-Z \d\.\-:]{5,}|Section\s+\d+|[IVXLC]+\.\s)', re.MULTILINE)
-    matches = list(pattern.finditer(text))
-    chunks = []
-    if not matches:
-        # Fallback: split by paragraphs
-        paras = text.split('\n\n')
-        buf = ''
-        for para in paras:
-            buf += para + '\n\n'
-            if len(buf) > min_len:
-                chunks.append(buf.strip())
-                buf = ''
-        if buf:
-            chunks.append(buf.strip())
-    else:
-        # Cut sections by heading positions
-        for i, m in enumerate(matches):
-            start = m.start()
-            end = matches[i+1].start() if i+1 < len(matches) else len(text)
-            chunk = text[start:end].strip()
-            if len(chunk) > min_len:
-                chunks.append(chunk)
-    return chunks
-
-def add_overlap(chunks, overlap_sentences=2):
-    overlapped_chunks = []
-    for i, chunk in enumerate(chunks):
-        if i > 0:
-            prev = chunks[i-1].split('.')
-            prefix = '.'.join(prev[-overlap_sentences:]) if len(prev) > overlap_sentences else chunks[i-1]
-            overlapped_chunks.append((prefix + '\n' + chunk).strip())
-        else:
-            overlapped_chunks.append(chunk)
-    return overlapped_chunks
+    lexical = get_lexical_index()
+    if lexical is None or not LEXICAL_FAST_PATH or not is_keyword_query(query):
+        return None
+    hits = lexical.search(query, doc_id, top_k)
+    if not hits or not set(identifier_terms(query)) <= set(tokenize(hits[0]["chunk_text"] or "")):
+        return None
+    return hits
 
 
 def get_embeddings(chunks:list[str], bge) -> list[np.ndarray]:
-    # Directly encode with bge
-    return bge.encode(chunks, batch_size=32, normalize_embeddings=True)
+    # Encode with bge, serving repeated chunks from the on-disk embedding cache
+    return cached_encode(bge, chunks, EMBED_MODEL_NAME, batch_size=32, normalize_embeddings=True)
 
 import uuid
+import hashlib
+
+# Fixed namespace so the same (doc_id, content, position) always maps to the
+# same chunk ID across processes and re-uploads.
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1d3c0e-9a4b-5c1e-8f57-2b8e4a9d7c31")
+
+def make_chunk_id(doc_id: str, text: str, position: int) -> str:
+    """
+    Deterministic 36-char chunk ID from (doc_id, content hash, position).
+
+    `position` is the occurrence number of this exact text within the
+    document (0 for the first copy), not its chunk_index, so inserting or
+    deleting a paragraph does not change the IDs of every later chunk.
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{doc_id}\x00{digest}\x00{position}"))
+
+def next_chunk_id(doc_id: str, text: str, occurrences: Dict[str, int]) -> str:
+    """`make_chunk_id` for streamed chunks; `occurrences` carries the per-text counters."""
+    position = occurrences.get(text, 0)
+    occurrences[text] = position + 1
+    return make_chunk_id(doc_id, text, position)
+
+def assign_chunk_ids(doc_id: str, chunks: List[str]) -> List[str]:
+    occurrences: Dict[str, int] = {}
+    return [next_chunk_id(doc_id, c, occurrences) for c in chunks]
 
 def insert_into_vector_db(doc_id, title, chunks, embeddings, Page):
     if len(chunks) != len(embeddings):
@@ -172,11 +308,10 @@ def insert_into_vector_db(doc_id, title, chunks, embeddings, Page):
             print(f"[Chunk {i}] Length: {len(c)} | Content: {repr(c[:100])}")
         raise ValueError("Number of chunks and embeddings must match")
 
-    ids = [str(uuid.uuid4()) for _ in chunks]  # unique chunk IDs
+    ids = assign_chunk_ids(doc_id, chunks)  # deterministic chunk IDs
     chunk_indices = list(range(len(chunks)))   # 0-based indexin
 
     # Convert numpy embeddings to list if needed
-    collection_name = "rag_chunks1"
     formatted_embeddings = [vec.tolist() if hasattr(vec, 'tolist') else vec for vec in embeddings]
 
     data_to_insert = [
@@ -186,12 +321,15 @@ def insert_into_vector_db(doc_id, title, chunks, embeddings, Page):
         [title] * len(chunks),  # doc_name
         [doc_id] * len(chunks),# "doc_id"
         chunk_indices,         # "chunk_index"
-        page        # "page"
+        Page        # "page"
     ]
 
-     # ✅ Instantiate collection first
-    collection = Collection(name=collection_name)
+     # ✅ Resolve the configured collection (Milvus or embedded)
+    collection = get_collection()
     collection.insert(data=data_to_insert)
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.add_chunks(doc_id, ids, chunks, title, Page, chunk_indices)
     print(f"✅ Inserted {len(chunks)} chunks into vector DB for doc_id: {doc_id}")
 
 
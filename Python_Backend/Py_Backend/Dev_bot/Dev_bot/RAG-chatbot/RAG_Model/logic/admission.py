@@ -0,0 +1,132 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from RAG_Model.logic import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Admission control for the query endpoints ---
+# At most QUERY_MAX_CONCURRENCY requests run the query pipeline at once; up to
+# QUERY_MAX_QUEUE more wait (for at most QUERY_MAX_WAIT_S).  Anything beyond
+# that is turned away immediately with 429, a wait that times out with 503 —
+# both with a Retry-After estimated from the recent service time.
+QUERY_MAX_CONCURRENCY = int(os.getenv("QUERY_MAX_CONCURRENCY", "16"))
+QUERY_MAX_QUEUE = int(os.getenv("QUERY_MAX_QUEUE", "64"))
+QUERY_MAX_WAIT_S = float(os.getenv("QUERY_MAX_WAIT_S", "10"))
+
+# --- Executors for the blocking stages ---
+# Embedding is CPU-bound (torch releases the GIL), Milvus / SQLite calls are
+# blocking I/O; each gets its own pool so a burst of one can't starve the other.
+QUERY_CPU_WORKERS = int(os.getenv("QUERY_CPU_WORKERS", str(os.cpu_count() or 4)))
+QUERY_IO_WORKERS = int(os.getenv("QUERY_IO_WORKERS", "32"))
+
+_in_flight = metrics.gauge("rag_admission_in_flight", "Requests holding an admission slot", ("pool",))
+_queue_depth = metrics.gauge("rag_admission_queue_depth", "Requests waiting for an admission slot", ("pool",))
+_wait_hist = metrics.histogram("rag_admission_wait_seconds", "Time spent waiting for an admission slot", ("pool",))
+_rejected = metrics.counter("rag_admission_rejected_total", "Requests turned away", ("pool", "reason"))
+
+
+class Overloaded(Exception):
+    """Raised by `AdmissionController.acquire` when a request can't be admitted."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded, time-limited wait queue.
+
+        async with controller.slot():
+            ...
+
+    `acquire()` / `release()` are exposed separately for streaming responses,
+    where the slot must outlive the handler.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = QUERY_MAX_CONCURRENCY,
+                 max_queue: int = QUERY_MAX_QUEUE, max_wait: float = QUERY_MAX_WAIT_S):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._active = 0
+        self._service_s = 1.0  # EWMA of slot hold time, for Retry-After
+
+    def _retry_after(self) -> int:
+        # Time for the current backlog to drain through the available slots.
+        backlog = self._waiting + self._active
+        return max(1, math.ceil(backlog * self._service_s / self.max_concurrency))
+
+    async def acquire(self) -> float:
+        """Waits for a slot; returns the admission timestamp for `release()`."""
+        if self._active + self._waiting >= self.max_concurrency + self.max_queue:
+            _rejected.inc(pool=self.name, reason="queue_full")
+            raise Overloaded(f"{self.name}: {self._waiting} requests already queued", 429, self._retry_after())
+
+        self._waiting += 1
+        _queue_depth.set(self._waiting, pool=self.name)
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            _rejected.inc(pool=self.name, reason="wait_timeout")
+            raise Overloaded(f"{self.name}: no slot within {self.max_wait:.1f}s", 503, self._retry_after())
+        finally:
+            self._waiting -= 1
+            _queue_depth.set(self._waiting, pool=self.name)
+            _wait_hist.observe(time.perf_counter() - t0, pool=self.name)
+
+        self._active += 1
+        _in_flight.set(self._active, pool=self.name)
+        return time.perf_counter()
+
+    def release(self, admitted_at: Optional[float] = None):
+        if admitted_at is not None:
+            self._service_s = 0.8 * self._service_s + 0.2 * (time.perf_counter() - admitted_at)
+        self._active -= 1
+        _in_flight.set(self._active, pool=self.name)
+        self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        admitted_at = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def stats(self):
+        return {
+            "in_flight": self._active,
+            "queued": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "avg_service_s": round(self._service_s, 3),
+            "wait": _wait_hist.snapshot(pool=self.name),
+        }
+
+
+_cpu_pool = ThreadPoolExecutor(max_workers=QUERY_CPU_WORKERS, thread_name_prefix="query-cpu")
+_io_pool = ThreadPoolExecutor(max_workers=QUERY_IO_WORKERS, thread_name_prefix="query-io")
+
+
+async def run_cpu(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs CPU-bound `fn` (embedding, packing) on the query CPU pool."""
+    return await asyncio.get_running_loop().run_in_executor(_cpu_pool, functools.partial(fn, *args, **kwargs))
+
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs blocking I/O `fn` (vector search, SQLite) on the query I/O pool."""
+    return await asyncio.get_running_loop().run_in_executor(_io_pool, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,261 @@
+import os
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from RAG_Model.logic.query_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# --- Semantic answer cache for process_query ---
+# Entries are grouped by retrieval scope: the exact set of doc_ids a query
+# covered and its top_k.  A lookup hits on the same normalized query text or
+# on a cached query vector whose cosine similarity clears
+# ANSWER_CACHE_THRESHOLD.  Entries stored without a vector (lexical
+# fast-path queries) only ever hit on the exact text.
+#
+# The entries themselves live in process memory, so invalidate_docs() only
+# reaches the process that ran the ingest or delete.  When the backend runs
+# as several processes, point ANSWER_CACHE_VERSIONS_DB at a file they all
+# share: invalidations then bump a per-doc_id version there, and entries
+# stamped with an older version are dropped on lookup in every process.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2048"))
+ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_VERSIONS_DB = os.getenv("ANSWER_CACHE_VERSIONS_DB")
+
+# Version row bumped by every invalidation; stamps entries that cover all docs.
+_ALL_DOCS = ""
+
+Scope = Tuple[frozenset, int]
+
+
+class DocVersions:
+    """
+    Per-doc_id version counters in SQLite, shared by every process that
+    opens the same `path`.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS doc_versions (doc_id TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    def stamp(self, doc_ids: frozenset) -> Tuple[int, ...]:
+        """Current versions of `doc_ids` (of the all-docs row when empty), in sorted doc_id order."""
+        ids = sorted(doc_ids) or [_ALL_DOCS]
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            rows = dict(self._db.execute(f"SELECT doc_id, version FROM doc_versions WHERE doc_id IN ({marks})", ids).fetchall())
+        return tuple(rows.get(d, 0) for d in ids)
+
+    def bump(self, doc_ids: Iterable[str]):
+        ids = sorted(set(doc_ids) | {_ALL_DOCS})
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO doc_versions (doc_id, version) VALUES (?, 1) "
+                "ON CONFLICT(doc_id) DO UPDATE SET version = version + 1",
+                [(d,) for d in ids]
+            )
+
+
+class _Entry:
+    __slots__ = ("scope", "query", "vector", "answer", "expires_at", "stamp")
+
+    def __init__(self, scope, query, vector, answer, expires_at, stamp):
+        self.scope = scope
+        self.query = query
+        self.vector = vector
+        self.answer = answer
+        self.expires_at = expires_at
+        self.stamp = stamp
+
+
+class AnswerCache:
+    """
+    TTL + size-capped cache of successful `process_query` results.
+
+    :param maxsize:   total entries across every doc_id set (LRU eviction)
+    :param ttl:       seconds an answer stays valid
+    :param threshold: minimum cosine similarity for a semantic hit
+                      (query vectors are expected to be L2-normalized)
+    :param versions:  optional shared doc-version store; without it
+                      invalidation only affects this process
+    """
+
+    def __init__(
+        self,
+        maxsize: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL_S,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        versions: Optional[DocVersions] = None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.versions = versions
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Tuple[Scope, str], _Entry]" = OrderedDict()
+        # In-process invalidation counters per doc_id (_ALL_DOCS: any doc).
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _scope(doc_ids: Optional[Iterable[str]], top_k: int) -> Scope:
+        return frozenset(doc_ids or ()), top_k
+
+    def _local_stamp(self, doc_ids: Optional[Iterable[str]]) -> Tuple[int, ...]:
+        # Caller holds self._lock.
+        ids = sorted(set(doc_ids or ())) or [_ALL_DOCS]
+        return tuple(self._generations.get(d, 0) for d in ids)
+
+    def stamp(self, doc_ids: Optional[Iterable[str]]) -> Tuple:
+        """
+        Invalidation state of `doc_ids`.  Take it before retrieval and hand
+        it to `put()`: an answer whose documents were invalidated in between
+        is then not stored.
+        """
+        with self._lock:
+            local = self._local_stamp(doc_ids)
+        shared = self.versions.stamp(frozenset(doc_ids or ())) if self.versions is not None else None
+        return local, shared
+
+    def get(
+        self,
+        doc_ids: Optional[List[str]],
+        query: str,
+        query_vec: Optional[np.ndarray],
+        top_k: int
+    ) -> Optional[Dict[str, Any]]:
+        scope = self._scope(doc_ids, top_k)
+        norm = normalize_query(query)
+        stamp = self.stamp(scope[0])
+        now = time.time()
+        with self._lock:
+            # Entries stored before an invalidation (e.g. by another process,
+            # through the shared version store).
+            stale = [k for k, e in self._entries.items() if k[0] == scope and e.stamp != stamp]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+
+            entry = self._entries.get((scope, norm))
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end((scope, norm))
+                self.hits += 1
+                return entry.answer
+
+            # Semantic match among live entries of the same scope.
+            best_key, best_sim = None, self.threshold
+            for key, e in self._entries.items():
+                if query_vec is None:
+                    break
+                if key[0] != scope or e.expires_at <= now or e.vector is None:
+                    continue
+                sim = float(np.dot(e.vector, query_vec))
+                if sim >= best_sim:
+                    best_key, best_sim = key, sim
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                self.semantic_hits += 1
+                logger.debug("Answer cache semantic hit (cos=%.3f) for %r", best_sim, query)
+                return self._entries[best_key].answer
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        doc_ids: Optional[List[str]],
+        query: str,
+        query_vec: Optional[np.ndarray],
+        top_k: int,
+        answer: Dict[str, Any],
+        *,
+        stamp: Tuple
+    ):
+        """
+        Stores `answer`, unless the documents were invalidated since `stamp`
+        (from `stamp()`, taken before retrieval) — the answer may then be
+        built from chunks that no longer exist.
+        """
+        scope = self._scope(doc_ids, top_k)
+        key = (scope, normalize_query(query))
+        vec = None if query_vec is None else np.asarray(query_vec, dtype=np.float32)
+        fresh = self.versions is None or self.versions.stamp(scope[0]) == stamp[1]
+        with self._lock:
+            if not fresh or self._local_stamp(scope[0]) != stamp[0]:
+                logger.debug("Answer cache: not storing %r, its documents changed during the query", query)
+                return
+            self._entries[key] = _Entry(scope, key[1], vec, answer, time.time() + self.ttl, stamp)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate_docs(self, doc_ids: Iterable[str]) -> int:
+        """
+        Drops every entry of this process whose doc_id set overlaps
+        `doc_ids` and returns the count.  Other processes only see the
+        invalidation through the shared version store, if one is configured.
+        """
+        touched = set(doc_ids)
+        if self.versions is not None:
+            self.versions.bump(touched)
+        with self._lock:
+            for d in touched | {_ALL_DOCS}:
+                self._generations[d] = self._generations.get(d, 0) + 1
+            stale = [k for k in self._entries if not k[0][0] or k[0][0] & touched]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+        if stale:
+            logger.info("Answer cache: invalidated %d entries for doc_ids %s", len(stale), sorted(touched))
+        return len(stale)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "shared_versions": self.versions is not None,
+                "hit_rate": round((self.hits + self.semantic_hits) / total, 4) if total else 0.0,
+            }
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide answer cache, or None when ANSWER_CACHE=0."""
+    global _cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            versions = DocVersions(ANSWER_CACHE_VERSIONS_DB) if ANSWER_CACHE_VERSIONS_DB else None
+            _cache = AnswerCache(versions=versions)
+        return _cache
@@ -0,0 +1,196 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from RAG_Model.logic import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Bulk embedding engine for ingestion ---
+# Chunks are sorted by token length and cut into batches under a padded-token
+# budget (long chunks -> small batches, short chunks -> large ones), so
+# padding stays small.  Batches are sharded longest-first over a pool of
+# worker processes, each holding its own model with a fixed intra-op thread
+# count, and the vectors are put back in input order.
+# BULK_EMBED_WORKERS=0 (the default) keeps ingestion on the in-process model.
+BULK_EMBED_WORKERS = int(os.getenv("BULK_EMBED_WORKERS", "0"))
+# Threads per worker; 0 = cores / workers.
+BULK_EMBED_THREADS = int(os.getenv("BULK_EMBED_THREADS", "0"))
+BULK_EMBED_TOKEN_BUDGET = int(os.getenv("BULK_EMBED_TOKEN_BUDGET", "8192"))   # batch_size x padded length
+BULK_EMBED_MAX_BATCH = int(os.getenv("BULK_EMBED_MAX_BATCH", "128"))
+BULK_EMBED_MAX_LENGTH = 512
+# Ingestion hands this many chunks per encode() call when the bulk engine is
+# active (more chunks per call = more batches to spread over the workers).
+BULK_EMBED_SLICE = int(os.getenv("BULK_EMBED_SLICE", "4096"))
+
+_chunks_total = metrics.counter("rag_bulk_embed_chunks_total", "Chunks embedded by the bulk engine")
+_padding_eff = metrics.histogram(
+    "rag_bulk_embed_padding_efficiency", "Real / padded tokens per bulk encode call",
+    buckets=(0.3, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.0)
+)
+
+
+def plan_batches(lengths: Sequence[int], token_budget: int = BULK_EMBED_TOKEN_BUDGET,
+                 max_batch: int = BULK_EMBED_MAX_BATCH) -> List[np.ndarray]:
+    """
+    Length-bucketed batches: indices sorted longest-first, each batch as
+    large as fits `token_budget` at its longest member's length.
+
+    :return: index arrays, longest batch first
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    order = np.argsort(-lengths, kind="stable")
+    batches: List[np.ndarray] = []
+    start = 0
+    while start < len(order):
+        longest = max(1, int(lengths[order[start]]))
+        size = max(1, min(max_batch, token_budget // longest))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def padding_efficiency(lengths: Sequence[int], batches: List[np.ndarray]) -> float:
+    lengths = np.asarray(lengths)
+    padded = sum(int(lengths[b].max()) * len(b) for b in batches if len(b))
+    return float(lengths.sum() / padded) if padded else 1.0
+
+
+# --- worker process side ---
+_worker_model = None
+
+
+def _init_worker(backend: str, threads: int):
+    # Must happen before torch / onnxruntime create their thread pools.
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    global _worker_model
+    from RAG_Model.AiClient import load_embedder
+    _worker_model = load_embedder(backend, threads=threads)
+
+
+def _encode_batch(texts: List[str], normalize: bool) -> np.ndarray:
+    return np.asarray(
+        _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                             normalize_embeddings=normalize),
+        dtype=np.float32
+    )
+
+
+class BulkEmbedder:
+    """
+    Multi-process ingestion embedder with SentenceTransformer's `encode`
+    signature (so `cached_encode` and the ingestion pipeline can use it).
+    Worker processes are started on first use and kept for later documents.
+    """
+
+    def __init__(self, workers: int, threads: int = 0, backend: Optional[str] = None,
+                 token_budget: int = BULK_EMBED_TOKEN_BUDGET, max_batch: int = BULK_EMBED_MAX_BATCH):
+        from RAG_Model.AiClient import EMBED_BACKEND
+        self.workers = workers
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.backend = backend or EMBED_BACKEND
+        self.token_budget = token_budget
+        self.max_batch = max_batch
+        self.preferred_slice = BULK_EMBED_SLICE
+        self.last_stats: dict = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                if self.backend in ("onnx", "onnx-int8"):
+                    # Export once here rather than racing in every worker.
+                    from RAG_Model.AiClient import EMBED_MODEL_REPO
+                    from RAG_Model.logic.onnx_embedder import export_onnx
+                    export_onnx(EMBED_MODEL_REPO, quantize=self.backend == "onnx-int8")
+                logger.info("Starting %d embedding workers x %d threads (%s)", self.workers, self.threads, self.backend)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # spawn: forking a process that already runs torch threads can deadlock
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.backend, self.threads),
+                )
+            return self._pool
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        """Token counts (capped at the model window); ~4 chars/token without a tokenizer."""
+        if self._tokenizer is None:
+            try:
+                from transformers import AutoTokenizer
+                from RAG_Model.AiClient import EMBED_MODEL_REPO
+                self._tokenizer = AutoTokenizer.from_pretrained(EMBED_MODEL_REPO)
+            except Exception as e:
+                logger.warning("No tokenizer for length bucketing (%s); using character counts", e)
+                self._tokenizer = False
+        if self._tokenizer:
+            ids = self._tokenizer(texts, truncation=True, max_length=BULK_EMBED_MAX_LENGTH)["input_ids"]
+            return [len(x) for x in ids]
+        return [min(BULK_EMBED_MAX_LENGTH, len(t) // 4 + 2) for t in texts]
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, **_ignored) -> np.ndarray:
+        # batch_size is replaced by the token budget.
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        t0 = time.perf_counter()
+        lengths = self.token_lengths(texts)
+        batches = plan_batches(lengths, self.token_budget, self.max_batch)
+        pool = self._get_pool()
+        # Longest batches are submitted first so they don't end up as the tail.
+        futures = {
+            pool.submit(_encode_batch, [texts[i] for i in idx], normalize_embeddings): idx
+            for idx in batches
+        }
+        out: Optional[np.ndarray] = None
+        for fut in as_completed(futures):
+            vecs = fut.result()
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[futures[fut]] = vecs
+
+        eff = padding_efficiency(lengths, batches)
+        elapsed = time.perf_counter() - t0
+        _chunks_total.inc(len(texts))
+        _padding_eff.observe(eff)
+        self.last_stats = {
+            "chunks": len(texts),
+            "batches": len(batches),
+            "padding_efficiency": round(eff, 3),
+            "seconds": round(elapsed, 3),
+            "chunks_per_s": round(len(texts) / elapsed, 1) if elapsed else None,
+        }
+        return out[0] if single else out
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+_bulk: Optional[BulkEmbedder] = None
+_bulk_lock = threading.Lock()
+
+
+def get_bulk_embedder() -> Optional[BulkEmbedder]:
+    global _bulk
+    if BULK_EMBED_WORKERS <= 0:
+        return None
+    with _bulk_lock:
+        if _bulk is None:
+            _bulk = BulkEmbedder(BULK_EMBED_WORKERS, BULK_EMBED_THREADS)
+        return _bulk
@@ -1,19 +1,30 @@
 import os
 import sys
+import asyncio
 
 import numpy as np
 
 import re
-from  RAG_Model.AiClient import ORClient , bge
+from  RAG_Model.AiClient import ORClient , bge, EMBED_MODEL_NAME, LLM_MODELS
 #from .Section_Chunk import section_based_chunker, add_overlap
 import uuid
 
-from RAG_Model.logic.extract_text import extract_text_from_pdf, extract_text_from_docx, extract_text_from_txt, extract_text_from_txt, extract_text_from_html, extract_text_from_csv, load_documents
-from RAG_Model.logic.Chunk_embedd_store import section_based_chunker, split_and_group_chunks, insert_into_vector_db , search_similar_chunks_multi , get_embeddings , add_overlap
+from RAG_Model.logic.extract_text import iter_text_from_pdf, extract_text_from_pdf, extract_text_from_docx, extract_text_from_txt, extract_text_from_txt, extract_text_from_html, extract_text_from_csv, load_documents
+from RAG_Model.logic.Chunk_embedd_store import section_based_chunker, split_and_group_chunks, insert_into_vector_db , search_similar_chunks_multi , search_similar_chunks_batch , get_embeddings , add_overlap, assign_chunk_ids, next_chunk_id, lexical_fast_path
+from RAG_Model.logic.jobs import JobCancelled
+from RAG_Model.logic.embedding_cache import cached_encode
+from RAG_Model.logic.query_cache import get_query_cache
+from RAG_Model.logic.answer_cache import get_answer_cache
+from RAG_Model.logic.lexical_index import get_lexical_index
+from RAG_Model.logic.context_packer import get_token_counter, pack_context
+from RAG_Model.logic.json_stream import JsonArrayItemParser
+from RAG_Model.logic.admission import run_cpu, run_io
+from RAG_Model.logic import metrics
+from RAG_Model.logic.pipeline import Pipeline, batched
+from RAG_Model.VectorDb.bulk_insert import insert_columnar
 from pathlib import Path
 import json5
-from typing import List, Tuple, Dict, Any
-from pymilvus import Collection, MilvusException
+from typing import AsyncIterator, List, Tuple, Dict, Any, Optional
 import logging
 import time
 
@@ -26,25 +37,27 @@ import time
 # --- Main Q&A Pipeline ---
 logger = logging.getLogger(__name__)
 
-def insert_in_batches(collection, records, batch_size=200):
-    total = len(records)
-    logger.info("Inserting %d records in batches of %d", total, batch_size)
-
-    for start in range(0, total, batch_size):
-        batch = records[start : start + batch_size]
-        logger.info(" → Batch %d–%d", start, start + len(batch) - 1)
-        t0 = time.time()
-        try:
-            collection.insert(batch)
-        except MilvusException as e:
-            logger.error("Batch %d–%d failed: %s", start, start+len(batch)-1, e)
-            raise
-        else:
-            logger.info("   done in %.2f s", time.time() - t0)
-
-    # optional manual flush if you disabled auto-flush
-    collection.flush()
-    logger.info("All batches inserted and flushed.")
+def insert_in_batches(collection, records, batch_size=None, job=None, flush=True):
+    """
+    Row-dict front end for `insert_columnar`: converts `records` to columns
+    (one contiguous float32 embedding array) and inserts them in byte-sized,
+    pipelined batches.  `batch_size` is kept for old callers and ignored.
+    """
+    logger.info("Inserting %d records", len(records))
+    if not records:
+        return insert_columnar(collection, [], np.empty((0, 0), dtype=np.float32), [], [], [], [], [], flush=flush)
+    return insert_columnar(
+        collection,
+        ids=[r["id"] for r in records],
+        embeddings=np.stack([np.asarray(r["embedding"], dtype=np.float32) for r in records]),
+        texts=[r["text"] for r in records],
+        doc_names=[r["doc_name"] for r in records],
+        doc_ids=[r["doc_id"] for r in records],
+        chunk_indices=[r["chunk_index"] for r in records],
+        pages=[r["page"] for r in records],
+        job=job,
+        flush=flush
+    )
 
 # Map file extensions to extractor functions
 EXTRACTORS = {
@@ -56,8 +69,34 @@ EXTRACTORS = {
     ".csv": extract_text_from_csv,
 }
 
-def process_pdf_for_doc(file_path: str, doc_id: str, title: str, embedder, collection):
-
+def chunk_page(text: str, overlap_sentences: int = 2) -> List[str]:
+    """Section-chunks one page, drops empty/duplicate chunks and applies overlap."""
+    # user-supplied chunker returns list of strings   
+    raw_chunks = section_based_chunker(text)
+
+    # clean, dedupe, overlap
+    seen = set()
+    cleaned: List[str] = []
+    for chunk in raw_chunks:
+        c = chunk.strip()
+        if c and c not in seen:
+            seen.add(c)
+            cleaned.append(c)
+    # apply your overlap strategy (you’ll need to define this)
+    return add_overlap(cleaned, overlap_sentences)
+
+# Chunks are encoded in slices of this size so a job can report progress and
+# honour cancellation between slices instead of after the whole document.
+EMBED_PROGRESS_SLICE = 256
+
+def _delete_ids(collection, ids: List[str], batch_size: int = 1000):
+    for start in range(0, len(ids), batch_size):
+        id_list = ",".join(f'"{i}"' for i in ids[start:start + batch_size])
+        collection.delete(f"id in [{id_list}]")
+
+
+def _extract_and_chunk(file_path, job=None) -> Tuple[list, List[str], List[int]]:
+    """Steps 1–2 of ingestion: returns (pages, chunks, page number per chunk)."""
     file = Path(file_path)
     if not file.exists():
         raise FileNotFoundError(f"{file} does not exist")
@@ -69,71 +108,378 @@ def process_pdf_for_doc(file_path: str, doc_id: str, title: str, embedder, colle
         raise ValueError(f"Unsupported file type: {ext}")
 
     # 1) Extraction: always returns List[Tuple[text, page_no]]
+    if job is not None:
+        job.start_stage("extract")
     pages = extractor(file)
     if not pages or not any(isinstance(item, (tuple, list)) and len(item) == 2 and isinstance(item[0], str) and item[0].strip() for item in pages):
         raise ValueError("No text could be extracted from document")
+    if job is not None:
+        job.advance("extract", len(pages))
+        job.finish_stage("extract")
 
     # 2) chunk & collate
     all_chunks: List[str] = []
     all_page_nos: List[int] = []
 
+    if job is not None:
+        job.start_stage("chunk", total=len(pages))
     overlap_sentences = 2
     for text, page_no in pages:
-        # user-supplied chunker returns list of strings   
-        raw_chunks = section_based_chunker(text)
-
-        # clean, dedupe, overlap
-        seen = set()
-        cleaned: List[str] = []
-        for chunk in raw_chunks:
-            c = chunk.strip()
-            if c and c not in seen:
-                seen.add(c)
-                cleaned.append(c)
-        # apply your overlap strategy (you’ll need to define this)
-        overlapped = add_overlap(cleaned, overlap_sentences)
+        overlapped = chunk_page(text, overlap_sentences)
         all_chunks.extend(overlapped)
         all_page_nos.extend([page_no] * len(overlapped))
+        if job is not None:
+            job.advance("chunk")
 
     if not all_chunks:
         raise ValueError("Chunking produced no content")
+    if job is not None:
+        job.finish_stage("chunk")
+    return pages, all_chunks, all_page_nos
+
+
+def _embed_chunks(embedder, chunks: List[str], job=None) -> np.ndarray:
+    """Step 3 of ingestion (chunks already in the embedding cache skip the model)."""
+    if job is None:
+        return cached_encode(
+         embedder,
+         chunks,
+         EMBED_MODEL_NAME,
+         batch_size=32,
+         normalize_embeddings=True,
+         show_progress_bar=True
+        )
+    job.start_stage("embed", total=len(chunks))
+    # The bulk engine wants big slices to spread over its worker processes.
+    slice_size = getattr(embedder, "preferred_slice", EMBED_PROGRESS_SLICE)
+    parts = []
+    for start in range(0, len(chunks), slice_size):
+        job.check_cancelled()
+        piece = chunks[start:start + slice_size]
+        parts.append(cached_encode(embedder, piece, EMBED_MODEL_NAME, batch_size=32, normalize_embeddings=True))
+        job.advance("embed", len(piece))
+    job.finish_stage("embed")
+    if not parts:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.concatenate(parts, axis=0)
+
+
+def process_pdf_for_doc(file_path: str, doc_id: str, title: str, embedder, collection, job=None, streaming=None):
+    """
+    Extract → chunk → embed → insert for a single uploaded file.
+
+    :param job: optional `IngestJob`; when given, per-stage progress is
+                reported on it and cancellation is checked between stages
+                and batches.
+    :param streaming: run the bounded-memory streaming pipeline instead of
+                      materialising every stage (default: INGEST_STREAMING).
+    :return: summary dict with page and chunk counts.
+
+    If `doc_id` already has stored chunks, this is a re-upload and goes
+    through `reingest_doc`: chunk IDs are deterministic, so inserting again
+    would collide with (or, in Milvus, duplicate) the existing rows.
+    """
+    if _doc_has_rows(collection, doc_id):
+        logger.info("doc_id %s already stored; re-ingesting by diff", doc_id)
+        return reingest_doc(file_path, doc_id, title, embedder, collection, job=job)
+    if INGEST_STREAMING if streaming is None else streaming:
+        return process_doc_streaming(file_path, doc_id, title, embedder, collection, job=job)
 
-    # 3) embedembeddings = embedder.encode(all_chunks, batch_size=32, normalize_embeddings=True)
+    pages, all_chunks, all_page_nos = _extract_and_chunk(file_path, job=job)
 
-    embeddings = embedder.encode(
-     all_chunks,
-     batch_size=32,
-     normalize_embeddings=True,
-     show_progress_bar=True
-    )
+    # 3) embed
+    embeddings = _embed_chunks(embedder, all_chunks, job=job)
 
     if len(embeddings) != len(all_chunks):
         raise RuntimeError("Mismatch between chunks and embeddings")
     
-    ids = [str(uuid.uuid4()) for _ in all_chunks]  # unique chunk IDs
+    ids = assign_chunk_ids(doc_id, all_chunks)  # deterministic chunk IDs
     chunk_indices = list(range(len(all_chunks)))   # 0-based indexin
-   
-    records = []
-    for chunk_index, (chunk_id, chunk, page_no, vector) in enumerate(
-        zip(ids, all_chunks, all_page_nos, embeddings)
-    ):
-        records.append({
-            "id": chunk_id,
+
+    if job is not None:
+        job.start_stage("insert", total=len(ids))
+    try:
+        insert_stats = insert_columnar(
+            collection,
+            ids=ids,
+            embeddings=embeddings,
+            texts=all_chunks,
+            doc_names=[title] * len(ids),
+            doc_ids=[doc_id] * len(ids),
+            chunk_indices=chunk_indices,
+            pages=all_page_nos,
+            job=job
+        )
+    except JobCancelled:
+        # Roll back whatever part of this upload already reached Milvus.
+        _delete_ids(collection, ids)
+        collection.flush()
+        raise
+    if job is not None:
+        job.finish_stage("insert")
+
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.replace_doc(doc_id, ids, all_chunks, title, all_page_nos, chunk_indices)
+
+    print(f"✅ Inserted {len(all_chunks)} chunks into vector DB for doc_id: {doc_id} ({insert_stats['rows_per_s']} rows/s)")
+    return {"doc_id": doc_id, "pages": len(pages), "chunks": len(all_chunks), "insert": insert_stats}
+
+
+# --- Incremental re-ingestion ---
+def _doc_has_rows(collection, doc_id: str) -> bool:
+    return bool(collection.query(expr=f'doc_id == "{doc_id}"', output_fields=["id"], limit=1))
+
+
+def _query_doc_rows(collection, doc_id: str, output_fields: List[str], batch_size: int = 1000) -> List[Dict[str, Any]]:
+    """All stored rows of `doc_id`, paged so large documents are not capped by the query limit."""
+    expr = f'doc_id == "{doc_id}"'
+    rows: List[Dict[str, Any]] = []
+    if hasattr(collection, "query_iterator"):
+        it = collection.query_iterator(batch_size=batch_size, expr=expr, output_fields=output_fields)
+        try:
+            while True:
+                page = it.next()
+                if not page:
+                    break
+                rows.extend(page)
+        finally:
+            it.close()
+        return rows
+    offset = 0
+    while True:
+        page = collection.query(expr=expr, output_fields=output_fields, offset=offset, limit=batch_size)
+        rows.extend(page)
+        if len(page) < batch_size:
+            return rows
+        offset += batch_size
+
+
+def reingest_doc(file_path: str, doc_id: str, title: str, embedder, collection, job=None):
+    """
+    Re-ingests `doc_id` by diffing against what is already stored.
+
+    Chunk IDs are deterministic (see `assign_chunk_ids`), so a chunk whose
+    text survived the edit keeps its ID.  Only vanished chunks are deleted
+    and only new chunks are embedded and inserted.  Surviving chunks whose
+    chunk_index/page/title moved are rewritten with their *stored* vectors,
+    without calling the model.
+
+    :return: dict with unchanged / added / removed / relocated counts.
+    """
+    pages, all_chunks, all_page_nos = _extract_and_chunk(file_path, job=job)
+    ids = assign_chunk_ids(doc_id, all_chunks)
+
+    stored = {
+        row["id"]: row
+        for row in _query_doc_rows(collection, doc_id, ["id", "chunk_index", "page", "doc_name"])
+    }
+    wanted = {chunk_id: i for i, chunk_id in enumerate(ids)}
+
+    removed = [i for i in stored if i not in wanted]
+    added = [i for i, chunk_id in enumerate(ids) if chunk_id not in stored]
+    relocated = [
+        i for i, chunk_id in enumerate(ids)
+        if chunk_id in stored and (
+            stored[chunk_id].get("chunk_index") != i
+            or stored[chunk_id].get("page") != all_page_nos[i]
+            or stored[chunk_id].get("doc_name") != title
+        )
+    ]
+    unchanged = len(ids) - len(added)
+    logger.info(
+        "Re-ingest %s: %d unchanged (%d relocated), %d added, %d removed",
+        doc_id, unchanged, len(relocated), len(added), len(removed)
+    )
+
+    new_vectors = _embed_chunks(embedder, [all_chunks[i] for i in added], job=job) if added else []
+
+    def record(i, vector):
+        return {
+            "id": ids[i],
             "embedding": vector,
-            "text": chunk,
-            "doc_name":title,
-            "doc_id":doc_id,
-            "chunk_index":chunk_index,
-            "page":page_no
-        })
+            "text": all_chunks[i],
+            "doc_name": title,
+            "doc_id": doc_id,
+            "chunk_index": i,
+            "page": all_page_nos[i]
+        }
+
+    if job is not None:
+        job.start_stage("insert", total=len(added) + len(relocated) + len(removed))
+    # Nothing has been written yet; past this point the diff is applied in full.
+    if job is not None:
+        job.check_cancelled()
+
+    if added:
+        insert_columnar(
+            collection,
+            ids=[ids[i] for i in added],
+            embeddings=new_vectors,
+            texts=[all_chunks[i] for i in added],
+            doc_names=[title] * len(added),
+            doc_ids=[doc_id] * len(added),
+            chunk_indices=added,
+            pages=[all_page_nos[i] for i in added],
+            flush=False
+        )
+    for start in range(0, len(relocated), 200):
+        part = relocated[start:start + 200]
+        id_list = ",".join(f'"{ids[i]}"' for i in part)
+        vectors = {
+            row["id"]: row["embedding"]
+            for row in collection.query(expr=f"id in [{id_list}]", output_fields=["id", "embedding"])
+        }
+        collection.upsert([record(i, vectors[ids[i]]) for i in part])
+    _delete_ids(collection, removed)
+    collection.flush()
+    if job is not None:
+        job.advance("insert", len(added) + len(relocated) + len(removed))
+        job.finish_stage("insert")
+
+    # Re-tokenizing is cheap next to embedding, so the lexical side is simply rebuilt.
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.replace_doc(doc_id, ids, all_chunks, title, all_page_nos, range(len(ids)))
+
+    print(f"✅ Re-ingested doc_id {doc_id}: +{len(added)} / -{len(removed)} / ={unchanged}")
+    return {
+        "doc_id": doc_id,
+        "pages": len(pages),
+        "chunks": len(ids),
+        "unchanged": unchanged,
+        "added": len(added),
+        "removed": len(removed),
+        "relocated": len(relocated),
+    }
+
+
+# --- Streaming ingestion ---
+# extract → chunk → embed run as overlapping pipeline stages joined by bounded
+# queues while the calling thread inserts, so at most a few page batches and
+# embedding batches are alive at once regardless of document size.
+INGEST_STREAMING = os.getenv("INGEST_STREAMING", "0") == "1"
+STREAM_PAGE_BATCH = int(os.getenv("STREAM_PAGE_BATCH", "8"))
+STREAM_EMBED_BATCH = int(os.getenv("STREAM_EMBED_BATCH", "256"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "2"))
+
+def _iter_pages(file: Path, extractor):
+    if extractor is extract_text_from_pdf:
+        yield from iter_text_from_pdf(file)
+        return
+    for item in extractor(file) or []:
+        if isinstance(item, (tuple, list)) and len(item) == 2 and isinstance(item[0], str) and item[0].strip():
+            yield item[0], item[1]
+
+def process_doc_streaming(file_path: str, doc_id: str, title: str, embedder, collection, job=None):
+    """
+    Streaming variant of `process_pdf_for_doc` with bounded peak memory.
+
+    Page batches flow through `chunk_page`, then `embedder.encode`, then
+    `insert_columnar`; the stages overlap in time so the embedder works
+    while later pages are still being extracted.
+    """
+    file = Path(file_path)
+    if not file.exists():
+        raise FileNotFoundError(f"{file} does not exist")
+    extractor = EXTRACTORS.get(file.suffix.lower())
+    if not extractor:
+        raise ValueError(f"Unsupported file type: {file.suffix.lower()}")
+
+    if job is not None:
+        for stage in ("extract", "chunk", "embed", "insert"):
+            job.start_stage(stage)
+
+    counts = {"pages": 0, "chunks": 0}
+
+    def pages():
+        for page in _iter_pages(file, extractor):
+            counts["pages"] += 1
+            if job is not None:
+                job.advance("extract")
+            yield page
+
+    def chunk_stage(page_batches):
+        pending: List[Tuple[str, int]] = []
+        for batch in page_batches:
+            for text, page_no in batch:
+                pending.extend((c, page_no) for c in chunk_page(text))
+                if job is not None:
+                    job.advance("chunk")
+            while len(pending) >= STREAM_EMBED_BATCH:
+                yield pending[:STREAM_EMBED_BATCH]
+                pending = pending[STREAM_EMBED_BATCH:]
+        if pending:
+            yield pending
+
+    def embed_stage(chunk_batches):
+        for batch in chunk_batches:
+            texts = [c for c, _ in batch]
+            vectors = cached_encode(embedder, texts, EMBED_MODEL_NAME, batch_size=32, normalize_embeddings=True)
+            if len(vectors) != len(texts):
+                raise RuntimeError("Mismatch between chunks and embeddings")
+            if job is not None:
+                job.advance("embed", len(texts))
+            yield batch, vectors
+
+    pipeline = (
+        Pipeline(batched(pages(), STREAM_PAGE_BATCH), maxsize=STREAM_QUEUE_SIZE, name=f"ingest-{doc_id}")
+        .then(chunk_stage)
+        .then(embed_stage)
+    )
 
-    collection_name="rag_chunks1"    
-    collection = Collection(name=collection_name)
-    # … build your records list …
-    insert_in_batches(collection, records, batch_size=200)
+    inserted_ids: List[str] = []
+    occurrences: Dict[str, int] = {}
+    insert_s = 0.0
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.remove_doc(doc_id)
+    try:
+        for batch, vectors in pipeline:
+            batch_ids = [next_chunk_id(doc_id, chunk, occurrences) for chunk, _ in batch]
+            first = counts["chunks"]
+            inserted_ids.extend(batch_ids)
+            counts["chunks"] += len(batch)
+            stats = insert_columnar(
+                collection,
+                ids=batch_ids,
+                embeddings=vectors,
+                texts=[chunk for chunk, _ in batch],
+                doc_names=[title] * len(batch),
+                doc_ids=[doc_id] * len(batch),
+                chunk_indices=range(first, first + len(batch)),
+                pages=[page_no for _, page_no in batch],
+                job=job,
+                flush=False
+            )
+            insert_s += stats["seconds"]
+            if lexical is not None:
+                lexical.add_chunks(
+                    doc_id, batch_ids, [chunk for chunk, _ in batch], title,
+                    [page_no for _, page_no in batch], range(first, first + len(batch))
+                )
+    except JobCancelled:
+        pipeline.close()
+        if inserted_ids:
+            _delete_ids(collection, inserted_ids)
+            collection.flush()
+        if lexical is not None:
+            lexical.remove_doc(doc_id)
+        raise
+    finally:
+        pipeline.close()
+
+    if not counts["chunks"]:
+        raise ValueError("No text could be extracted from document")
+    collection.flush()
 
+    if job is not None:
+        for stage in ("extract", "chunk", "embed", "insert"):
+            job.finish_stage(stage)
 
-    print(f"✅ Inserted {len(all_chunks)} chunks into vector DB for doc_id: {doc_id}")
+    rows_per_s = round(counts["chunks"] / insert_s, 1) if insert_s else float(counts["chunks"])
+    print(f"✅ Streamed {counts['chunks']} chunks into vector DB for doc_id: {doc_id} ({rows_per_s} rows/s insert)")
+    return {"doc_id": doc_id, "pages": counts["pages"], "chunks": counts["chunks"], "insert": {"rows": counts["chunks"], "seconds": round(insert_s, 3), "rows_per_s": rows_per_s}}
 
 
     # # Final insertion to Milvus
@@ -316,6 +662,83 @@ def process_pdf_for_doc(file_path: str, doc_id: str, title: str, embedder, colle
 #         }
 #     return {'status': 'success', 'answer': parsed_answer}
 
+# --- Batched Q&A ---
+QUERY_BATCH_LLM_CONCURRENCY = int(os.getenv("QUERY_BATCH_LLM_CONCURRENCY", "4"))
+
+async def process_query_batch(
+    queries: List[str],
+    doc_id: List[str],
+    embedder,
+    llm_gateway,
+    collection,
+    top_k: int = 5,
+    max_concurrency: int = QUERY_BATCH_LLM_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """
+    Answers many questions over the same doc_id set.
+
+    All queries are embedded in one `encode` call and retrieved with a single
+    Milvus search (nq = number of uncached queries); LLM calls then go
+    through the async gateway with at most `max_concurrency` in flight.
+    Results come back in input order and a failure in one item only turns
+    that item into an error entry.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    if not queries:
+        return []
+
+    run = run_io if getattr(embedder, "batched", False) else run_cpu
+    query_embs = await run(get_query_cache().embed, queries, embedder, EMBED_MODEL_NAME)
+
+    answer_cache = get_answer_cache()
+    stamp = answer_cache.stamp(doc_id) if answer_cache is not None else None
+    todo: List[int] = []
+    for i, query in enumerate(queries):
+        hit = answer_cache.get(doc_id, query, query_embs[i], top_k) if answer_cache is not None else None
+        if hit is not None:
+            results[i] = {**hit, "cached": True}
+        else:
+            todo.append(i)
+
+    if todo:
+        try:
+            hits_per_query = await run_io(
+                search_similar_chunks_batch,
+                queries=[queries[i] for i in todo],
+                collection=collection,
+                embedder=embedder,
+                top_k=top_k,
+                doc_id=doc_id,
+                query_embs=query_embs[todo]
+            )
+        except Exception as e:
+            logger.error("Batch search failed: %s", e, exc_info=True)
+            for i in todo:
+                results[i] = {"status": "error", "message": f"Search failed: {e}", "cached": False}
+            return results
+
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def answer(i: int, relevant: List[Dict]):
+            async with sem:
+                try:
+                    result = await answer_from_hits_async(queries[i], relevant, llm_gateway)
+                except Exception as e:
+                    logger.error("Batch item %d failed: %s", i, e, exc_info=True)
+                    result = {"status": "error", "message": str(e)}
+            results[i] = {**result, "cached": False}
+            if result["status"] == "success" and answer_cache is not None:
+                try:
+                    answer_cache.put(doc_id, queries[i], query_embs[i], top_k, result, stamp=stamp)
+                except Exception as e:
+                    # The answer is still good; only caching it failed.
+                    logger.warning("Batch item %d: caching the answer failed: %s", i, e)
+
+        await asyncio.gather(*(answer(i, relevant) for i, relevant in zip(todo, hits_per_query)))
+
+    return results
+
+
 def process_query(
     query: str,
     doc_id: List[str],
@@ -329,29 +752,122 @@ def process_query(
     2) Builds a labeled context with chunk text + (file_name, page_no)
     3) Asks the LLM to answer purely from that context, returning
        a JSON array of { name, description, sources: [{file_name, page_no}, ...] }
+
+    Answers are served from the semantic answer cache when the same doc_id
+    set was already asked an equivalent question; `cached` in the result
+    says which path was taken.  Keyword-style queries that the lexical index
+    answers confidently skip the embedding model entirely (the answer cache
+    then only matches them exactly).
     """
-    # 1) retrieve top-K chunks
-    relevant = search_similar_chunks_multi(
+    answer_cache = get_answer_cache()
+    stamp = answer_cache.stamp(doc_id) if answer_cache is not None else None
+    cached, relevant, query_emb = retrieve(query, doc_id, embedder, collection, top_k)
+    if cached is not None:
+        return cached
+    result = answer_from_hits(query, relevant, llm_client)
+    if result["status"] == "success" and answer_cache is not None:
+        answer_cache.put(doc_id, query, query_emb, top_k, result, stamp=stamp)
+    return {**result, "cached": False}
+
+
+async def process_query_async(
+    query: str,
+    doc_id: List[str],
+    embedder,
+    llm_gateway,
+    collection,
+    top_k: int = 5
+) -> Dict[str, Any]:
+    """
+    `process_query` for the async handlers, as awaited stages: the lexical
+    probe and vector search run on the query I/O pool, embedding on the CPU
+    pool, and the answer comes from the pooled LLMGateway (deadline,
+    retries, hedging, model fallback).  The event loop itself never blocks.
+    """
+    answer_cache = get_answer_cache()
+    stamp = answer_cache.stamp(doc_id) if answer_cache is not None else None
+    cached, relevant, query_emb = await retrieve_async(query, doc_id, embedder, collection, top_k)
+    if cached is not None:
+        return cached
+    result = await answer_from_hits_async(query, relevant, llm_gateway)
+    if result["status"] == "success" and answer_cache is not None:
+        answer_cache.put(doc_id, query, query_emb, top_k, result, stamp=stamp)
+    return {**result, "cached": False}
+
+
+def retrieve(
+    query: str,
+    doc_id: List[str],
+    embedder,
+    collection,
+    top_k: int = 5
+) -> Tuple[Optional[Dict[str, Any]], List[Dict], Optional[np.ndarray]]:
+    """
+    Step 1 of `process_query`.
+
+    :return: (cached answer or None, retrieved hits, query embedding — None
+             when the lexical fast path answered without the embedder)
+    """
+    fast_hits = lexical_fast_path(query, doc_id, top_k)
+    query_emb = None if fast_hits is not None else get_query_cache().embed_one(query, embedder, EMBED_MODEL_NAME)
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        hit = answer_cache.get(doc_id, query, query_emb, top_k)
+        if hit is not None:
+            return {**hit, "cached": True}, [], query_emb
+
+    relevant = fast_hits if fast_hits is not None else search_similar_chunks_multi(
         query=query,
         collection=collection,
         embedder=embedder,
         top_k=top_k,
-        doc_id=doc_id                
+        doc_id=doc_id,
+        query_emb=query_emb
     )
-    if not relevant:
-        return {"status": "error", "message": "No relevant content found."}
+    return None, relevant, query_emb
 
-    # 2) build a context block, tagging each chunk with its source
-    context_lines: List[str] = []
-    for hit in relevant:
-        src = hit["file_name"]
-        pg  = hit["page_no"]
-        chunk_txt = hit["chunk_text"]
-        context_lines.append(f"[{src} | Page {pg}]\n{chunk_txt}")
 
-    context = "\n\n---\n\n".join(context_lines)
+async def retrieve_async(
+    query: str,
+    doc_id: List[str],
+    embedder,
+    collection,
+    top_k: int = 5
+) -> Tuple[Optional[Dict[str, Any]], List[Dict], Optional[np.ndarray]]:
+    """`retrieve` with each blocking step offloaded to the query executors."""
+    fast_hits = await run_io(lexical_fast_path, query, doc_id, top_k)
+    query_emb = None
+    if fast_hits is None:
+        # Through the batching service the calling thread only waits, so it
+        # shouldn't occupy one of the CPU workers.
+        run = run_io if getattr(embedder, "batched", False) else run_cpu
+        query_emb = await run(get_query_cache().embed_one, query, embedder, EMBED_MODEL_NAME)
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        hit = answer_cache.get(doc_id, query, query_emb, top_k)
+        if hit is not None:
+            return {**hit, "cached": True}, [], query_emb
+
+    relevant = fast_hits if fast_hits is not None else await run_io(
+        search_similar_chunks_multi,
+        query=query,
+        collection=collection,
+        embedder=embedder,
+        top_k=top_k,
+        doc_id=doc_id,
+        query_emb=query_emb
+    )
+    return None, relevant, query_emb
+
+
+def build_prompt(query: str, relevant: List[Dict]) -> str:
+    """
+    Step 2 of `process_query`: the labeled CONTEXT block plus the answer
+    instructions.  Adjacent chunks are merged without their overlap and the
+    context is capped at CONTEXT_TOKEN_BUDGET tokens.
+    """
+    context, pack_stats = pack_context(relevant)
 
-    # 3) craft the prompt
     Prompt = f"""You are an intelligent AI assistant designed to provide factual, insightful, and context-grounded answers based strictly on the provided CONTEXT.
 
 ## Your Objective:
@@ -378,72 +894,98 @@ If the context does not contain enough information to answer the question, retur
 
 ## YOUR ANSWER:
 """
+    logger.info(
+        "Prompt: %d tokens (context %d/%d from %d hits -> %d passages, %d packed; verbatim join was %d, tokenizer %s)",
+        get_token_counter().count(Prompt), pack_stats["context_tokens"], pack_stats["budget"],
+        pack_stats["hits"], pack_stats["passages"], pack_stats["packed_passages"],
+        pack_stats["raw_tokens"], pack_stats["tokenizer"]
+    )
+    return Prompt
+
+
+def llm_messages(Prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "You are a helpful assistant that always returns valid JSON arrays and nothing else."},
+        {"role": "user",   "content": Prompt}
+    ]
+
+
+def parse_answer(answer_text: str) -> List[Dict[str, Any]]:
+    """Extracts and parses the JSON array from the raw LLM output."""
+    fence_match = re.search(r"```json\s*([\s\S]*?)```", answer_text)
+    if fence_match:
+        answer_text = fence_match.group(1).strip()
+
+    # ── Find and extract the first balanced JSON array ──
+    start_idx = answer_text.find('[')
+    if start_idx == -1:
+        raise ValueError("No '[' found in LLM response")
+
+    depth = 0
+    end_idx = None
+    for i, ch in enumerate(answer_text[start_idx:], start=start_idx):
+        if ch == '[':
+            depth += 1
+        elif ch == ']':
+            depth -= 1
+        if depth == 0:
+            end_idx = i
+            break
+
+    if end_idx is None:
+        raise ValueError("Unable to find matching ']' for JSON array")
+
+    json_str = answer_text[start_idx:end_idx + 1]
+
+    json_str = re.sub(r',\s*(?=[\]\}])', '', json_str)
+    def balance(open_c, close_c, s):
+        o, c = s.count(open_c), s.count(close_c)
+        return s + close_c * (o - c) if o > c else s
+    json_str = balance('[', ']', json_str)
+    json_str = balance('{', '}', json_str)
+    # ── End auto-fix ──
+
+    # parse the (now hopefully balanced) JSON
+    return json5.loads(json_str)
+
+
+def unify_sources(parsed: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collects the distinct (file_name, page_no) sources across answer items."""
+    seen = set()
+    unified_sources = []
+    for item in parsed:
+        for s in item.get("sources", []):
+            key = (s["file_name"], s["page_no"])
+            if key not in seen:
+                seen.add(key)
+                unified_sources.append({"file_name": s["file_name"], "page_no": s["page_no"]})
+    return unified_sources
+
+
+def answer_from_hits(query: str, relevant: List[Dict], llm_client) -> Dict[str, Any]:
+    """
+    Steps 2–3 of `process_query`: builds the labeled context from retrieved
+    hits, asks the LLM and parses its JSON array answer.
+    """
+    if not relevant:
+        return {"status": "error", "message": "No relevant content found."}
+
+    Prompt = build_prompt(query, relevant)
 
     try:
         chat_response = llm_client.chat.completions.create(
-            model="tngtech/deepseek-r1t2-chimera:free",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that always returns valid JSON arrays and nothing else."},
-                {"role": "user",   "content": Prompt}
-            ],
+            model=LLM_MODELS[0],
+            messages=llm_messages(Prompt),
             temperature=0.0,
         )
         answer_text = chat_response.choices[0].message.content
-        
-        fence_match = re.search(r"```json\s*([\s\S]*?)```", answer_text)
-        if fence_match:
-            answer_text = fence_match.group(1).strip()
-
-        # ── 2) Find and extract the first balanced JSON array ──
-        start_idx = answer_text.find('[')
-        if start_idx == -1:
-            raise ValueError("No '[' found in LLM response")
-
-        depth = 0
-        end_idx = None
-        for i, ch in enumerate(answer_text[start_idx:], start=start_idx):
-            if ch == '[':
-                depth += 1
-            elif ch == ']':
-                depth -= 1
-            if depth == 0:
-                end_idx = i
-                break
-
-        if end_idx is None:
-            raise ValueError("Unable to find matching ']' for JSON array")
-
-        json_str = answer_text[start_idx:end_idx + 1]
-
-        json_str = re.sub(r',\s*(?=[\]\}])', '', json_str)
-        def balance(open_c, close_c, s):
-            o, c = s.count(open_c), s.count(close_c)
-            return s + close_c * (o - c) if o > c else s
-        json_str = balance('[', ']', json_str)
-        json_str = balance('{', '}', json_str)
-        # ── End auto-fix ──
-
-        # parse the (now hopefully balanced) JSON
-        parsed: List[Dict[str, Any]] = json5.loads(json_str)
-
-        parsed = json5.loads(json_str)
-
-
-        # 6) collect a unified sources list
-        seen = set()
-        unified_sources = []
-        for item in parsed:
-            for s in item.get("sources", []):
-                key = (s["file_name"], s["page_no"])
-                if key not in seen:
-                    seen.add(key)
-                    unified_sources.append({"file_name": s["file_name"], "page_no": s["page_no"]})
-
-        # 7) return both the structured answer and the overall sources
+        parsed = parse_answer(answer_text)
+
+        # return both the structured answer and the overall sources
         return {
             "status": "success",
             "answer": parsed,
-            "sources": unified_sources
+            "sources": unify_sources(parsed)
         }
 
     except Exception as e:
@@ -452,7 +994,31 @@ If the context does not contain enough information to answer the question, retur
             "status": "error",
             "message": f"{e}\nRaw LLM output:\n{answer_text if 'answer_text' in locals() else ''}"
         }
-    
+
+
+async def answer_from_hits_async(query: str, relevant: List[Dict], llm_gateway) -> Dict[str, Any]:
+    """`answer_from_hits` through the async LLMGateway."""
+    if not relevant:
+        return {"status": "error", "message": "No relevant content found."}
+
+    answer_text = ""
+    try:
+        Prompt = await run_cpu(build_prompt, query, relevant)
+        answer_text = await llm_gateway.chat(llm_messages(Prompt), temperature=0.0)
+        parsed = parse_answer(answer_text)
+        return {
+            "status": "success",
+            "answer": parsed,
+            "sources": unify_sources(parsed)
+        }
+    except Exception as e:
+        logger.error("Failed processing query: %s", e, exc_info=True)
+        return {
+            "status": "error",
+            "message": f"{e}\nRaw LLM output:\n{answer_text}"
+        }
+
+
     # ✅ Extract full JSON block (more flexible)
     #  json_array_match = re.search(r'\[\s*{[\s\S]*?}\s*\]', answer_text)
     #  if not json_array_match:
@@ -472,4 +1038,110 @@ If the context does not contain enough information to answer the question, retur
     #  return {
     #         'status': 'error',
     #         'message': f"Failed to parse AI response as JSON.\nError: {e}\nRaw Model Output:\n{answer_text}"
-    #     }
\ No newline at end of file
+    #     }
+
+
+# --- Streaming Q&A ---
+# `stream_query` yields (event, data) pairs for the SSE endpoint: one `item`
+# per answer object as soon as its closing brace arrives from the LLM, then
+# `done` with the unified sources and timings (or `error`).
+_ttfi_hist = metrics.histogram(
+    "rag_query_stream_ttfi_seconds", "Time from request to the first streamed answer item"
+)
+_stream_total_hist = metrics.histogram(
+    "rag_query_stream_total_seconds", "Time from request to the end of a streamed answer"
+)
+_stream_count = metrics.counter(
+    "rag_query_stream_total", "Streamed queries by outcome", ("outcome",)
+)
+
+
+async def stream_query(
+    query: str,
+    doc_id: List[str],
+    embedder,
+    llm_gateway,
+    collection,
+    top_k: int = 5
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming variant of `process_query_async`.  Retrieval and the answer
+    cache behave the same; the answer comes from `llm_gateway.chat_stream`
+    (deadline, retries and model fallback until the first token) and the
+    JSON array is parsed as it arrives, so the first item reaches the client
+    while the rest is still being generated.
+    """
+    t0 = time.perf_counter()
+    ttfi: Optional[float] = None
+
+    def first_item():
+        nonlocal ttfi
+        if ttfi is None:
+            ttfi = time.perf_counter() - t0
+            _ttfi_hist.observe(ttfi)
+
+    def done(status: str, sources, cached: bool) -> Tuple[str, Dict[str, Any]]:
+        total = time.perf_counter() - t0
+        _stream_total_hist.observe(total)
+        _stream_count.inc(outcome="cached" if cached else status)
+        return "done", {
+            "status": status,
+            "sources": sources,
+            "cached": cached,
+            "ttfi_ms": round(ttfi * 1000, 1) if ttfi is not None else None,
+            "total_ms": round(total * 1000, 1),
+        }
+
+    answer_cache = get_answer_cache()
+    try:
+        stamp = answer_cache.stamp(doc_id) if answer_cache is not None else None
+        cached, relevant, query_emb = await retrieve_async(query, doc_id, embedder, collection, top_k)
+    except Exception as e:
+        logger.error("Stream retrieval failed: %s", e, exc_info=True)
+        _stream_count.inc(outcome="error")
+        yield "error", {"message": f"Search failed: {e}"}
+        return
+
+    if cached is not None:
+        for item in cached["answer"]:
+            first_item()
+            yield "item", item
+        yield done("success", cached["sources"], cached=True)
+        return
+
+    if not relevant:
+        _stream_count.inc(outcome="error")
+        yield "error", {"message": "No relevant content found."}
+        return
+
+    parser = JsonArrayItemParser()
+    items: List[Dict[str, Any]] = []
+    deltas = llm_gateway.chat_stream(llm_messages(build_prompt(query, relevant)), temperature=0.0)
+    try:
+        async for delta in deltas:
+            for item in parser.feed(delta):
+                first_item()
+                items.append(item)
+                yield "item", item
+            if parser.done:
+                break  # the array is closed; don't wait for trailing tokens
+
+        # Nothing came out incrementally (e.g. a truncated array the
+        # balancing fix-up can still rescue): fall back to the full parse.
+        if not items:
+            for item in parse_answer(parser.buffer):
+                first_item()
+                items.append(item)
+                yield "item", item
+    except Exception as e:
+        logger.error("Streaming answer failed: %s", e, exc_info=True)
+        _stream_count.inc(outcome="error")
+        yield "error", {"message": f"{e}\nRaw LLM output:\n{parser.buffer}"}
+        return
+    finally:
+        await deltas.aclose()
+
+    sources = unify_sources(items)
+    if answer_cache is not None:
+        answer_cache.put(doc_id, query, query_emb, top_k, {"status": "success", "answer": items, "sources": sources}, stamp=stamp)
+    yield done("success", sources, cached=False)
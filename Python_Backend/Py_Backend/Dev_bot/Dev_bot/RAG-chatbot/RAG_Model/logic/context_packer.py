@@ -0,0 +1,193 @@
+import os
+import re
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Context assembly between retrieval and the LLM call ---
+# Hits from the same document with consecutive chunk_index are merged into
+# one passage, the sentences `add_overlap` repeated at each seam are dropped,
+# and passages are packed in retrieval order until CONTEXT_TOKEN_BUDGET.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# A passage that doesn't fit is truncated only if at least this many tokens remain.
+CONTEXT_MIN_PASSAGE_TOKENS = 64
+# tiktoken encoding used for counting; falls back to the embedder's tokenizer.
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")
+# Shortest suffix/prefix match treated as overlap rather than coincidence
+# (the first-line check below is a stronger signal, so it accepts less).
+MIN_OVERLAP_CHARS = 16
+MIN_OVERLAP_LINE_CHARS = 4
+MAX_OVERLAP_CHARS = 4000
+PASSAGE_SEPARATOR = "\n\n---\n\n"
+
+_WORDS = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    """Counts / truncates text with tiktoken, a Hugging Face tokenizer, or (last resort) a word split."""
+
+    def __init__(self, encode, decode, name: str):
+        self._encode = encode
+        self._decode = decode
+        self.name = name
+
+    def count(self, text: str) -> int:
+        return len(self._encode(text)) if text else 0
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self._encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return self._decode(tokens[:max_tokens])
+
+
+def _load_counter() -> TokenCounter:
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding(CONTEXT_TOKENIZER)
+        return TokenCounter(lambda t: enc.encode(t, disallowed_special=()), enc.decode, f"tiktoken:{CONTEXT_TOKENIZER}")
+    except Exception as e:
+        logger.info("tiktoken unavailable (%s); counting with the embedder tokenizer", e)
+    try:
+        from RAG_Model.AiClient import bge
+        tok = bge.tokenizer
+        return TokenCounter(
+            lambda t: tok(t, add_special_tokens=False, verbose=False)["input_ids"],
+            lambda ids: tok.decode(ids),
+            "embedder"
+        )
+    except Exception as e:
+        logger.warning("No tokenizer available (%s); approximating tokens by words", e)
+        return TokenCounter(_WORDS.findall, " ".join, "words")
+
+
+_counter: Optional[TokenCounter] = None
+_counter_lock = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    global _counter
+    with _counter_lock:
+        if _counter is None:
+            _counter = _load_counter()
+        return _counter
+
+
+def overlap_length(a: str, b: str, max_len: int = MAX_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b`."""
+    a, b = a[-max_len:], b[:max_len]
+    s = b + "\x00" + a
+    fail = [0] * len(s)
+    for i in range(1, len(s)):
+        k = fail[i - 1]
+        while k and s[i] != s[k]:
+            k = fail[k - 1]
+        if s[i] == s[k]:
+            k += 1
+        fail[i] = k
+    return fail[-1]
+
+
+def strip_overlap(prev: str, text: str) -> str:
+    """`text` without the leading part it repeats from the end of `prev`."""
+    # add_overlap joins the repeated tail and the chunk with a newline.
+    head, sep, rest = text.partition("\n")
+    if sep and len(head.strip()) >= MIN_OVERLAP_LINE_CHARS and prev.rstrip().endswith(head.strip()):
+        return rest.lstrip()
+    n = overlap_length(prev, text)
+    return text[n:].lstrip() if n >= MIN_OVERLAP_CHARS else text
+
+
+def merge_adjacent(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Groups hits into passages: runs of consecutive chunk_index within one
+    doc_id become a single passage with the seam overlap removed.  Passages
+    are returned in the order of their best-ranked hit.
+    """
+    by_doc: Dict[Any, List[Tuple[int, int, Dict[str, Any]]]] = {}
+    loose: List[Tuple[int, Dict[str, Any]]] = []
+    seen = set()
+    for rank, hit in enumerate(hits):
+        key = hit.get("chunk_id") or (hit.get("doc_id"), hit.get("chunk_text"))
+        if key in seen:
+            continue
+        seen.add(key)
+        if hit.get("chunk_index") is None:
+            loose.append((rank, hit))
+        else:
+            by_doc.setdefault(hit.get("doc_id"), []).append((int(hit["chunk_index"]), rank, hit))
+
+    passages: List[Tuple[int, Dict[str, Any]]] = []
+    for rank, hit in loose:
+        passages.append((rank, {"text": hit["chunk_text"] or "", "file_name": hit["file_name"],
+                                "pages": [hit["page_no"]], "hits": 1}))
+    for run_hits in by_doc.values():
+        run_hits.sort(key=lambda t: t[0])
+        run: List[Tuple[int, int, Dict[str, Any]]] = []
+        for item in run_hits + [None]:
+            if item is not None and (not run or item[0] == run[-1][0] + 1):
+                run.append(item)
+                continue
+            text = run[0][2]["chunk_text"] or ""
+            pages = [run[0][2]["page_no"]]
+            for _, _, hit in run[1:]:
+                text = text.rstrip() + "\n" + strip_overlap(text, hit["chunk_text"] or "")
+                if hit["page_no"] not in pages:
+                    pages.append(hit["page_no"])
+            passages.append((min(r for _, r, _ in run), {
+                "text": text, "file_name": run[0][2]["file_name"], "pages": pages, "hits": len(run)
+            }))
+            run = [item] if item is not None else []
+    passages.sort(key=lambda p: p[0])
+    return [p for _, p in passages]
+
+
+def _label(passage: Dict[str, Any]) -> str:
+    pages = ", ".join(str(p) for p in passage["pages"])
+    return f"[{passage['file_name']} | Page {pages}]"
+
+
+def pack_context(hits: List[Dict[str, Any]], budget: int = CONTEXT_TOKEN_BUDGET,
+                 counter: Optional[TokenCounter] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Builds the CONTEXT block for the prompt from retrieval hits.
+
+    :return: (context text, stats) — stats has hit / passage counts, the
+             tokens the verbatim join would have used and the tokens packed.
+    """
+    counter = counter or get_token_counter()
+    passages = merge_adjacent(hits)
+    sep_tokens = counter.count(PASSAGE_SEPARATOR)
+
+    blocks: List[str] = []
+    used = 0
+    truncated = 0
+    for passage in passages:
+        block = f"{_label(passage)}\n{passage['text']}"
+        cost = counter.count(block) + (sep_tokens if blocks else 0)
+        if used + cost > budget:
+            room = budget - used - (sep_tokens if blocks else 0)
+            if room >= CONTEXT_MIN_PASSAGE_TOKENS:
+                blocks.append(counter.truncate(block, room))
+                used = budget
+                truncated += 1
+            break
+        blocks.append(block)
+        used += cost
+
+    raw_tokens = counter.count(PASSAGE_SEPARATOR.join(
+        f"[{h['file_name']} | Page {h['page_no']}]\n{h['chunk_text']}" for h in hits
+    ))
+    stats = {
+        "hits": len(hits),
+        "passages": len(passages),
+        "packed_passages": len(blocks),
+        "truncated": truncated,
+        "raw_tokens": raw_tokens,
+        "context_tokens": used,
+        "budget": budget,
+        "tokenizer": counter.name,
+    }
+    return PASSAGE_SEPARATOR.join(blocks), stats
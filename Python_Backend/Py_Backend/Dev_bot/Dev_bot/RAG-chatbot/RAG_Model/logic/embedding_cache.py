@@ -0,0 +1,324 @@
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Persistent content-addressed embedding cache ---
+# Vectors live in one memory-mapped float32 matrix (`vectors.f32`, one row per
+# slot); a small SQLite index maps hash(model, normalized text) -> slot and
+# keeps a last-used tick for LRU eviction.  Slot allocation (next free slot,
+# freed-slot list) is kept in SQLite and done under a write transaction, so
+# several processes can share one cache directory.
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE", "1") == "1"
+EMBED_CACHE_DIR = os.getenv(
+    "EMBED_CACHE_DIR",
+    str(Path(__file__).resolve().parent.parent / "cache" / "embeddings")
+)
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+# Fraction of the cache freed in one go when it is full, so eviction is not
+# paid on every insert.
+EVICT_FRACTION = 0.05
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace-insensitive form of a chunk used for cache keys."""
+    return " ".join(text.split())
+
+
+def cache_key(model_name: str, text: str, normalize_embeddings: bool = True) -> bytes:
+    h = hashlib.sha256()
+    h.update(f"{model_name}\x00{int(normalize_embeddings)}\x00".encode("utf-8"))
+    h.update(normalize_text(text).encode("utf-8"))
+    return h.digest()[:16]
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache with a fixed slot capacity and LRU eviction.
+    Safe to share between processes on one host.
+
+    :param path:        directory holding `vectors.f32` and `index.sqlite`
+    :param max_entries: number of vector slots (the size cap)
+    :param dim:         vector dimension; taken from the first `put_many`
+                        when the cache is created empty
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_DIR, max_entries: int = EMBED_CACHE_MAX_ENTRIES, dim: Optional[int] = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are opened explicitly with _write().
+        self._db = sqlite3.connect(
+            str(self.path / "index.sqlite"), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._write():
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, slot INTEGER NOT NULL, last_used INTEGER NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY)")
+
+            meta = dict(self._db.execute("SELECT name, value FROM meta").fetchall())
+            if meta.get("capacity", max_entries) != max_entries:
+                # Capacity is baked into the memmap shape; start over rather than
+                # guess how to remap slots.
+                logger.warning("Embedding cache capacity changed (%s → %s); resetting %s", meta.get("capacity"), max_entries, self.path)
+                self._reset()
+                meta = {}
+            if "next_slot" not in meta:
+                # Caches written before slot allocation moved into SQLite.
+                self._init_allocator()
+            self._db.execute("INSERT OR IGNORE INTO meta VALUES ('capacity', ?)", (max_entries,))
+        self.dim: Optional[int] = meta.get("dim", dim)
+        self._vectors: Optional[np.memmap] = None
+        if self.dim:
+            self._open_vectors()
+        self._tick = (self._db.execute("SELECT MAX(last_used) FROM entries").fetchone()[0] or 0)
+
+    @contextmanager
+    def _write(self):
+        """Write transaction; BEGIN IMMEDIATE serialises writers across processes."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _init_allocator(self):
+        next_slot = (self._db.execute("SELECT MAX(slot) FROM entries").fetchone()[0] or -1) + 1
+        used = {row[0] for row in self._db.execute("SELECT slot FROM entries")}
+        self._db.executemany("INSERT OR IGNORE INTO free_slots VALUES (?)", [(s,) for s in range(next_slot) if s not in used])
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('next_slot', ?)", (next_slot,))
+
+    def _reset(self):
+        self._db.execute("DELETE FROM entries")
+        self._db.execute("DELETE FROM meta")
+        self._db.execute("DELETE FROM free_slots")
+        vec_file = self.path / "vectors.f32"
+        if vec_file.exists():
+            vec_file.unlink()
+
+    def _open_vectors(self):
+        vec_file = self.path / "vectors.f32"
+        # Create / grow without truncating: another process may already be
+        # writing to the file.
+        fd = os.open(vec_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = self.max_entries * self.dim * np.dtype(np.float32).itemsize
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+        self._vectors = np.memmap(vec_file, dtype=np.float32, mode="r+", shape=(self.max_entries, self.dim))
+        with self._write():
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (self.dim,))
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('capacity', ?)", (self.max_entries,))
+
+    def _ensure_vectors(self) -> bool:
+        """Opens the vector file once any process has fixed the dimension."""
+        if self._vectors is None:
+            row = self._db.execute("SELECT value FROM meta WHERE name='dim'").fetchone()
+            if row:
+                self.dim = row[0]
+                self._open_vectors()
+        return self._vectors is not None
+
+    def _next_tick(self) -> int:
+        # Wall-clock based so ticks from different processes are comparable.
+        self._tick = max(self._tick + 1, time.time_ns() // 1000)
+        return self._tick
+
+    def _lookup(self, keys: Sequence[bytes]) -> Dict[bytes, int]:
+        slots: Dict[bytes, int] = {}
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            q = f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(part))})"
+            slots.update(self._db.execute(q, part).fetchall())
+        return slots
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[int, np.ndarray]:
+        """
+        Looks up `keys`; returns {position in keys: vector copy} for hits and
+        bumps their LRU tick.
+        """
+        found: Dict[int, np.ndarray] = {}
+        if not keys:
+            return found
+        with self._lock:
+            if not self._ensure_vectors():
+                self.misses += len(keys)
+                return found
+            uniq = list(dict.fromkeys(keys))
+            slots = self._lookup(uniq)
+            vecs = {k: np.array(self._vectors[slot]) for k, slot in slots.items()}
+            if slots:
+                # Another process may have evicted a key and reused its slot
+                # while we were copying; evictions commit before the slot is
+                # rewritten, so keys still mapped to the same slot are valid.
+                still = self._lookup(list(slots))
+                vecs = {k: v for k, v in vecs.items() if still.get(k) == slots[k]}
+            if vecs:
+                tick = self._next_tick()
+                with self._write():
+                    self._db.executemany("UPDATE entries SET last_used=? WHERE key=?", [(tick, k) for k in vecs])
+            for i, k in enumerate(keys):
+                if k in vecs:
+                    found[i] = vecs[k]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+        with self._lock:
+            if not self._ensure_vectors():
+                self.dim = int(vectors.shape[1])
+                self._open_vectors()
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding cache holds dim={self.dim}, got {vectors.shape[1]}")
+            pending = {}
+            for k, v in zip(keys, vectors):
+                pending[k] = v
+            existing = self._lookup(list(pending))
+            new_keys = [k for k in pending if k not in existing][: self.max_entries]
+            if not new_keys:
+                return
+
+            # Make room first, in its own transaction: freed slots are only
+            # reused after the eviction is visible to readers (see get_many).
+            with self._write():
+                available = self._db.execute("SELECT COUNT(*) FROM free_slots").fetchone()[0]
+                available += self.max_entries - self._meta("next_slot")
+                if available < len(new_keys):
+                    self._evict(max(len(new_keys) - available, int(self.max_entries * EVICT_FRACTION), 1))
+
+            tick = self._next_tick()
+            with self._write():
+                # Re-check under the write lock: another process may have
+                # cached some of these keys meanwhile.
+                existing = self._lookup(new_keys)
+                new_keys = [k for k in new_keys if k not in existing]
+                slots = self._take_slots(len(new_keys))
+                # Fewer slots than keys only if other writers took the room
+                # we freed; the cache is best-effort, so cache what fits.
+                new_keys = new_keys[:len(slots)]
+                for k, slot in zip(new_keys, slots):
+                    self._vectors[slot] = pending[k]
+                self._vectors.flush()
+                self._db.executemany("INSERT INTO entries VALUES (?, ?, ?)", [(k, s, tick) for k, s in zip(new_keys, slots)])
+
+    def _meta(self, name: str) -> int:
+        return self._db.execute("SELECT value FROM meta WHERE name=?", (name,)).fetchone()[0]
+
+    def _take_slots(self, n: int) -> List[int]:
+        """Pops up to `n` slots from the free list, then from the unused tail (inside _write)."""
+        slots = [r[0] for r in self._db.execute("SELECT slot FROM free_slots LIMIT ?", (n,)).fetchall()]
+        self._db.executemany("DELETE FROM free_slots WHERE slot=?", [(s,) for s in slots])
+        next_slot = self._meta("next_slot")
+        fresh = min(n - len(slots), self.max_entries - next_slot)
+        if fresh > 0:
+            slots.extend(range(next_slot, next_slot + fresh))
+            self._db.execute("UPDATE meta SET value=? WHERE name='next_slot'", (next_slot + fresh,))
+        return slots
+
+    def _evict(self, n: int):
+        victims = self._db.execute("SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (n,)).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE key=?", [(k,) for k, _ in victims])
+        self._db.executemany("INSERT OR IGNORE INTO free_slots VALUES (?)", [(slot,) for _, slot in victims])
+        self.evictions += len(victims)
+        logger.debug("Embedding cache evicted %d entries", len(victims))
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "capacity": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache instance, or None when EMBED_CACHE=0."""
+    global _cache
+    if not EMBED_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+def cached_encode(
+    embedder,
+    texts: List[str],
+    model_name: str,
+    batch_size: int = 32,
+    normalize_embeddings: bool = True,
+    cache: Optional[EmbeddingCache] = None,
+    **encode_kwargs
+) -> np.ndarray:
+    """
+    `embedder.encode` with the embedding cache in front of it.
+
+    Only texts missing from the cache (deduplicated) reach the model; the
+    result is a float32 array aligned with `texts`.
+    """
+    cache = cache if cache is not None else get_embedding_cache()
+    if cache is None or not texts:
+        return np.asarray(
+            embedder.encode(texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings, **encode_kwargs),
+            dtype=np.float32
+        )
+
+    keys = [cache_key(model_name, t, normalize_embeddings) for t in texts]
+    found = cache.get_many(keys)
+
+    missing: Dict[bytes, int] = {}
+    for i, k in enumerate(keys):
+        if i not in found and k not in missing:
+            missing[k] = i
+    if missing:
+        miss_texts = [texts[i] for i in missing.values()]
+        new_vecs = np.asarray(
+            embedder.encode(miss_texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings, **encode_kwargs),
+            dtype=np.float32
+        )
+        cache.put_many(list(missing), new_vecs)
+        by_key = dict(zip(missing, new_vecs))
+    else:
+        by_key = {}
+
+    dim = next(iter(found.values())).shape[0] if found else by_key[keys[0]].shape[0]
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    for i, k in enumerate(keys):
+        out[i] = found[i] if i in found else by_key[k]
+    logger.debug("Embedding cache: %d hits, %d encoded", len(found), len(missing))
+    return out
@@ -0,0 +1,251 @@
+import os
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, List, Optional
+
+import numpy as np
+
+from RAG_Model.logic import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Micro-batching embedding service ---
+# Concurrent `encode` calls (one query each, or ingestion slices) are queued
+# and a single worker thread runs them through the model as one batch once
+# EMBED_MAX_BATCH texts are waiting or the oldest has waited EMBED_MAX_WAIT_MS.
+# Queries are always taken before ingestion texts, and large ingestion
+# requests are consumed a batch at a time so a query never waits behind a
+# whole document.
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "1") == "1"
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+PRIORITY_QUERY = 0
+PRIORITY_INGEST = 1
+_PRIORITY_NAMES = {PRIORITY_QUERY: "query", PRIORITY_INGEST: "ingest"}
+
+_batch_size = metrics.histogram(
+    "rag_embed_batch_size", "Texts per model call in the embedding service",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+_queue_wait = metrics.histogram(
+    "rag_embed_queue_wait_seconds", "Time from enqueue until a request's first text is encoded", ("priority",),
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+_encode_time = metrics.histogram("rag_embed_encode_seconds", "Model time per embedding batch")
+_queued_texts = metrics.gauge("rag_embed_queued_texts", "Texts waiting in the embedding service", ("priority",))
+
+
+class _Request:
+    __slots__ = ("texts", "normalize", "priority", "enqueued", "pos", "parts", "future", "started")
+
+    def __init__(self, texts: List[str], normalize: bool, priority: int):
+        self.texts = texts
+        self.normalize = normalize
+        self.priority = priority
+        self.enqueued = time.perf_counter()
+        self.pos = 0                  # next text to hand to the model
+        self.parts: List[np.ndarray] = []
+        self.future: Future = Future()
+        self.started = False
+
+
+class EmbeddingService:
+    """
+    Batches `encode` calls from many threads onto one model.
+
+    `client(priority)` returns an object with a SentenceTransformer-style
+    `encode(texts, ...)`, so it can be passed anywhere an `embedder` is
+    expected (query cache, `cached_encode`, ingestion).
+    """
+
+    def __init__(self, model, max_batch: int = EMBED_MAX_BATCH, max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._heap: list = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.batches = 0
+        self.texts = 0
+        self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._worker.start()
+
+    def client(self, priority: int = PRIORITY_QUERY) -> "EmbeddingClient":
+        return EmbeddingClient(self, priority)
+
+    def submit(self, texts: List[str], normalize_embeddings: bool = True,
+               priority: int = PRIORITY_QUERY) -> Future:
+        """Queues `texts`; the future resolves to a (len(texts), D) float32 array."""
+        req = _Request(list(texts), normalize_embeddings, priority)
+        if not req.texts:
+            req.future.set_result(np.empty((0, 0), dtype=np.float32))
+            return req.future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Embedding service is closed")
+            heapq.heappush(self._heap, (priority, self._seq, req))
+            self._seq += 1
+            _queued_texts.inc(len(req.texts), priority=_PRIORITY_NAMES.get(priority, priority))
+            self._cond.notify()
+        return req.future
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True,
+               priority: int = PRIORITY_QUERY) -> np.ndarray:
+        return self.submit(texts, normalize_embeddings, priority).result()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+
+    # --- worker side ---
+
+    def _collect(self):
+        """Blocks until a batch is due; returns [(request, start, stop)] slices."""
+        with self._cond:
+            while not self._heap and not self._closed:
+                self._cond.wait()
+            if not self._heap:
+                return None
+            # Hold the batch open for late arrivals, but no longer than the
+            # oldest queued request's max wait.
+            oldest = min(req.enqueued for _, _, req in self._heap)
+            while not self._closed:
+                waiting = sum(len(req.texts) - req.pos for _, _, req in self._heap)
+                remaining = oldest + self.max_wait - time.perf_counter()
+                if waiting >= self.max_batch or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            normalize = self._heap[0][2].normalize
+            batch, room, deferred = [], self.max_batch, []
+            while self._heap and room:
+                prio, seq, req = heapq.heappop(self._heap)
+                if req.future.done():
+                    continue  # failed with an earlier batch
+                if req.normalize != normalize:
+                    deferred.append((prio, seq, req))
+                    continue
+                take = min(room, len(req.texts) - req.pos)
+                batch.append((req, req.pos, req.pos + take))
+                req.pos += take
+                room -= take
+                _queued_texts.dec(take, priority=_PRIORITY_NAMES.get(prio, prio))
+                if req.pos < len(req.texts):
+                    deferred.append((prio, seq, req))
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            now = time.perf_counter()
+            texts: List[str] = []
+            for req, start, stop in batch:
+                if not req.started:
+                    req.started = True
+                    _queue_wait.observe(now - req.enqueued, priority=_PRIORITY_NAMES.get(req.priority, req.priority))
+                texts.extend(req.texts[start:stop])
+            try:
+                vecs = np.asarray(
+                    self.model.encode(
+                        texts,
+                        batch_size=len(texts),
+                        convert_to_numpy=True,
+                        normalize_embeddings=batch[0][0].normalize
+                    ),
+                    dtype=np.float32
+                )
+            except Exception as e:
+                logger.error("Embedding batch of %d failed: %s", len(texts), e)
+                for req, _, _ in batch:
+                    if not req.future.done():
+                        req.future.set_exception(e)
+                        req.pos = len(req.texts)  # drop whatever is still queued
+                continue
+            _encode_time.observe(time.perf_counter() - now)
+            _batch_size.observe(len(texts))
+            self.batches += 1
+            self.texts += len(texts)
+
+            offset = 0
+            for req, start, stop in batch:
+                n = stop - start
+                if req.future.done():
+                    offset += n
+                    continue
+                req.parts.append(vecs[offset:offset + n])
+                offset += n
+                if stop == len(req.texts):
+                    req.future.set_result(req.parts[0] if len(req.parts) == 1 else np.concatenate(req.parts))
+
+    def stats(self):
+        with self._cond:
+            queued = sum(len(req.texts) - req.pos for _, _, req in self._heap)
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "queued_texts": queued,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batch_size": _batch_size.snapshot(),
+            "queue_wait_query": _queue_wait.snapshot(priority="query"),
+            "queue_wait_ingest": _queue_wait.snapshot(priority="ingest"),
+        }
+
+
+class EmbeddingClient:
+    """`embedder`-compatible handle on an EmbeddingService at a fixed priority."""
+
+    batched = True
+
+    def __init__(self, service: EmbeddingService, priority: int):
+        self.service = service
+        self.priority = priority
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, **_ignored: Any) -> np.ndarray:
+        # batch_size / show_progress_bar are the service's business now.
+        single = isinstance(sentences, str)
+        vecs = self.service.encode([sentences] if single else list(sentences), normalize_embeddings, self.priority)
+        return vecs[0] if single else vecs
+
+    def __getattr__(self, item):
+        # tokenizer, get_sentence_embedding_dimension(), ... come from the model.
+        return getattr(self.service.model, item)
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> Optional[EmbeddingService]:
+    global _service
+    if not EMBED_BATCHING:
+        return None
+    with _service_lock:
+        if _service is None:
+            from RAG_Model.AiClient import bge
+            _service = EmbeddingService(bge)
+        return _service
+
+
+def get_embedder(priority: int = PRIORITY_QUERY):
+    """The embedder to hand to query / ingestion code: batched when EMBED_BATCHING is on, else `bge`."""
+    service = get_embedding_service()
+    if service is None:
+        from RAG_Model.AiClient import bge
+        return bge
+    return service.client(priority)
@@ -4,8 +4,6 @@ from bs4 import BeautifulSoup
 import pdfplumber
 import os
 from PIL import Image
-import pytesseract
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 import io
 import csv
 import json
@@ -272,64 +270,209 @@ warnings.filterwarnings("ignore", category=UserWarning)
 
 import hashlib
 import logging
-from typing import List, Tuple
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from RAG_Model.logic.ocr import get_ocr_service
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of worker processes used for PDF extraction. 1 keeps the original
+# single-process path; each worker opens the PDF itself and handles a page range.
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+# Below this many pages handing ranges to the pool costs more than it saves.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+# Ranges per worker; >1 evens out load across the document.
+PDF_RANGES_PER_WORKER = 4
+# Scanned pages queued on the OCR pool ahead of the page being yielded when
+# streaming; bounds how much OCR work is in flight.
+OCR_LOOKAHEAD = 8
+
+_extract_pools: Dict[int, ProcessPoolExecutor] = {}
+_extract_pools_lock = threading.Lock()
+
+
+def get_extract_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared extraction pool with `workers` processes, started on first use and kept."""
+    with _extract_pools_lock:
+        pool = _extract_pools.get(workers)
+        if pool is None:
+            logger.info("Starting %d PDF extraction workers", workers)
+            pool = _extract_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                # spawn: forking a process that already runs torch threads can deadlock
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return pool
+
+
+def shutdown_extract_pools():
+    with _extract_pools_lock:
+        for pool in _extract_pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _extract_pools.clear()
+
+
+def _extract_page_range(
+    file_path: str,
+    start: int,
+    end: int
+) -> List[Tuple[str, int]]:
+    """
+    Extracts the text layer of pages [start, end) of a PDF.  Opens its own
+    document handle so it can run inside a worker process.  Pages without a
+    text layer come back as "" so the caller can hand them to the OCR pool.
+
+    :return: List of (page_text, page_number), in order.
+    """
+    out: List[Tuple[str, int]] = []
+    doc = fitz.open(file_path)
+    try:
+        for page_index in range(start, end):
+            out.append((doc.load_page(page_index).get_text("text").strip(), page_index + 1))
+    finally:
+        doc.close()
+    return out
+
+
+def _page_ranges(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    step = max(1, -(-page_count // parts))
+    return [(s, min(s + step, page_count)) for s in range(0, page_count, step)]
+
+
+def _dedupe_pages(pages: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    extracted: List[Tuple[str, int]] = []
+    seen_hashes = set()
+    for text, page_no in pages:
+        hash_val = hashlib.md5(text.encode("utf-8")).hexdigest()
+        if hash_val in seen_hashes:
+            logger.debug("Duplicate page %d skipped", page_no)
+            continue
+        extracted.append((text, page_no))
+        seen_hashes.add(hash_val)
+    return extracted
+
+
 def extract_text_from_pdf(
     file_path: Path,
     ocr: bool = True,
-    ocr_dpi: int = 300
+    ocr_dpi: int = 300,
+    workers: Optional[int] = None
 ) -> List[Tuple[str, int]]:
     """
     Extracts text from each page of a PDF.  
     Falls back to OCR when page text is empty.  
     Deduplicates pages by MD5 hash of their text.
 
+    With more than one worker the page range is split across processes; the
+    partial results are merged back in page order before deduplication, so
+    the output is identical to the single-process path.
+
     :param file_path: Path to the PDF file.
-    :param ocr: whether to run OCR on blank pages.
-    :param ocr_dpi: DPI to render images for OCR.
+    :param ocr: whether to run OCR on blank pages (via the OCR worker pool).
+    :param ocr_dpi: highest DPI used for OCR; pages are tried at OCR_LOW_DPI
+                    first and re-rendered only when confidence is low.
+    :param workers: extraction processes (default: PDF_EXTRACT_WORKERS).
     :return: List of (page_text, page_number).
     """
-    extracted: List[Tuple[str, int]] = []
-    seen_hashes = set()
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    path = str(file_path)
 
     try:
         logger.info("Opening PDF %s", file_path)
-        doc = fitz.open(file_path)
-
-        for page_index in range(len(doc)):
-            page = doc.load_page(page_index)
-            text = page.get_text("text").strip()
-
-            if not text and ocr:
-                logger.debug("Page %d empty—running OCR", page_index + 1)
-                pix = page.get_pixmap(dpi=ocr_dpi)
-                img = Image.open(io.BytesIO(pix.tobytes("png"))).convert("RGB")
-                text = pytesseract.image_to_string(img).strip()
-
-            if not text:
-                logger.debug("Page %d still empty—skipping", page_index + 1)
-                continue
-
-            hash_val = hashlib.md5(text.encode("utf-8")).hexdigest()
-            if hash_val in seen_hashes:
-                logger.debug("Duplicate page %d skipped", page_index + 1)
-                continue
-
-            extracted.append((text, page_index + 1))
-            seen_hashes.add(hash_val)
+        with fitz.open(path) as doc:
+            page_count = len(doc)
+
+        if workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+            ranges = _page_ranges(page_count, workers * PDF_RANGES_PER_WORKER)
+            logger.info("Extracting %d pages with %d workers (%d ranges)", page_count, workers, len(ranges))
+            pages: List[Tuple[str, int]] = []
+            pool = get_extract_pool(workers)
+            futures = [
+                pool.submit(_extract_page_range, path, start, end)
+                for start, end in ranges
+            ]
+            for fut in futures:  # in submission order == page order
+                pages.extend(fut.result())
+        else:
+            pages = _extract_page_range(path, 0, page_count)
+
+        if ocr:
+            # Scanned pages: queue them all on the OCR pool, then collect.
+            ocr_service = get_ocr_service()
+            jobs = {
+                i: ocr_service.submit_pdf_page(path, page_no - 1, ocr_dpi)
+                for i, (text, page_no) in enumerate(pages) if not text
+            }
+            if jobs:
+                logger.info("OCR queued for %d empty pages", len(jobs))
+            for i, fut in jobs.items():
+                pages[i] = (fut.result(), pages[i][1])
 
     except Exception as e:
         logger.error("Failed extracting %s: %s", file_path, e, exc_info=True)
         raise
 
+    for text, page_no in pages:
+        if not text:
+            logger.debug("Page %d still empty—skipping", page_no)
+    extracted = _dedupe_pages([(text, page_no) for text, page_no in pages if text])
     logger.info("Extraction complete—%d pages", len(extracted))
     return extracted
 
 
+def iter_text_from_pdf(
+    file_path: Path,
+    ocr: bool = True,
+    ocr_dpi: int = 300
+) -> Iterator[Tuple[str, int]]:
+    """
+    Generator version of `extract_text_from_pdf` for streaming ingestion:
+    yields deduplicated (page_text, page_number) tuples one page at a time,
+    so the whole document is never held in memory.
+    """
+    seen_hashes = set()
+    logger.info("Streaming PDF %s", file_path)
+    path = str(file_path)
+    ocr_service = get_ocr_service() if ocr else None
+    window: deque = deque()  # (page_no, text or OCR future), in page order
+
+    def emit():
+        page_no, item = window.popleft()
+        text = item.result() if isinstance(item, Future) else item
+        if not text:
+            return None
+        hash_val = hashlib.md5(text.encode("utf-8")).digest()
+        if hash_val in seen_hashes:
+            logger.debug("Duplicate page %d skipped", page_no)
+            return None
+        seen_hashes.add(hash_val)
+        return text, page_no
+
+    with fitz.open(path) as doc:
+        for page_index in range(len(doc)):
+            text = doc.load_page(page_index).get_text("text").strip()
+            if not text and ocr_service is not None:
+                window.append((page_index + 1, ocr_service.submit_pdf_page(path, page_index, ocr_dpi)))
+            else:
+                window.append((page_index + 1, text))
+            # Yield resolved text pages right away; wait on OCR only once the
+            # look-ahead window is full.
+            while window and (len(window) > OCR_LOOKAHEAD or not isinstance(window[0][1], Future)):
+                page = emit()
+                if page:
+                    yield page
+    while window:
+        page = emit()
+        if page:
+            yield page
+
+
 def extract_text_from_docx(file_path):
     
     doc = Document(file_path)
@@ -354,20 +497,27 @@ def extract_text_from_docx(file_path):
             table_text = f"\n[Extracted Table {virtual_page_no}.{table_idx+1}]\n" + '\n'.join(table_md)
             content_chunks.append(table_text)
 
-    # --- Extract images with OCR ---
+    # --- Extract images with OCR (queued on the OCR pool, collected in order) ---
+    ocr_service = get_ocr_service()
+    ocr_jobs = []
     rels = doc.part.rels
     for rel in rels:
         rel_obj = rels[rel]
         if "image" in rel_obj.target_ref:
             try:
-                img_bytes = rel_obj.target_part.blob
-                img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-                ocr_text = pytesseract.image_to_string(img)
-                if ocr_text.strip():
-                    content_chunks.append(f"[OCR from image]\n{ocr_text.strip()}")
+                ocr_jobs.append(ocr_service.submit_image(rel_obj.target_part.blob))
             except Exception as e:
-                print(f"[OCR failed] {e}", file=sys.stderr)
-                content_chunks.append(f"[Image found, but OCR failed: {e}]")
+                ocr_jobs.append(e)
+    for job in ocr_jobs:
+        try:
+            if isinstance(job, Exception):
+                raise job
+            ocr_text = job.result()
+            if ocr_text.strip():
+                content_chunks.append(f"[OCR from image]\n{ocr_text.strip()}")
+        except Exception as e:
+            print(f"[OCR failed] {e}", file=sys.stderr)
+            content_chunks.append(f"[Image found, but OCR failed: {e}]")
 
     # --- Optional: Alt text ---
     for shape in getattr(doc, "inline_shapes", []):
@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Ingestion job subsystem ---
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "16"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+
+INGEST_STAGES = ("extract", "chunk", "embed", "insert")
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested."""
+
+
+class JobQueueFull(Exception):
+    """Raised by `JobManager.submit` when every worker and queue slot is taken."""
+
+
+class IngestJob:
+    """
+    State of one extract→chunk→embed→insert run.
+
+    Progress is tracked per stage as `done`/`total` counters so `/jobs/{id}`
+    can report where a long upload currently is.  All mutation goes through
+    the lock because the worker thread writes while request handlers read.
+    """
+
+    def __init__(self, doc_id: str, title: str, file_name: str):
+        self.id = str(uuid.uuid4())
+        self.doc_id = doc_id
+        self.title = title
+        self.file_name = file_name
+        self.status = "queued"  # queued | running | succeeded | failed | cancelled
+        self.stage: Optional[str] = None
+        self.stages: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "done": 0, "total": None}
+            for name in INGEST_STAGES
+        }
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._future = None
+
+    # --- progress reporting (called from the worker) ---
+    def start_stage(self, name: str, total: Optional[int] = None):
+        self.check_cancelled()
+        with self._lock:
+            self.stage = name
+            self.stages[name].update(status="running", total=total, started_at=time.time())
+
+    def set_total(self, name: str, total: int):
+        with self._lock:
+            self.stages[name]["total"] = total
+
+    def advance(self, name: str, n: int = 1):
+        with self._lock:
+            self.stages[name]["done"] += n
+
+    def finish_stage(self, name: str):
+        with self._lock:
+            st = self.stages[name]
+            st["status"] = "done"
+            if st["total"] is None:
+                st["total"] = st["done"]
+            st["elapsed_s"] = round(time.time() - st.get("started_at", time.time()), 3)
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    # --- lifecycle (called by JobManager) ---
+    def _mark(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            if error is not None:
+                self.error = error
+            if status == "running":
+                self.started_at = time.time()
+            elif status in ("succeeded", "failed", "cancelled"):
+                self.finished_at = time.time()
+                if self.stage and self.stages[self.stage]["status"] == "running":
+                    self.stages[self.stage]["status"] = status
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "doc_id": self.doc_id,
+                "title": self.title,
+                "file_name": self.file_name,
+                "status": self.status,
+                "stage": self.stage,
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "error": self.error,
+                "result": self.result,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Bounded worker pool for ingestion jobs.
+
+    At most `max_workers` jobs run at once and at most `max_pending` more wait
+    in the executor queue; anything beyond that is rejected with
+    `JobQueueFull` instead of piling up unbounded work.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = INGEST_WORKERS,
+        max_pending: int = INGEST_MAX_PENDING,
+        history: int = INGEST_JOB_HISTORY,
+    ):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._history = history
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], job: IngestJob, **kwargs) -> IngestJob:
+        """
+        Schedules `fn(job=job, **kwargs)` on the pool.
+
+        :raises JobQueueFull: when no worker or queue slot is free.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull("Ingestion queue is full, try again later")
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+
+        future = self._executor.submit(self._run, fn, job, kwargs)
+        # Fires on completion *and* on cancellation of a still-queued future.
+        future.add_done_callback(lambda _f: self._slots.release())
+        job._future = future
+        logger.info("Queued ingestion job %s for doc_id=%s", job.id, job.doc_id)
+        return job
+
+    def _run(self, fn, job: IngestJob, kwargs):
+        if job.cancel_requested:
+            job._mark("cancelled")
+            return
+        job._mark("running")
+        t0 = time.time()
+        try:
+            job.result = fn(job=job, **kwargs)
+        except JobCancelled:
+            logger.info("Ingestion job %s cancelled", job.id)
+            job._mark("cancelled")
+        except Exception as e:
+            logger.error("Ingestion job %s failed: %s", job.id, e, exc_info=True)
+            job._mark("failed", error=str(e))
+        else:
+            job._mark("succeeded")
+            logger.info("Ingestion job %s finished in %.2f s", job.id, time.time() - t0)
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        """
+        Requests cancellation.  Queued jobs never start; running jobs stop at
+        the next stage or batch boundary.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status in ("succeeded", "failed", "cancelled"):
+            return job
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            job._mark("cancelled")
+        return job
+
+    def _prune(self):
+        # Keep memory bounded: drop the oldest *finished* jobs past the history limit.
+        if len(self._jobs) <= self._history:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self._history:
+                break
+            if self._jobs[job_id].status in ("succeeded", "failed", "cancelled"):
+                del self._jobs[job_id]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+ingest_jobs = JobManager()
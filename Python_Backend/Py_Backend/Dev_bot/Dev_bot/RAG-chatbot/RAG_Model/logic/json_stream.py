@@ -0,0 +1,70 @@
+import re
+from typing import Any, List, Optional
+
+import json5
+
+_TRAILING_COMMA = re.compile(r',\s*(?=[\]\}])')
+
+
+class JsonArrayItemParser:
+    """
+    Incremental parser for a streamed JSON array of objects.
+
+    Feed it text deltas as they arrive; every time a top-level `{...}` item
+    closes it is parsed (json5, trailing commas tolerated) and returned.
+    Text before the array (prose, a ```json fence) is skipped: the array
+    starts at the first '[' whose next non-blank character is '{' or ']'.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self._pos = 0               # next buffer index to scan
+        self._started = False
+        self._depth = 0             # nesting inside the array (1 == top level)
+        self._in_string: Optional[str] = None
+        self._escape = False
+        self._item_start: Optional[int] = None
+
+    def feed(self, delta: str) -> List[Any]:
+        """Consumes `delta`; returns the items completed by it."""
+        self.buffer += delta
+        items: List[Any] = []
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf) and not self.done:
+            ch = buf[i]
+            if not self._started:
+                if ch == "[":
+                    nxt = buf[i + 1:].lstrip()
+                    if not nxt:
+                        break  # wait for more text to decide
+                    if nxt[0] in "{]":
+                        self._started = True
+                        self._depth = 1
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == self._in_string:
+                    self._in_string = None
+            elif ch in "\"'":
+                self._in_string = ch
+            elif ch in "[{":
+                if ch == "{" and self._depth == 1:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if ch == "}" and self._depth == 1 and self._item_start is not None:
+                    items.append(json5.loads(_TRAILING_COMMA.sub("", buf[self._item_start:i + 1])))
+                    self._item_start = None
+                elif self._depth == 0:
+                    self.done = True
+            i += 1
+        self._pos = i
+        return items
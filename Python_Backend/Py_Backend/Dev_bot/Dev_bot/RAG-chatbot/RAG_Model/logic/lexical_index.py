@@ -0,0 +1,365 @@
+import os
+import re
+import math
+import argparse
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from RAG_Model.VectorDb.vector_store import COLLECTION_NAME
+
+logger = logging.getLogger(__name__)
+
+# --- Lexical (BM25) index ---
+# Inverted index over the stored chunks, kept in SQLite next to the other
+# local caches and scoped by doc_id like the vector filter.  It gives
+# part-number / clause-ID questions an exact-term path that needs no model
+# call, and a second ranking to fuse with the dense hits.
+# Chunks are indexed at ingestion; documents stored before the index existed
+# are added with
+#
+#     python -m RAG_Model.logic.lexical_index --rebuild
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX", "1") == "1"
+LEXICAL_INDEX_DIR = os.getenv(
+    "LEXICAL_INDEX_DIR",
+    str(Path(__file__).resolve().parent.parent / "cache" / "lexical")
+)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal-rank fusion constant (score = sum 1 / (RRF_K + rank)).
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Each ranking contributes this many times top_k candidates to the fusion.
+FUSION_DEPTH = int(os.getenv("FUSION_DEPTH", "3"))
+# Keyword-style queries answered from the lexical index alone.
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "1") == "1"
+LEXICAL_FAST_PATH_MAX_TERMS = 6
+
+# Alphanumeric runs, keeping internal - . / _ so "ISO-9001", "4.2.1" and
+# "AB/123" survive as single terms (their parts are indexed too).
+_TOKEN = re.compile(r"[A-Za-z0-9]+(?:[-./_][A-Za-z0-9]+)*")
+_PARTS = re.compile(r"[-./_]")
+# Code-shaped terms only: letters and digits mixed ("E12", "M8x1.25",
+# "ISO-9001", "AB/123") or dotted clause numbers with 3+ parts ("4.2.1").
+# Bare numbers ("2024", "page 3"), ordinals ("2nd") and plain or all-caps
+# words ("CSE", "BTech") are not, so such questions keep dense retrieval.
+_IDENTIFIER = re.compile(
+    r"^(?=[-./_A-Za-z0-9]*[A-Za-z])(?=[-./_A-Za-z0-9]*\d)[A-Za-z0-9]+(?:[-./_][A-Za-z0-9]+)*$"
+    r"|^\d+(?:\.\d+){2,}$"
+)
+_ORDINAL = re.compile(r"^\d+(?:st|nd|rd|th)$", re.IGNORECASE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this "
+    "to was were what when where which who why will with do does did can you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased BM25 terms of `text` (compound identifiers plus their parts)."""
+    terms: List[str] = []
+    for match in _TOKEN.finditer(text):
+        tok = match.group(0).lower()
+        if tok in _STOPWORDS:
+            continue
+        terms.append(tok)
+        if _PARTS.search(tok):
+            terms.extend(p for p in _PARTS.split(tok) if p and p not in _STOPWORDS)
+    return terms
+
+
+def identifier_terms(query: str) -> List[str]:
+    """Part-number / clause-ID-looking terms of `query`."""
+    return [
+        m.group(0).lower() for m in _TOKEN.finditer(query)
+        if _IDENTIFIER.match(m.group(0)) and not _ORDINAL.match(m.group(0))
+    ]
+
+
+def is_keyword_query(query: str) -> bool:
+    """Short queries built around identifiers are served by the lexical path."""
+    return bool(identifier_terms(query)) and len(set(tokenize(query))) <= LEXICAL_FAST_PATH_MAX_TERMS
+
+
+class LexicalIndex:
+    """
+    SQLite-backed BM25 index.  Terms and documents are interned to integers,
+    postings are (term, doc, row, tf) rows in a WITHOUT ROWID table clustered
+    by term then doc, so a doc_id-scoped lookup reads only matching postings.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_DIR, name: str = COLLECTION_NAME):
+        Path(path).mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(Path(path) / f"{name}.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, doc_id TEXT UNIQUE NOT NULL,"
+            " n_chunks INTEGER NOT NULL DEFAULT 0, total_len INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, chunk_id TEXT UNIQUE NOT NULL,"
+            " doc INTEGER NOT NULL, length INTEGER NOT NULL, text TEXT, doc_name TEXT, page INTEGER, chunk_index INTEGER);"
+            "CREATE INDEX IF NOT EXISTS chunks_doc ON chunks(doc);"
+            "CREATE TABLE IF NOT EXISTS postings (term INTEGER, doc INTEGER, row INTEGER, tf INTEGER,"
+            " PRIMARY KEY (term, doc, row)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc);"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    # --- writes ---
+    def _doc(self, doc_id: str) -> int:
+        self._db.execute("INSERT OR IGNORE INTO docs (doc_id) VALUES (?)", (doc_id,))
+        return self._db.execute("SELECT id FROM docs WHERE doc_id=?", (doc_id,)).fetchone()[0]
+
+    def _term_ids(self, terms: Iterable[str]) -> Dict[str, int]:
+        terms = list(set(terms))
+        self._db.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(t,) for t in terms])
+        out: Dict[str, int] = {}
+        for start in range(0, len(terms), 900):
+            part = terms[start:start + 900]
+            out.update(self._db.execute(
+                f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(part))})", part
+            ).fetchall())
+        return out
+
+    def _add(self, doc_id, ids, texts, doc_name, pages, chunk_indices):
+        doc = self._doc(doc_id)
+        self._delete_chunks(ids)
+        total = 0
+        token_lists = [tokenize(t) for t in texts]
+        term_ids = self._term_ids(t for toks in token_lists for t in toks)
+        for chunk_id, text, toks, page, idx in zip(ids, texts, token_lists, pages, chunk_indices):
+            cur = self._db.execute(
+                "INSERT INTO chunks (chunk_id, doc, length, text, doc_name, page, chunk_index) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (chunk_id, doc, len(toks), text, doc_name, int(page), int(idx))
+            )
+            row = cur.lastrowid
+            self._db.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?, ?)",
+                [(term_ids[t], doc, row, tf) for t, tf in Counter(toks).items()]
+            )
+            total += len(toks)
+        self._db.execute(
+            "UPDATE docs SET n_chunks = n_chunks + ?, total_len = total_len + ? WHERE id=?", (len(ids), total, doc)
+        )
+
+    def _delete_chunks(self, ids: Sequence[str]):
+        for start in range(0, len(ids), 900):
+            part = list(ids[start:start + 900])
+            marks = ",".join("?" * len(part))
+            rows = self._db.execute(f"SELECT row, doc, length FROM chunks WHERE chunk_id IN ({marks})", part).fetchall()
+            for row, doc, length in rows:
+                self._db.execute("DELETE FROM postings WHERE doc=? AND row=?", (doc, row))
+                self._db.execute(
+                    "UPDATE docs SET n_chunks = n_chunks - 1, total_len = total_len - ? WHERE id=?", (length, doc)
+                )
+            self._db.execute(f"DELETE FROM chunks WHERE chunk_id IN ({marks})", part)
+
+    def add_chunks(self, doc_id: str, ids: Sequence[str], texts: Sequence[str], doc_name: str,
+                   pages: Sequence[int], chunk_indices: Sequence[int]):
+        """Indexes (or re-indexes, by chunk id) chunks of `doc_id`."""
+        with self._lock:
+            self._add(doc_id, ids, texts, doc_name, pages, chunk_indices)
+            self._db.commit()
+
+    def replace_doc(self, doc_id: str, ids: Sequence[str], texts: Sequence[str], doc_name: str,
+                    pages: Sequence[int], chunk_indices: Sequence[int]):
+        """Makes `doc_id`'s indexed chunks exactly the given ones, in one transaction."""
+        with self._lock:
+            self._remove(doc_id)
+            self._add(doc_id, ids, texts, doc_name, pages, chunk_indices)
+            self._db.commit()
+
+    def _remove(self, doc_id: str) -> int:
+        row = self._db.execute("SELECT id FROM docs WHERE doc_id=?", (doc_id,)).fetchone()
+        if row is None:
+            return 0
+        removed = self._db.execute("DELETE FROM chunks WHERE doc=?", (row[0],)).rowcount
+        self._db.execute("DELETE FROM postings WHERE doc=?", (row[0],))
+        self._db.execute("DELETE FROM docs WHERE id=?", (row[0],))
+        return removed
+
+    def remove_doc(self, doc_id: str) -> int:
+        with self._lock:
+            removed = self._remove(doc_id)
+            self._db.commit()
+        return removed
+
+    # --- reads ---
+    def search(self, query: str, doc_ids: Optional[List[str]] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+        """BM25 top_k over the chunks of `doc_ids` (all docs when empty)."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            if doc_ids:
+                marks = ",".join("?" * len(doc_ids))
+                docs = self._db.execute(
+                    f"SELECT id, n_chunks, total_len FROM docs WHERE doc_id IN ({marks})", list(doc_ids)
+                ).fetchall()
+            else:
+                docs = self._db.execute("SELECT id, n_chunks, total_len FROM docs").fetchall()
+            n = sum(d[1] for d in docs)
+            if not n:
+                return []
+            avgdl = max(sum(d[2] for d in docs) / n, 1.0)
+            doc_filter = f" AND p.doc IN ({','.join(str(d[0]) for d in docs)})" if doc_ids else ""
+
+            term_ids = dict(self._db.execute(
+                f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(terms))})", terms
+            ).fetchall())
+            scores: Dict[int, float] = {}
+            for term in terms:
+                tid = term_ids.get(term)
+                if tid is None:
+                    continue
+                postings = self._db.execute(
+                    "SELECT p.row, p.tf, c.length FROM postings p JOIN chunks c ON c.row = p.row"
+                    f" WHERE p.term=?{doc_filter}", (tid,)
+                ).fetchall()
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for row, tf, length in postings:
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl)
+                    scores[row] = scores.get(row, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+
+            best = sorted(scores.items(), key=lambda kv: -kv[1])[:top_k]
+            if not best:
+                return []
+            marks = ",".join("?" * len(best))
+            meta = {
+                r[0]: r[1:] for r in self._db.execute(
+                    "SELECT c.row, c.chunk_id, c.text, d.doc_id, c.doc_name, c.page, c.chunk_index FROM chunks c"
+                    f" JOIN docs d ON d.id = c.doc WHERE c.row IN ({marks})", [row for row, _ in best]
+                )
+            }
+        return [
+            {
+                "chunk_id":   meta[row][0],
+                "chunk_text": meta[row][1],
+                "doc_id":     meta[row][2],
+                "file_name":  meta[row][3],
+                "page_no":    meta[row][4],
+                "chunk_index": meta[row][5],
+                "score":      round(score, 4)
+            }
+            for row, score in best if row in meta
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "docs": self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0],
+                "chunks": self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0],
+                "terms": self._db.execute("SELECT COUNT(*) FROM terms").fetchone()[0],
+            }
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict[str, Any]]], top_k: int, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Fuses hit lists (best first) by reciprocal rank.  Hits are matched on
+    chunk_id (falling back to doc_id + text); the fused score replaces `score`.
+    """
+    fused: Dict[Any, float] = {}
+    first: Dict[Any, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            key = hit.get("chunk_id") or (hit.get("doc_id"), hit.get("chunk_text"))
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank + 1)
+            first.setdefault(key, hit)
+    best = sorted(fused, key=lambda key: -fused[key])[:top_k]
+    return [{**first[key], "score": round(fused[key], 6)} for key in best]
+
+
+_index: Optional[LexicalIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    """Process-wide lexical index, or None when LEXICAL_INDEX=0."""
+    global _index
+    if not LEXICAL_INDEX_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = LexicalIndex()
+        return _index
+
+
+# --- Backfill ---
+def _iter_rows(collection, fields: List[str], batch_size: int):
+    if hasattr(collection, "query_iterator"):
+        it = collection.query_iterator(batch_size=batch_size, expr="", output_fields=fields)
+        try:
+            while True:
+                page = it.next()
+                if not page:
+                    return
+                yield page
+        finally:
+            it.close()
+    offset = 0
+    while True:
+        page = collection.query(expr="", output_fields=fields, offset=offset, limit=batch_size)
+        if page:
+            yield page
+        if len(page) < batch_size:
+            return
+        offset += batch_size
+
+
+def rebuild_from_collection(collection, index: Optional[LexicalIndex] = None, batch_size: int = 2000) -> Dict[str, int]:
+    """
+    Re-indexes every chunk stored in `collection`, replacing each document's
+    lexical entries.  Used for documents ingested before the lexical index
+    existed (they are otherwise never added, and the keyword fast path would
+    not see them).
+    """
+    index = index or get_lexical_index()
+    if index is None:
+        raise RuntimeError("Lexical index is disabled (LEXICAL_INDEX=0)")
+    fields = ["id", "text", "doc_id", "doc_name", "page", "chunk_index"]
+    seen = set()
+    chunks = 0
+    for page in _iter_rows(collection, fields, batch_size):
+        by_doc: Dict[str, List[Dict[str, Any]]] = {}
+        for row in page:
+            by_doc.setdefault(row["doc_id"], []).append(row)
+        for doc_id, rows in by_doc.items():
+            if doc_id not in seen:
+                seen.add(doc_id)
+                index.remove_doc(doc_id)
+            # doc_name is per document; the first row's name labels the batch.
+            index.add_chunks(
+                doc_id,
+                ids=[r["id"] for r in rows],
+                texts=[r["text"] for r in rows],
+                doc_name=rows[0]["doc_name"],
+                pages=[r["page"] for r in rows],
+                chunk_indices=[r["chunk_index"] for r in rows],
+            )
+            chunks += len(rows)
+    return {"docs": len(seen), "chunks": chunks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lexical (BM25) index maintenance.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="re-index every chunk in the configured vector store (VECTOR_BACKEND)")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.rebuild:
+        from RAG_Model.VectorDb.vector_store import get_collection
+        stats = rebuild_from_collection(get_collection(), batch_size=args.batch_size)
+        print(f"✅ Indexed {stats['chunks']} chunks from {stats['docs']} documents")
+    index = get_lexical_index()
+    if index is not None:
+        print(index.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# --- In-process metrics ---
+# Counters, gauges and histograms rendered in the Prometheus text format by
+# the /metrics endpoint.  Metrics are created through `counter()`, `gauge()`
+# and `histogram()`, which return the existing instance for a known name.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[str, ...]
+
+
+def _fmt_labels(names: Sequence[str], values: LabelKey, extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            return [f"{self.name}{_fmt_labels(self.labelnames, k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            return [f"{self.name}{_fmt_labels(self.labelnames, k)} {v}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if idx < len(self.buckets):
+                state[idx] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self, **labels) -> Dict[str, float]:
+        """count / sum / p50 / p99 (bucket upper bounds) for one label set."""
+        with self._lock:
+            state = list(self._values.get(self._key(labels), [0] * len(self.buckets) + [0.0, 0]))
+        count = state[-1]
+        return {
+            "count": count,
+            "sum": round(state[-2], 6),
+            "p50": self._quantile(state, 0.5),
+            "p99": self._quantile(state, 0.99),
+        }
+
+    def _quantile(self, state, q: float) -> Optional[float]:
+        count = state[-1]
+        if not count:
+            return None
+        running = 0
+        for bound, n in zip(self.buckets, state):
+            running += n
+            if running >= q * count:
+                return bound
+        return float("inf")
+
+    def _samples(self):
+        out = []
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, state in items:
+            running = 0
+            for bound, n in zip(self.buckets, state):
+                running += n
+                le = 'le="%s"' % bound
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {running}")
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {state[-1]}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {state[-2]}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {state[-1]}")
+        return out
+
+
+_registry: Dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(cls, name: str, *args, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _get_or_create(Counter, name, help, labelnames)
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return _get_or_create(Gauge, name, help, labelnames)
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, help, labelnames, buckets)
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
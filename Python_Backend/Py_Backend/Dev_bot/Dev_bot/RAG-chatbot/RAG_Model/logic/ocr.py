@@ -0,0 +1,217 @@
+import io
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+pytesseract.pytesseract.tesseract_cmd = os.getenv("TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+
+logger = logging.getLogger(__name__)
+
+# --- OCR subsystem: Tesseract worker pool + persistent result cache ---
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_CACHE_DIR = os.getenv(
+    "OCR_CACHE_DIR",
+    str(Path(__file__).resolve().parent.parent / "cache" / "ocr")
+)
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+# DPI policy: render scanned pages at OCR_LOW_DPI first and only re-render at
+# the caller's full DPI when Tesseract's mean word confidence is below
+# OCR_MIN_CONFIDENCE.
+OCR_LOW_DPI = int(os.getenv("OCR_LOW_DPI", "150"))
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "70"))
+# Part of every cache key: entries from the earlier word-box text rebuild
+# are never served.
+_TEXT_SOURCE = "image_to_string"
+
+
+class OcrCache:
+    """
+    SQLite-backed OCR results keyed by hash of the rendered page / image bytes.
+    Safe to open from several worker processes at once (WAL mode).
+    """
+
+    def __init__(self, path: str = OCR_CACHE_DIR):
+        Path(path).mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(Path(path) / "ocr.sqlite"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS ocr (key BLOB PRIMARY KEY, text TEXT NOT NULL, confidence REAL, dpi INTEGER)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT text FROM ocr WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: bytes, text: str, confidence: Optional[float], dpi: int):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO ocr VALUES (?, ?, ?, ?)", (key, text, confidence, dpi))
+            self._db.commit()
+
+
+def _key(data: bytes, *policy) -> bytes:
+    h = hashlib.sha256()
+    h.update("|".join(str(p) for p in (OCR_LANG, _TEXT_SOURCE) + policy).encode("utf-8"))
+    h.update(data)
+    return h.digest()
+
+
+# --- worker-process side ---
+_worker_cache: Optional[OcrCache] = None
+
+
+def _cache() -> OcrCache:
+    global _worker_cache
+    if _worker_cache is None:
+        _worker_cache = OcrCache()
+    return _worker_cache
+
+
+def _ocr_text(img: Image.Image) -> str:
+    """Tesseract's plain-text output, exactly as the extractors always used it."""
+    return pytesseract.image_to_string(img, lang=OCR_LANG)
+
+
+def _ocr_confidence(img: Image.Image) -> float:
+    """Mean word confidence (0–100); only used to pick the DPI."""
+    data = pytesseract.image_to_data(img, lang=OCR_LANG, output_type=pytesseract.Output.DICT)
+    confs = [float(c) for c, word in zip(data["conf"], data["text"]) if float(c) >= 0 and word.strip()]
+    return sum(confs) / len(confs) if confs else 0.0
+
+
+def _ocr_pdf_page_job(file_path: str, page_index: int, max_dpi: int) -> Tuple[str, bool]:
+    """Renders and OCRs one PDF page; returns (text, served_from_cache)."""
+    low_dpi = min(OCR_LOW_DPI, max_dpi)
+    with fitz.open(file_path) as doc:
+        page = doc.load_page(page_index)
+        png = page.get_pixmap(dpi=low_dpi).tobytes("png")
+        key = _key(png, "page", low_dpi, max_dpi, OCR_MIN_CONFIDENCE)
+        cached = _cache().get(key)
+        if cached is not None:
+            return cached, True
+
+        img = Image.open(io.BytesIO(png)).convert("RGB")
+        text, conf, dpi = _ocr_text(img), None, low_dpi
+        if max_dpi > low_dpi:
+            conf = _ocr_confidence(img)
+            if conf < OCR_MIN_CONFIDENCE:
+                logger.debug("Page %d OCR confidence %.0f at %d DPI—re-rendering at %d", page_index + 1, conf, low_dpi, max_dpi)
+                hi_png = page.get_pixmap(dpi=max_dpi).tobytes("png")
+                text, conf, dpi = _ocr_text(Image.open(io.BytesIO(hi_png)).convert("RGB")), None, max_dpi
+
+    _cache().put(key, text, conf, dpi)
+    return text, False
+
+
+def _ocr_image_job(image_bytes: bytes, key: bytes) -> Tuple[str, bool]:
+    cached = _cache().get(key)
+    if cached is not None:
+        return cached, True
+    text = _ocr_text(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+    _cache().put(key, text, None, 0)
+    return text, False
+
+
+# --- caller side ---
+class OcrService:
+    """
+    Process pool of Tesseract workers fronted by the OCR cache.
+
+    `submit_pdf_page` / `submit_image` return futures resolving to the OCR'd
+    text, so extractors can queue every scanned page or image first and
+    collect the results afterwards.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS):
+        self.workers = workers
+        self.hits = 0
+        self.misses = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cache: Optional[OcrCache] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # spawn: forking a process that already runs torch threads can deadlock
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._cache = OcrCache()
+            return self._pool
+
+    def _count(self, fut: Future):
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        with self._lock:
+            if fut.result()[1]:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _text_future(self, inner: Future) -> Future:
+        outer: Future = Future()
+
+        def done(f: Future):
+            self._count(f)
+            if f.cancelled():
+                outer.cancel()
+            elif f.exception() is not None:
+                outer.set_exception(f.exception())
+            else:
+                outer.set_result(f.result()[0].strip())
+        inner.add_done_callback(done)
+        return outer
+
+    def submit_pdf_page(self, file_path, page_index: int, max_dpi: int = 300) -> Future:
+        return self._text_future(self._executor().submit(_ocr_pdf_page_job, str(file_path), page_index, max_dpi))
+
+    def submit_image(self, image_bytes: bytes) -> Future:
+        pool = self._executor()
+        key = _key(image_bytes, "image")
+        cached = self._cache.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            fut: Future = Future()
+            fut.set_result(cached.strip())
+            return fut
+        return self._text_future(pool.submit(_ocr_image_job, image_bytes, key))
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "workers": self.workers,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+_service: Optional[OcrService] = None
+_service_lock = threading.Lock()
+
+
+def get_ocr_service() -> OcrService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = OcrService()
+        return _service
@@ -0,0 +1,217 @@
+import os
+import logging
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: exports are still atomic, just not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# --- ONNX Runtime embedding backend ---
+# bge-small exported once to ONNX (optionally dynamically quantized to int8)
+# and run with onnxruntime on CPU, behind SentenceTransformer's
+# `encode(sentences, normalize_embeddings=...)`.  Selected with
+# EMBED_BACKEND=onnx / onnx-int8 (see AiClient).
+ONNX_MODEL_DIR = os.getenv(
+    "ONNX_MODEL_DIR",
+    str(Path(__file__).resolve().parent.parent / "cache" / "onnx")
+)
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))        # 0 = onnxruntime default
+ONNX_MAX_LENGTH = int(os.getenv("ONNX_MAX_LENGTH", "512"))
+# bge models are trained with CLS pooling; "mean" is there for other encoders.
+ONNX_POOLING = os.getenv("ONNX_POOLING", "cls")
+ONNX_OPSET = 14
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+LOCK_FILE = ".export.lock"
+
+
+def model_dir_for(model_name: str, root: str = ONNX_MODEL_DIR) -> Path:
+    return Path(root) / model_name.replace("/", "__")
+
+
+@contextmanager
+def _export_lock(out: Path):
+    """Exclusive lock on `out` across processes (no-op without fcntl)."""
+    with open(out / LOCK_FILE, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+
+def export_onnx(model_name: str, out_dir: Optional[Path] = None, quantize: bool = False) -> Path:
+    """
+    Exports `model_name` (a Hugging Face encoder) to `out_dir/model.onnx`
+    with dynamic batch / sequence axes, saves its tokenizer alongside, and
+    with `quantize` also writes the dynamic int8 variant.  Existing files are
+    reused.  Needs torch + transformers (+ onnxruntime for quantization);
+    running the exported model only needs onnxruntime + the tokenizer.
+
+    Safe to call from several processes at once: the export runs under a
+    lock file in `out_dir`, each model file is written to a per-process
+    temporary name and published with os.replace, and model.onnx is only
+    published after the tokenizer is saved, so its presence means the
+    directory is complete.
+
+    :return: path of the requested model file
+    """
+    out = Path(out_dir) if out_dir else model_dir_for(model_name)
+    out.mkdir(parents=True, exist_ok=True)
+    fp32 = out / FP32_FILE
+    int8 = out / INT8_FILE
+    if fp32.exists() and (not quantize or int8.exists()):
+        return int8 if quantize else fp32
+
+    with _export_lock(out):
+        # Another process may have finished the export while we waited.
+        _export_fp32(model_name, out, fp32)
+        if not quantize:
+            return fp32
+        if not int8.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info("Quantizing %s to int8", fp32)
+            tmp = _tmp_path(int8)
+            quantize_dynamic(str(fp32), str(tmp), weight_type=QuantType.QInt8)
+            os.replace(tmp, int8)
+        return int8
+
+
+def _export_fp32(model_name: str, out: Path, fp32: Path):
+    """Writes model.onnx and the tokenizer, unless model.onnx already exists."""
+    if fp32.exists():
+        return
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    logger.info("Exporting %s to %s", model_name, fp32)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class _LastHidden(torch.nn.Module):
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, *inputs):
+            return self.encoder(**dict(zip(names, inputs))).last_hidden_state
+
+    axes = {n: {0: "batch", 1: "sequence"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    tmp = _tmp_path(fp32)
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHidden(model),
+            tuple(sample[n] for n in names),
+            str(tmp),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=axes,
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+        )
+    tokenizer.save_pretrained(str(out))
+    os.replace(tmp, fp32)
+
+
+class OnnxEmbedder:
+    """
+    onnxruntime encoder with the subset of SentenceTransformer's API this
+    code uses: `encode`, `tokenizer`, `get_sentence_embedding_dimension`.
+    """
+
+    def __init__(self, model_dir: Union[str, Path], quantized: bool = False,
+                 threads: int = ONNX_THREADS, max_length: int = ONNX_MAX_LENGTH, pooling: str = ONNX_POOLING):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        path = model_dir / (INT8_FILE if quantized else FP32_FILE)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.max_length = max_length
+        self.pooling = pooling
+        self.quantized = quantized
+        self._dim: Optional[int] = None
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feed = {n: enc[n].astype(np.int64) for n in self.input_names if n in enc}
+        hidden = self.session.run(None, feed)[0]
+        if self.pooling == "mean":
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return hidden[:, 0]
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **_ignored) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Length-sorted batches keep padding (and wasted compute) small.
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            vecs = self._forward([texts[i] for i in idx]).astype(np.float32, copy=False)
+            if out.shape[1] == 0:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[idx] = vecs
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dim is None:
+            self._dim = int(self._forward(["dimension probe"]).shape[1])
+        return self._dim
+
+
+def load_onnx_embedder(model_name: str, quantized: bool = False, threads: int = ONNX_THREADS) -> OnnxEmbedder:
+    """Exports on first use (one-time, needs torch), then loads the ONNX model."""
+    model_dir = model_dir_for(model_name)
+    export_onnx(model_name, model_dir, quantize=quantized)
+    return OnnxEmbedder(model_dir, quantized=quantized, threads=threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (and int8).")
+    parser.add_argument("--model", default=None, help="Hugging Face model id (default: AiClient.EMBED_MODEL_REPO)")
+    parser.add_argument("--out", default=None, help="output directory (default: ONNX_MODEL_DIR/<model>)")
+    parser.add_argument("--int8", action="store_true", help="also write the dynamic int8 variant")
+    args = parser.parse_args()
+    if args.model is None:
+        from RAG_Model.AiClient import EMBED_MODEL_REPO
+        args.model = EMBED_MODEL_REPO
+    logging.basicConfig(level=logging.INFO)
+    path = export_onnx(args.model, Path(args.out) if args.out else None, quantize=args.int8)
+    print(f"✅ Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import queue
+import threading
+import logging
+from typing import Any, Callable, Iterable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# --- Bounded-queue generator pipeline ---
+# Each stage runs on its own thread and talks to the next one through a
+# bounded queue, so a slow consumer applies back-pressure instead of letting
+# intermediate results pile up in memory.
+
+_DONE = object()
+_POLL_S = 0.1
+
+
+class PipelineAborted(Exception):
+    """Raised inside stage threads when the pipeline has been closed."""
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class Pipeline:
+    """
+    A chain of generator stages connected by bounded queues.
+
+        Pipeline(pages, maxsize=2).then(chunk_stage).then(embed_stage)
+
+    `source` is any iterable; every stage is a callable taking an iterator of
+    the previous stage's items and returning an iterator of its own.  Iterating
+    the pipeline starts all stage threads and yields the last stage's output in
+    the calling thread.  An exception in any stage is re-raised to the caller;
+    closing the pipeline (or abandoning iteration) stops every stage.
+    """
+
+    def __init__(self, source: Iterable, maxsize: int = 2, name: str = "pipeline"):
+        self._source = source
+        self._stages: List[Callable[[Iterator], Iterable]] = []
+        self._maxsize = maxsize
+        self._name = name
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def then(self, stage: Callable[[Iterator], Iterable]) -> "Pipeline":
+        self._stages.append(stage)
+        return self
+
+    # --- queue helpers honouring the stop flag ---
+    def _put(self, q: "queue.Queue", item: Any):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_S)
+                return
+            except queue.Full:
+                continue
+        raise PipelineAborted()
+
+    def _drain(self, q: "queue.Queue") -> Iterator:
+        while True:
+            try:
+                item = q.get(timeout=_POLL_S)
+            except queue.Empty:
+                if self._stop.is_set():
+                    raise PipelineAborted()
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+
+    def _run(self, produce: Callable[[], Iterable], out_q: "queue.Queue"):
+        try:
+            for item in produce():
+                self._put(out_q, item)
+            self._put(out_q, _DONE)
+        except PipelineAborted:
+            pass
+        except BaseException as e:  # forwarded to the consumer
+            try:
+                self._put(out_q, _Failure(e))
+            except PipelineAborted:
+                pass
+
+    def _spawn(self, produce: Callable[[], Iterable], idx: int) -> "queue.Queue":
+        out_q: "queue.Queue" = queue.Queue(maxsize=self._maxsize)
+        t = threading.Thread(
+            target=self._run, args=(produce, out_q),
+            name=f"{self._name}-stage{idx}", daemon=True
+        )
+        t.start()
+        self._threads.append(t)
+        return out_q
+
+    def __iter__(self) -> Iterator:
+        q = self._spawn(lambda: self._source, 0)
+        for idx, stage in enumerate(self._stages, start=1):
+            q = self._spawn(lambda stage=stage, q=q: stage(self._drain(q)), idx)
+        try:
+            yield from self._drain(q)
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,150 @@
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from RAG_Model.logic.embedding_cache import EmbeddingCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+# --- Query-embedding cache ---
+# In-process LRU keyed by normalized query text, optionally backed by an
+# on-disk EmbeddingCache.  Workers on one host can share QUERY_CACHE_DIR:
+# EmbeddingCache allocates slots inside SQLite write transactions, so
+# processes never hand out the same slot.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+QUERY_CACHE_DISK = os.getenv("QUERY_CACHE_DISK", "0") == "1"
+QUERY_CACHE_DIR = os.getenv(
+    "QUERY_CACHE_DIR",
+    str(Path(__file__).resolve().parent.parent / "cache" / "queries")
+)
+QUERY_CACHE_DISK_ENTRIES = int(os.getenv("QUERY_CACHE_DISK_ENTRIES", "100000"))
+QUERY_WARMUP_FILE = os.getenv("QUERY_WARMUP_FILE")
+
+_TRAILING_PUNCT = re.compile(r"[\s?!.]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a query."""
+    return _TRAILING_PUNCT.sub("", " ".join(query.lower().split()))
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU of float32 query vectors.
+
+    :param maxsize: in-process entries kept
+    :param disk:    optional shared on-disk tier consulted on memory misses
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, disk: Optional[EmbeddingCache] = None):
+        self.maxsize = maxsize
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, vec: np.ndarray):
+        self._entries[key] = vec
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def embed(self, queries: List[str], embedder, model_name: str) -> np.ndarray:
+        """
+        Query vectors for `queries` (shape (N, D), float32).  Memory hits are
+        served first, then the disk tier; all remaining misses go to the model
+        in a single `encode` call.
+        """
+        keys = [f"{model_name}\x00{normalize_query(q)}" for q in queries]
+        out: Dict[int, np.ndarray] = {}
+        with self._lock:
+            for i, k in enumerate(keys):
+                vec = self._entries.get(k)
+                if vec is not None:
+                    self._entries.move_to_end(k)
+                    out[i] = vec
+            self.hits += len(out)
+
+        todo = {}
+        for i, k in enumerate(keys):
+            if i not in out and k not in todo:
+                todo[k] = i
+
+        resolved: Dict[str, np.ndarray] = {}
+        if todo and self.disk is not None:
+            disk_keys = [cache_key(model_name, normalize_query(queries[i])) for i in todo.values()]
+            found = self.disk.get_many(disk_keys)
+            with self._lock:
+                for pos, k in enumerate(list(todo)):
+                    if pos in found:
+                        resolved[k] = found[pos].astype(np.float32, copy=False)
+                        self._remember(k, resolved[k])
+                        del todo[k]
+                        self.disk_hits += 1
+
+        if todo:
+            miss_idx = list(todo.values())
+            vecs = np.asarray(
+                embedder.encode(
+                    [queries[i] for i in miss_idx],
+                    batch_size=32,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                ),
+                dtype=np.float32
+            )
+            with self._lock:
+                self.misses += len(miss_idx)
+                for k, vec in zip(todo, vecs):
+                    resolved[k] = vec
+                    self._remember(k, vec)
+            if self.disk is not None:
+                self.disk.put_many([cache_key(model_name, normalize_query(queries[i])) for i in miss_idx], vecs)
+
+        return np.stack([out[i] if i in out else resolved[k] for i, k in enumerate(keys)])
+
+    def embed_one(self, query: str, embedder, model_name: str) -> np.ndarray:
+        return self.embed([query], embedder, model_name)[0]
+
+    def warm(self, path: str, embedder, model_name: str, batch_size: int = 256) -> int:
+        """Pre-loads one query per line from `path`; returns the number loaded."""
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            queries = [line.strip() for line in f if line.strip()]
+        queries = queries[: self.maxsize]
+        for start in range(0, len(queries), batch_size):
+            self.embed(queries[start:start + batch_size], embedder, model_name)
+        logger.info("Query cache warmed with %d queries from %s", len(queries), path)
+        return len(queries)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            }
+
+
+_cache: Optional[QueryEmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            disk = EmbeddingCache(QUERY_CACHE_DIR, max_entries=QUERY_CACHE_DISK_ENTRIES) if QUERY_CACHE_DISK else None
+            _cache = QueryEmbeddingCache(disk=disk)
+        return _cache
@@ -0,0 +1,228 @@
+import re
+from typing import Iterator, List, Tuple
+
+# --- Span-based chunking engine ---
+# The chunkers below work on (start, end) offsets into the page text and only
+# slice / join strings once a chunk is final, instead of growing a buffer
+# with `buf += ...`.  Boundaries are identical to the original
+# section_based_chunker / add_overlap / smart_chunker (benchmarks/
+# bench_chunkers.py keeps the originals and checks equality).
+
+Span = Tuple[int, int]
+
+# Lines that look like headings: all caps, "Section N", or roman numerals.
+_HEADING_BODY = r'(?:[A-Z][A-Z \d\.\-:]{5,}|Section\s+\d+|[IVXLC]+\.\s)'
+HEADING_RE = re.compile('^' + _HEADING_BODY, re.MULTILINE)
+# The same line starts, found as "newline followed by a heading": a literal
+# first character lets the regex engine skip ahead instead of trying `^` at
+# every offset.  (No heading match can contain a line start that is itself a
+# heading, so the non-consuming lookahead finds exactly HEADING_RE's matches.)
+_HEADING_AT_RE = re.compile(_HEADING_BODY)
+_HEADING_AFTER_NL_RE = re.compile(r'\n(?=' + _HEADING_BODY + ')')
+# Runs of lines starting with '|' (Markdown / ASCII tables).
+TABLE_RE = re.compile(r'((?:\|.*\n)+)', re.MULTILINE)
+# `\s` and str.strip() share the same whitespace definition for str.
+_NON_SPACE_RE = re.compile(r'\S')
+
+PARA_SEP = '\n\n'
+
+
+def strip_span(text: str, start: int, end: int) -> Span:
+    """Offsets of `text[start:end].strip()` within `text`."""
+    m = _NON_SPACE_RE.search(text, start, end)
+    if m is None:
+        return start, start
+    start = m.start()
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def split_spans(text: str, start: int, end: int, sep: str = PARA_SEP) -> List[Span]:
+    """Offsets of `text[start:end].split(sep)`."""
+    spans = []
+    step = len(sep)
+    while True:
+        cut = text.find(sep, start, end)
+        if cut < 0:
+            spans.append((start, end))
+            return spans
+        spans.append((start, cut))
+        start = cut + step
+
+
+def _next_break(text: str, start: int, pos: int, end: int) -> int:
+    """
+    First paragraph break of `text[start:end].split('\\n\\n')` at or after
+    `pos`, or -1.  Inside a run of newlines split() breaks at every second
+    one counted from where the run (or `start`) begins, so a match found in
+    the middle of a run may have to move one newline right.
+    """
+    while True:
+        cut = text.find(PARA_SEP, pos, end)
+        if cut <= start or text[cut - 1] != '\n':
+            return cut
+        run = cut - 1
+        while run > start and text[run - 1] == '\n':
+            run -= 1
+        if (cut - run) % 2 == 0:
+            return cut
+        pos = cut + 1
+
+
+def heading_sections(text: str) -> List[Span]:
+    """Stripped spans from each heading to the next (text before the first heading is dropped)."""
+    starts = [0] if _HEADING_AT_RE.match(text) else []
+    starts.extend(m.start() + 1 for m in _HEADING_AFTER_NL_RE.finditer(text))
+    ends = starts[1:] + [len(text)]
+    return [strip_span(text, s, e) for s, e in zip(starts, ends)]
+
+
+def section_spans(text: str, min_len: int = 200) -> List[Span]:
+    """
+    Span form of `section_based_chunker`: heading sections longer than
+    `min_len`, or, without headings, paragraphs packed until a chunk passes
+    `min_len`.
+    """
+    sections = heading_sections(text)
+    if sections:
+        return [(s, e) for s, e in sections if e - s > min_len]
+
+    # Paragraphs are packed until the buffer (text[buf_start:cut] plus a
+    # trailing separator in the original) passes min_len, so a chunk can only
+    # end at the first paragraph break at or after buf_start + min_len - 1.
+    spans: List[Span] = []
+    sep = len(PARA_SEP)
+    buf_start, n = 0, len(text)
+    while True:
+        cut = _next_break(text, buf_start, max(buf_start, buf_start + min_len - sep + 1), n)
+        if cut < 0:
+            spans.append(strip_span(text, buf_start, n))
+            return spans
+        spans.append(strip_span(text, buf_start, cut))
+        buf_start = cut + sep
+
+
+def section_based_chunker(text: str, min_len: int = 200) -> List[str]:
+    return [text[s:e] for s, e in section_spans(text, min_len)]
+
+
+def overlap_prefix(prev: str, overlap_sentences: int) -> str:
+    """The last `overlap_sentences` '.'-separated pieces of `prev`, or all of it if it has fewer."""
+    if overlap_sentences <= 0:
+        return prev
+    cut = len(prev)
+    for _ in range(overlap_sentences):
+        cut = prev.rfind('.', 0, cut)
+        if cut < 0:
+            return prev
+    return prev[cut + 1:]
+
+
+def add_overlap(chunks: List[str], overlap_sentences: int = 2) -> List[str]:
+    """Prefixes each chunk with the tail sentences of the previous one."""
+    if not chunks:
+        return []
+    out = [chunks[0]]
+    for prev, chunk in zip(chunks, chunks[1:]):
+        out.append(f"{overlap_prefix(prev, overlap_sentences)}\n{chunk}".strip())
+    return out
+
+
+def table_spans(text: str, start: int, end: int) -> Iterator[Span]:
+    """
+    Same matches as `TABLE_RE.finditer(text, start, end)`.  A table can only
+    start at a '|', so candidates are found with str.find and the regex is
+    only run there, instead of being tried at every offset.
+    """
+    pos = text.find('|', start, end)
+    while pos >= 0:
+        m = TABLE_RE.match(text, pos, end)
+        if m is None:
+            # No newline before `end`: no later '|' can start a table either.
+            return
+        yield m.start(), m.end()
+        pos = text.find('|', m.end(), end)
+
+
+def _section_parts(text: str, start: int, end: int) -> List[Span]:
+    """Paragraph spans of one section, with each table kept as a single stripped part."""
+    parts: List[Span] = []
+    last_end = start
+    for t_start, t_end in table_spans(text, start, end):
+        if t_start > last_end:
+            s, e = strip_span(text, last_end, t_start)
+            if e > s:
+                parts.extend(split_spans(text, s, e))
+        s, e = strip_span(text, t_start, t_end)
+        if e > s:
+            parts.append((s, e))
+        last_end = t_end
+    if last_end < end:
+        s, e = strip_span(text, last_end, end)
+        if e > s:
+            parts.extend(split_spans(text, s, e))
+    return parts
+
+
+def _join(text: str, spans: List[Span], sep: str = PARA_SEP) -> str:
+    if len(spans) == 1:
+        s, e = spans[0]
+        return text[s:e]
+    return sep.join([text[s:e] for s, e in spans])
+
+
+def smart_chunker(text: str, max_chars: int = 1500, min_chars: int = 300) -> List[str]:
+    """
+    Hybrid chunker that:
+    - Splits on section headings if present
+    - Preserves tables and images as atomic blocks
+    - Avoids breaking up lists and code blocks
+    - Merges smaller units into larger chunks
+    """
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+    sections = heading_sections(text) or [(0, len(text))]
+
+    # Pack parts into chunks under max_chars.  As in the original, the length
+    # check ignores the separator, and empty parts only count once the
+    # buffer is non-empty.
+    chunks: List[str] = []
+    for sec_start, sec_end in sections:
+        buf: List[Span] = []
+        buf_len = 0
+        for s, e in _section_parts(text, sec_start, sec_end):
+            n = e - s
+            if buf_len + n < max_chars:
+                if buf_len:
+                    buf.append((s, e))
+                    buf_len += len(PARA_SEP) + n
+                elif n:
+                    buf, buf_len = [(s, e)], n
+            else:
+                if buf_len:
+                    chunks.append(_join(text, buf).strip())
+                buf, buf_len = [(s, e)], n
+        if buf_len:
+            chunks.append(_join(text, buf).strip())
+
+    # Merge runs of chunks shorter than min_chars.
+    final_chunks: List[str] = []
+    small: List[str] = []
+    small_len = 0
+    for chunk in chunks:
+        if len(chunk) < min_chars:
+            small.append(chunk)
+            small_len += len(PARA_SEP) + len(chunk)
+            if small_len > min_chars:
+                final_chunks.append(PARA_SEP.join(small).strip())
+                small, small_len = [], 0
+        else:
+            if small:
+                final_chunks.append(PARA_SEP.join(small).strip())
+                small, small_len = [], 0
+            final_chunks.append(chunk)
+    if small:
+        final_chunks.append(PARA_SEP.join(small).strip())
+    return final_chunks
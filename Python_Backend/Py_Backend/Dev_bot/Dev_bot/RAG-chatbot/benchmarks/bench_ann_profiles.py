@@ -0,0 +1,123 @@
+"""
+Recall / latency sweep of the ANN index profiles in
+`RAG_Model.VectorDb.index_profiles` against brute-force ground truth.
+
+Each profile is built on a scratch Milvus collection holding the same chunk
+embeddings; every search parameter in the profile's sweep is then measured
+with single-query searches.  Reports recall@k, p50/p99 latency and the
+estimated index memory.  Run from the RAG-chatbot directory:
+
+    python -m benchmarks.bench_ann_profiles --limit 100000 --queries 500
+    python -m benchmarks.bench_ann_profiles --npy embeddings.npy --profiles hnsw,ivf_sq8
+"""
+import argparse
+import time
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+
+from RAG_Model.VectorDb.connectMilvus import connect_collection
+from RAG_Model.VectorDb.index_profiles import INDEX_PROFILES
+from RAG_Model.VectorDb.vector_store import COLLECTION_NAME
+
+
+def load_embeddings(args) -> np.ndarray:
+    if args.npy:
+        return np.load(args.npy).astype(np.float32)
+    source = connect_collection(args.collection)
+    vecs = []
+    if hasattr(source, "query_iterator"):
+        it = source.query_iterator(batch_size=1000, expr="", output_fields=["embedding"])
+        try:
+            while len(vecs) < args.limit:
+                batch = it.next()
+                if not batch:
+                    break
+                vecs.extend(r["embedding"] for r in batch)
+        finally:
+            it.close()
+    else:
+        vecs = [r["embedding"] for r in source.query(expr="", output_fields=["embedding"], limit=args.limit)]
+    return np.asarray(vecs[: args.limit], dtype=np.float32)
+
+
+def ground_truth(base: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    out = []
+    for start in range(0, len(queries), 256):
+        sims = queries[start:start + 256] @ base.T
+        out.append(np.argsort(-sims, axis=1)[:, :k])
+    return np.vstack(out)
+
+
+def build_scratch(profile, base: np.ndarray) -> Collection:
+    name = f"bench_ann_{profile.name}"
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    schema = CollectionSchema([
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=base.shape[1]),
+    ])
+    coll = Collection(name=name, schema=schema)
+    for start in range(0, len(base), 10000):
+        stop = min(start + 10000, len(base))
+        coll.insert([list(range(start, stop)), base[start:stop].tolist()])
+    coll.flush()
+    coll.create_index(field_name="embedding", index_params=profile.index_params())
+    utility.wait_for_index_building_complete(name)
+    coll.load()
+    return coll
+
+
+def measure(coll, profile, queries, truth, k, overrides):
+    param = profile.search_param(**overrides)
+    latencies, hits = [], 0
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        res = coll.search(data=[q.tolist()], anns_field="embedding", param=param, limit=k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits += len({h.id for h in res[0]} & set(expected.tolist()))
+    lat = np.asarray(latencies)
+    return hits / truth.size, float(np.percentile(lat, 50)), float(np.percentile(lat, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="collection to read chunk embeddings from")
+    parser.add_argument("--npy", help="use an (N, D) .npy file of embeddings instead")
+    parser.add_argument("--limit", type=int, default=100000, help="max embeddings to index")
+    parser.add_argument("--queries", type=int, default=500, help="held-out query vectors")
+    parser.add_argument("--k", type=int, default=10, help="recall@k")
+    parser.add_argument("--profiles", default=",".join(INDEX_PROFILES), help="comma-separated profile names")
+    parser.add_argument("--keep", action="store_true", help="don't drop the scratch collections")
+    args = parser.parse_args()
+
+    data = load_embeddings(args)
+    data /= np.linalg.norm(data, axis=1, keepdims=True) + 1e-12
+    rng = np.random.default_rng(0)
+    perm = rng.permutation(len(data))
+    queries, base = data[perm[: args.queries]], data[perm[args.queries:]]
+    truth = ground_truth(base, queries, args.k)
+    print(f"{len(base)} vectors x {base.shape[1]} dims, {len(queries)} queries, recall@{args.k}\n")
+    print(f"{'profile':>9} {'index':>9} {'search':>12} {f'recall@{args.k}':>10} {'p50_ms':>8} {'p99_ms':>8} {'build_s':>8} {'mem_MB':>8}")
+
+    connect_collection(args.collection)
+    for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        profile = INDEX_PROFILES[name]
+        t0 = time.perf_counter()
+        coll = build_scratch(profile, base)
+        build_s = time.perf_counter() - t0
+        mem_mb = profile.estimate_memory_bytes(len(base), base.shape[1]) / 2 ** 20
+        try:
+            sweep = [{key: v} for key, values in profile.sweep.items() for v in values] or [{}]
+            for overrides in sweep:
+                recall, p50, p99 = measure(coll, profile, queries, truth, args.k, overrides)
+                label = ",".join(f"{k}={v}" for k, v in overrides.items()) or "-"
+                print(f"{name:>9} {profile.index_type:>9} {label:>12} {recall:>10.4f} {p50:>8.2f} {p99:>8.2f} {build_s:>8.1f} {mem_mb:>8.1f}")
+        finally:
+            if not args.keep:
+                utility.drop_collection(coll.name)
+    print("\nmem_MB is an estimate from the index layout, not a server measurement.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Chunks/s vs. cores for ingestion embedding: the current path (one process,
+encode(batch_size=32) in chunk order, N intra-op threads) against the bulk
+engine (length-bucketed batches over N worker processes x 1 thread, or any
+--threads-per-worker).
+
+The corpus is 10k chunks with the length spread ingestion produces (a few
+characters up to well over 1,500), or lines from --texts.  Worker start-up
+(model load) is reported separately and excluded from chunks/s, since the
+pool persists across documents.  Run from the RAG-chatbot directory:
+
+    python -m benchmarks.bench_bulk_embedder
+    python -m benchmarks.bench_bulk_embedder --cores 1,2,4,8 --chunks 10000 --backend onnx
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from RAG_Model.AiClient import load_embedder
+from RAG_Model.logic.bulk_embedder import BulkEmbedder, padding_efficiency, plan_batches
+
+WORDS = ("pump valve pressure seal motor bearing warranty inspect replace torque filter inlet outlet controller "
+         "reset error voltage current safety isolate maintenance schedule lubricate table figure section note").split()
+
+
+def corpus(args):
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8", errors="ignore") as f:
+            return [line.strip() for line in f if line.strip()][: args.chunks]
+    rng = np.random.default_rng(0)
+    # Log-normal character lengths: many short headings / table rows, a long
+    # tail of 1,500+ character paragraphs.
+    chars = np.clip(rng.lognormal(6.2, 0.9, args.chunks), 5, 4000).astype(int)
+    out = []
+    for n in chars:
+        words = rng.choice(WORDS, size=max(1, n // 7))
+        out.append(" ".join(words)[:n])
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--texts", help="file with one chunk per line instead of the synthetic corpus")
+    parser.add_argument("--cores", default=None, help="core counts to test (default: 1,2,4,... up to cpu_count)")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--backend", default=None, help="torch / onnx / onnx-int8 (default: EMBED_BACKEND)")
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    from RAG_Model.AiClient import EMBED_BACKEND
+    backend = args.backend or EMBED_BACKEND
+    cpu = os.cpu_count() or 1
+    cores = [int(c) for c in args.cores.split(",")] if args.cores else \
+        sorted({c for c in (1, 2, 4, 8, 16, 32, 64) if c <= cpu} | {cpu})
+    texts = corpus(args)
+    chars = np.array([len(t) for t in texts])
+    print(f"{len(texts)} chunks, {chars.min()}-{chars.max()} chars (median {int(np.median(chars))}), backend {backend}\n")
+
+    baseline = None
+    if not args.skip_baseline:
+        model = load_embedder(backend)
+        model.encode(texts[:64], batch_size=32, normalize_embeddings=True)
+    print(f"{'cores':>5} {'mode':>22} {'startup_s':>9} {'chunks/s':>9} {'vs_base_1':>9} {'pad_eff':>7}")
+    for c in cores:
+        if not args.skip_baseline:
+            if backend == "torch":
+                import torch
+                torch.set_num_threads(c)
+                threads_note = f"1 proc x {c} thr"
+            else:
+                threads_note = "1 proc (ort default)"
+            t0 = time.perf_counter()
+            model.encode(texts, batch_size=32, normalize_embeddings=True)
+            rate = len(texts) / (time.perf_counter() - t0)
+            baseline = baseline or rate
+            print(f"{c:>5} {threads_note:>22} {'-':>9} {rate:>9.1f} {rate / baseline:>8.2f}x {'-':>7}")
+
+        workers = max(1, c // args.threads_per_worker)
+        bulk = BulkEmbedder(workers, threads=args.threads_per_worker, backend=backend)
+        t0 = time.perf_counter()
+        bulk.encode(texts[:workers * 8], normalize_embeddings=True)  # start + warm every worker
+        startup = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        bulk.encode(texts, normalize_embeddings=True)
+        rate = len(texts) / (time.perf_counter() - t0)
+        bulk.close()
+        base = baseline or rate
+        baseline = baseline or rate
+        eff = bulk.last_stats["padding_efficiency"]
+        print(f"{c:>5} {f'{workers} proc x {args.threads_per_worker} thr':>22} {startup:>9.1f} {rate:>9.1f} "
+              f"{rate / base:>8.2f}x {eff:>7.2f}")
+
+    lengths = BulkEmbedder(1).token_lengths(texts)
+    naive = [np.arange(i, min(i + 32, len(texts))) for i in range(0, len(texts), 32)]
+    print(f"\npadding efficiency: in-order batches of 32 {padding_efficiency(lengths, naive):.2f}, "
+          f"length-bucketed {padding_efficiency(lengths, plan_batches(lengths)):.2f}")
+
+
+if __name__ == "__main__":
+    main()
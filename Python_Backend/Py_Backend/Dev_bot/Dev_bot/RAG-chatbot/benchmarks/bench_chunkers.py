@@ -0,0 +1,203 @@
+"""
+Span-based chunkers (logic/span_chunker.py) vs. the original buffer-growing
+implementations, kept verbatim below as the reference: section_based_chunker
++ add_overlap (the ingestion path) and smart_chunker.
+
+Each size is run on a synthetic page with headings, paragraphs and '|'
+tables and on the same text without headings (paragraph fallback).  Outputs
+must be identical; the run fails otherwise.  Run from the RAG-chatbot
+directory:
+
+    python -m benchmarks.bench_chunkers
+    python -m benchmarks.bench_chunkers --sizes-mb 1,10,100 --reference-max-mb 10
+"""
+import argparse
+import re
+import sys
+import time
+
+import numpy as np
+
+from RAG_Model.logic import span_chunker
+
+
+# --- reference implementations (as before the span engine) ---
+
+def ref_section_based_chunker(text, min_len=200):
+    pattern = re.compile(r'^(?:[A-Z][A-Z \d\.\-:]{5,}|Section\s+\d+|[IVXLC]+\.\s)', re.MULTILINE)
+    matches = list(pattern.finditer(text))
+    chunks = []
+    if not matches:
+        paras = text.split('\n\n')
+        buf = ''
+        for para in paras:
+            buf += para + '\n\n'
+            if len(buf) > min_len:
+                chunks.append(buf.strip())
+                buf = ''
+        if buf:
+            chunks.append(buf.strip())
+    else:
+        for i, m in enumerate(matches):
+            start = m.start()
+            end = matches[i+1].start() if i+1 < len(matches) else len(text)
+            chunk = text[start:end].strip()
+            if len(chunk) > min_len:
+                chunks.append(chunk)
+    return chunks
+
+
+def ref_add_overlap(chunks, overlap_sentences=2):
+    overlapped_chunks = []
+    for i, chunk in enumerate(chunks):
+        if i > 0:
+            prev = chunks[i-1].split('.')
+            prefix = '.'.join(prev[-overlap_sentences:]) if len(prev) > overlap_sentences else chunks[i-1]
+            overlapped_chunks.append((prefix + '\n' + chunk).strip())
+        else:
+            overlapped_chunks.append(chunk)
+    return overlapped_chunks
+
+
+def ref_smart_chunker(text, max_chars=1500, min_chars=300):
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    heading_pat = re.compile(r'^(?:[A-Z][A-Z \d\.\-:]{5,}|Section\s+\d+|[IVXLC]+\.\s)', re.MULTILINE)
+    heading_matches = list(heading_pat.finditer(text))
+    section_spans = []
+    if heading_matches:
+        for i, m in enumerate(heading_matches):
+            start = m.start()
+            end = heading_matches[i+1].start() if i+1 < len(heading_matches) else len(text)
+            section_spans.append(text[start:end].strip())
+    else:
+        section_spans = [text]
+    chunks = []
+    for section in section_spans:
+        table_pat = re.compile(r'((?:\|.*\n)+)', re.MULTILINE)
+        parts = []
+        last_end = 0
+        for m in table_pat.finditer(section):
+            if m.start() > last_end:
+                before = section[last_end:m.start()].strip()
+                if before:
+                    parts.extend(before.split('\n\n'))
+            table_block = m.group(1).strip()
+            if table_block:
+                parts.append(table_block)
+            last_end = m.end()
+        if last_end < len(section):
+            after = section[last_end:].strip()
+            if after:
+                parts.extend(after.split('\n\n'))
+        buf = ""
+        for part in parts:
+            if len(buf) + len(part) < max_chars:
+                buf += (('\n\n' if buf else '') + part)
+            else:
+                if buf:
+                    chunks.append(buf.strip())
+                buf = part
+        if buf:
+            chunks.append(buf.strip())
+    final_chunks = []
+    buf = ""
+    for chunk in chunks:
+        if len(chunk) < min_chars:
+            buf += ('\n\n' + chunk)
+            if len(buf) > min_chars:
+                final_chunks.append(buf.strip())
+                buf = ""
+        else:
+            if buf:
+                final_chunks.append(buf.strip())
+                buf = ""
+            final_chunks.append(chunk)
+    if buf:
+        final_chunks.append(buf.strip())
+    return final_chunks
+
+
+# --- synthetic pages ---
+
+WORDS = ("pump valve pressure seal motor bearing warranty inspect replace torque filter inlet outlet controller "
+         "reset error voltage current safety isolate maintenance schedule lubricate").split()
+
+
+def synthetic_page(size: int, headings: bool, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    out, total, n = [], 0, 0
+    while total < size:
+        kind = rng.random()
+        if headings and kind < 0.05:
+            block = f"SECTION {n} MAINTENANCE\n" if rng.random() < 0.5 else f"Section {n} overview\n"
+        elif kind < 0.12:
+            rows = int(rng.integers(2, 12))
+            block = "".join(f"| {rng.choice(WORDS)} | {int(rng.integers(1, 999))} |\n" for _ in range(rows))
+        elif kind < 0.15:
+            block = "\n \t\n\n"
+        else:
+            sentences = int(rng.integers(1, 8))
+            block = " ".join(
+                " ".join(rng.choice(WORDS, size=int(rng.integers(3, 18)))).capitalize() + "."
+                for _ in range(sentences)
+            ) + ("\n\n" if rng.random() < 0.8 else "\n")
+        out.append(block)
+        total += len(block)
+        n += 1
+    return "".join(out)[:size]
+
+
+def ingest_path(chunker, overlap, text):
+    # chunk_page: chunk, drop empty / duplicate chunks, add overlap.
+    seen, cleaned = set(), []
+    for c in chunker(text):
+        c = c.strip()
+        if c and c not in seen:
+            seen.add(c)
+            cleaned.append(c)
+    return overlap(cleaned, 2)
+
+
+CASES = (
+    ("section+overlap",
+     lambda t: ingest_path(ref_section_based_chunker, ref_add_overlap, t),
+     lambda t: ingest_path(span_chunker.section_based_chunker, span_chunker.add_overlap, t)),
+    ("smart_chunker", ref_smart_chunker, span_chunker.smart_chunker),
+)
+
+
+def timed(fn, text):
+    t0 = time.perf_counter()
+    out = fn(text)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", default="1,10,100")
+    parser.add_argument("--reference-max-mb", type=float, default=100,
+                        help="skip the reference implementations above this size")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'size_mb':>7} {'headings':>8} {'case':>16} {'chunks':>8} {'ref_s':>8} {'span_s':>8} {'MB/s':>8} "
+          f"{'speedup':>8} {'equal':>6}")
+    for mb in (float(s) for s in args.sizes_mb.split(",")):
+        for headings in (True, False):
+            text = synthetic_page(int(mb * 1_000_000), headings)
+            for name, ref, new in CASES:
+                out, span_s = timed(new, text)
+                if mb <= args.reference_max_mb:
+                    expected, ref_s = timed(ref, text)
+                    equal = expected == out
+                    failed |= not equal
+                    ref_col, speed_col, eq_col = f"{ref_s:8.2f}", f"{ref_s / span_s:7.2f}x", "yes" if equal else "NO"
+                else:
+                    ref_col, speed_col, eq_col = f"{'-':>8}", f"{'-':>8}", "-"
+                print(f"{mb:>7g} {str(headings):>8} {name:>16} {len(out):>8} {ref_col} {span_s:>8.2f} "
+                      f"{mb / span_s:>8.1f} {speed_col} {eq_col:>6}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
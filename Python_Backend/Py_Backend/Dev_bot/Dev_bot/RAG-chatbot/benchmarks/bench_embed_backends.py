@@ -0,0 +1,90 @@
+"""
+Sentences/s and cold-start time of the embedding backends selectable with
+EMBED_BACKEND: torch (SentenceTransformer), onnx and onnx-int8.
+
+Cold start is measured in a fresh interpreter per backend (imports + model
+load + first encode), so it is what a new worker actually pays; the ONNX
+export is done up front and not counted.  Throughput is measured on
+--sentences synthetic chunk-sized texts in batches of --batch-size.  Run
+from the RAG-chatbot directory:
+
+    python -m benchmarks.bench_embed_backends
+    python -m benchmarks.bench_embed_backends --sentences 5000 --threads 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from RAG_Model.AiClient import EMBED_MODEL_REPO
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def load(backend: str):
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(EMBED_MODEL_REPO)
+    from RAG_Model.logic.onnx_embedder import load_onnx_embedder
+    return load_onnx_embedder(EMBED_MODEL_REPO, quantized=backend == "onnx-int8")
+
+
+def cold_start(backend: str) -> float:
+    code = (
+        "import time; t0 = time.perf_counter();"
+        "from benchmarks.bench_embed_backends import load;"
+        f"load({backend!r}).encode(['cold start'], normalize_embeddings=True);"
+        "print(time.perf_counter() - t0)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def synthetic_texts(n: int, words: int = 120):
+    rng = np.random.default_rng(0)
+    vocab = ("pump valve pressure seal motor bearing warranty inspect replace torque filter inlet outlet "
+             "controller reset error voltage current safety isolate maintenance schedule lubricate").split()
+    # Chunk-like lengths: most around `words`, some short.
+    lengths = np.clip(rng.normal(words, words / 3, n).astype(int), 5, 400)
+    return [" ".join(rng.choice(vocab, size=k)) for k in lengths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads for both runtimes (0 = default)")
+    parser.add_argument("--no-cold-start", action="store_true")
+    args = parser.parse_args()
+
+    if args.threads:
+        os.environ["ONNX_THREADS"] = str(args.threads)
+        import torch
+        torch.set_num_threads(args.threads)
+
+    backends = [b for b in args.backends.split(",") if b]
+    if any(b != "torch" for b in backends):
+        from RAG_Model.logic.onnx_embedder import export_onnx
+        export_onnx(EMBED_MODEL_REPO, quantize="onnx-int8" in backends)
+
+    texts = synthetic_texts(args.sentences)
+    print(f"{len(texts)} texts (~120 words), batch {args.batch_size}\n")
+    print(f"{'backend':>10} {'cold_s':>8} {'sent/s':>9} {'speedup':>8}")
+    base = None
+    for backend in backends:
+        cold = float("nan") if args.no_cold_start else cold_start(backend)
+        model = load(backend)
+        model.encode(texts[:args.batch_size], batch_size=args.batch_size, normalize_embeddings=True)
+        t0 = time.perf_counter()
+        model.encode(texts, batch_size=args.batch_size, normalize_embeddings=True)
+        rate = len(texts) / (time.perf_counter() - t0)
+        base = base or rate
+        print(f"{backend:>10} {cold:>8.2f} {rate:>9.1f} {rate / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Query-embedding throughput with and without the micro-batching embedding
+service (RAG_Model.logic.embedding_service).
+
+For each concurrency level, that many threads embed single queries in a
+loop: "direct" calls the model's encode() on a batch of one per caller,
+"batched" goes through EmbeddingService.  Reports queries/s, p50/p99
+latency, and the service's average batch size and queue wait.  With
+--ingest a background thread keeps feeding ingestion-priority chunks, to
+show queries overtaking them.  Run from the RAG-chatbot directory:
+
+    python -m benchmarks.bench_embedding_service
+    python -m benchmarks.bench_embedding_service --concurrency 1,8,32,64 --seconds 10 --ingest
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from RAG_Model.AiClient import EMBED_MODEL_REPO
+from RAG_Model.logic import metrics
+from RAG_Model.logic.embedding_service import EmbeddingService, PRIORITY_INGEST, PRIORITY_QUERY
+
+QUERIES = [
+    "What is the warranty period for the pump?",
+    "How do I reset the controller to factory settings?",
+    "List the safety precautions before maintenance",
+    "Which error code means low pressure?",
+    "torque spec for M8 bolts",
+]
+
+
+def drive(encode, concurrency, seconds):
+    latencies = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker(i):
+        local = []
+        n = i
+        while time.perf_counter() < stop:
+            q = f"{QUERIES[n % len(QUERIES)]} #{n}"  # distinct text per call
+            t0 = time.perf_counter()
+            encode([q])
+            local.append(time.perf_counter() - t0)
+            n += concurrency
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    ms = np.array(latencies) * 1000
+    return len(latencies) / elapsed, np.percentile(ms, 50), np.percentile(ms, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16,64", help="concurrent callers to test")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration per configuration")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--ingest", action="store_true", help="background ingestion load through the service")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(EMBED_MODEL_REPO)
+    model.encode(QUERIES, normalize_embeddings=True)  # warm up
+
+    service = EmbeddingService(model, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    query_client = service.client(PRIORITY_QUERY)
+    ingest_client = service.client(PRIORITY_INGEST)
+    batch_hist = metrics.histogram("rag_embed_batch_size", "")
+    wait_hist = metrics.histogram("rag_embed_queue_wait_seconds", "", ("priority",))
+
+    stop_ingest = threading.Event()
+    ingested = [0]
+
+    def ingest_load():
+        chunk = " ".join(QUERIES * 20)
+        while not stop_ingest.is_set():
+            ingest_client.encode([chunk] * 256, normalize_embeddings=True)
+            ingested[0] += 256
+
+    print(f"{'mode':>8} {'callers':>7} {'q/s':>8} {'p50_ms':>8} {'p99_ms':>8} {'avg_batch':>9} {'wait_p50':>9}")
+    for c in [int(x) for x in args.concurrency.split(",") if x.strip()]:
+        qps, p50, p99 = drive(lambda t: model.encode(t, normalize_embeddings=True), c, args.seconds)
+        print(f"{'direct':>8} {c:>7} {qps:>8.1f} {p50:>8.1f} {p99:>8.1f} {'-':>9} {'-':>9}")
+
+        before = batch_hist.snapshot()
+        ingest_thread = None
+        if args.ingest:
+            stop_ingest.clear()
+            ingest_thread = threading.Thread(target=ingest_load, daemon=True)
+            ingest_thread.start()
+        qps, p50, p99 = drive(lambda t: query_client.encode(t, normalize_embeddings=True), c, args.seconds)
+        if ingest_thread is not None:
+            stop_ingest.set()
+            ingest_thread.join()
+        after = batch_hist.snapshot()
+        batches = after["count"] - before["count"]
+        avg = (after["sum"] - before["sum"]) / batches if batches else 0
+        wait = wait_hist.snapshot(priority="query")["p50"]
+        print(f"{'batched':>8} {c:>7} {qps:>8.1f} {p50:>8.1f} {p99:>8.1f} {avg:>9.1f} {wait * 1000 if wait else 0:>8.1f}ms")
+
+    if args.ingest:
+        print(f"\ningestion chunks embedded alongside: {ingested[0]}")
+    service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Latency / success rate of the async LLM gateway against the local stub
+server (benchmarks.llm_stub_server), with and without hedging.
+
+The stub injects a slow tail and transient failures; each configuration
+fires --requests calls with --concurrency in flight and reports p50 / p99
+latency, failures and the hedge / fallback counters.  Run from the
+RAG-chatbot directory:
+
+    python -m benchmarks.bench_llm_gateway
+    python -m benchmarks.bench_llm_gateway --tail 0.05:3 --error-rate 0.1 --hedge-after 0.5,1.0
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from RAG_Model.llm_gateway import LLMGateway, LLMError
+from RAG_Model.logic import metrics
+from benchmarks.llm_stub_server import start
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+async def run(gateway, requests, concurrency, timeout):
+    sem = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await gateway.chat(MESSAGES, timeout=timeout)
+                latencies.append(time.perf_counter() - t0)
+            except LLMError:
+                failures += 1
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, failures
+
+
+async def main_async(args):
+    server = start(latency=args.latency, tail=args.tail, error_rate=args.error_rate,
+                   error_status=args.error_status, bad_models=["stub/unavailable"])
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    models = ["stub/unavailable", "stub/primary"] if args.fallback else ["stub/primary"]
+    print(f"stub at {base_url}: latency {args.latency}s, tail {args.tail or '-'}, "
+          f"errors {args.error_rate:.0%} ({args.error_status}), models {models}\n")
+
+    hedges = metrics.counter("rag_llm_hedges_total", "")
+    print(f"{'hedge_after':>11} {'p50_ms':>8} {'p99_ms':>8} {'max_ms':>8} {'failed':>7} {'hedges':>7} {'won':>5} {'upstream':>9}")
+    for hedge in [0.0] + [float(h) for h in args.hedge_after.split(",") if h.strip()]:
+        gateway = LLMGateway(api_key="stub", base_url=base_url, models=models,
+                             timeout=args.timeout, hedge_after=hedge)
+        started0, won0 = hedges.value(result="started"), hedges.value(result="won")
+        sent0 = server.stub_config.requests
+        latencies, failures = await run(gateway, args.requests, args.concurrency, args.timeout)
+        await gateway.aclose()
+        ms = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+        print(f"{hedge or 'off':>11} {np.percentile(ms, 50):>8.0f} {np.percentile(ms, 99):>8.0f} {ms.max():>8.0f} "
+              f"{failures:>7} {hedges.value(result='started') - started0:>7.0f} {hedges.value(result='won') - won0:>5.0f} "
+              f"{server.stub_config.requests - sent0:>9}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub reply latency (s)")
+    parser.add_argument("--tail", default="0.05:2.0", help="stub slow tail, probability:seconds")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-call deadline (s)")
+    parser.add_argument("--hedge-after", default="0.3", help="hedge thresholds to compare against no hedging")
+    parser.add_argument("--fallback", action="store_true", help="list an unavailable model first")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
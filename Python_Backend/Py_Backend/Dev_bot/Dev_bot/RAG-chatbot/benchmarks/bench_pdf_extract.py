@@ -0,0 +1,45 @@
+"""
+Scaling benchmark for `extract_text_from_pdf` across worker counts.
+
+Run from the RAG-chatbot directory:
+
+    python -m benchmarks.bench_pdf_extract path/to/manual.pdf --workers 1,2,4,8
+"""
+import argparse
+import os
+import time
+
+from RAG_Model.logic.extract_text import extract_text_from_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", help="PDF file to extract")
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count()}", help="comma-separated worker counts")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per worker count (best is reported)")
+    parser.add_argument("--no-ocr", action="store_true", help="skip OCR of empty pages")
+    args = parser.parse_args()
+
+    counts = sorted({int(w) for w in args.workers.split(",") if w.strip()})
+    print(f"{'workers':>8} {'pages':>6} {'best_s':>8} {'pages/s':>9} {'speedup':>8}")
+
+    baseline = None
+    reference = None
+    for workers in counts:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            pages = extract_text_from_pdf(args.pdf, ocr=not args.no_ocr, workers=workers)
+            best = min(best, time.perf_counter() - t0)
+
+        if reference is None:
+            reference = pages
+        elif pages != reference:
+            print(f"!! output with {workers} workers differs from {counts[0]} workers")
+
+        baseline = baseline or best
+        print(f"{workers:>8} {len(pages):>6} {best:>8.2f} {len(pages) / best:>9.1f} {baseline / best:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
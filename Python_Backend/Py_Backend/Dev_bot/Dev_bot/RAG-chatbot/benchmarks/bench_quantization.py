@@ -0,0 +1,96 @@
+"""
+Memory saved vs. recall retained for the embedded store's quantized storage
+modes (VECTOR_QUANTIZATION=int8 / binary) against full float32 search.
+
+Each mode indexes the same embeddings in a scratch EmbeddedCollection; recall
+is measured against the exact float32 top-k for held-out query vectors, over
+a sweep of over-fetch factors.  Run from the RAG-chatbot directory:
+
+    python -m benchmarks.bench_quantization --npy embeddings.npy
+    python -m benchmarks.bench_quantization --from-collection rag_chunks1 --limit 200000
+    python -m benchmarks.bench_quantization --synthetic 100000
+
+For Milvus' server-side IVF_SQ8 / IVF_PQ profiles see bench_ann_profiles.
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from RAG_Model.VectorDb.embedded_store import EmbeddedCollection
+from RAG_Model.VectorDb.quantization import memory_bytes
+
+
+def load_embeddings(args) -> np.ndarray:
+    if args.npy:
+        return np.load(args.npy).astype(np.float32)
+    if args.from_collection:
+        from benchmarks.bench_ann_profiles import load_embeddings as from_milvus
+        args.collection, args.npy = args.from_collection, None
+        return from_milvus(args)
+    # Clustered random vectors, roughly the shape of sentence embeddings.
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(8, args.synthetic // 500), args.dim))
+    labels = rng.integers(0, len(centers), args.synthetic)
+    return (centers[labels] + 0.7 * rng.normal(size=(args.synthetic, args.dim))).astype(np.float32)
+
+
+def columns(base: np.ndarray):
+    n = len(base)
+    ids = [str(i) for i in range(n)]
+    return [ids, base, [""] * n, ["bench"] * n, ["bench"] * n, list(range(n)), [0] * n]
+
+
+def run(coll, queries, k):
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        hits = coll.search([q], limit=k)[0]
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found.append({int(h.id) for h in hits})
+    return found, float(np.percentile(latencies, 50))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--npy", help="(N, D) .npy file of chunk embeddings")
+    parser.add_argument("--from-collection", help="read embeddings from this Milvus collection")
+    parser.add_argument("--limit", type=int, default=200000, help="max embeddings read from Milvus")
+    parser.add_argument("--synthetic", type=int, default=50000, help="synthetic vectors when no source is given")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=300, help="held-out query vectors")
+    parser.add_argument("--k", type=int, default=5, help="recall@k")
+    parser.add_argument("--overfetch", default="2,4,8,20", help="over-fetch factors to sweep")
+    args = parser.parse_args()
+
+    data = load_embeddings(args)
+    data /= np.linalg.norm(data, axis=1, keepdims=True) + 1e-12
+    perm = np.random.default_rng(1).permutation(len(data))
+    queries, base = data[perm[: args.queries]], data[perm[args.queries:]]
+    n, dim = base.shape
+    print(f"{n} vectors x {dim} dims, {len(queries)} queries, recall@{args.k}\n")
+
+    with tempfile.TemporaryDirectory() as root:
+        ref = EmbeddedCollection("float32", root=root, quantization="none")
+        ref.insert(columns(base))
+        truth, ref_p50 = run(ref, queries, args.k)
+        full = memory_bytes("none", n, dim)
+
+        print(f"{'mode':>8} {'overfetch':>9} {'hot_MB':>8} {'saved':>7} {f'recall@{args.k}':>9} {'p50_ms':>8}")
+        print(f"{'float32':>8} {'-':>9} {full / 2 ** 20:>8.1f} {'0%':>7} {1.0:>9.4f} {ref_p50:>8.2f}")
+        for mode in ("int8", "binary"):
+            coll = EmbeddedCollection(mode, root=root, quantization=mode)
+            coll.insert(columns(base))
+            hot = memory_bytes(mode, n, dim)
+            for factor in [int(f) for f in args.overfetch.split(",") if f.strip()]:
+                coll.overfetch = factor
+                found, p50 = run(coll, queries, args.k)
+                recall = np.mean([len(f & t) / args.k for f, t in zip(found, truth)])
+                print(f"{mode:>8} {factor:>9} {hot / 2 ** 20:>8.1f} {1 - hot / full:>7.0%} {recall:>9.4f} {p50:>8.2f}")
+
+    print("\nhot_MB is what the first pass scans; float vectors are only read for re-ranked candidates.")
+
+
+if __name__ == "__main__":
+    main()
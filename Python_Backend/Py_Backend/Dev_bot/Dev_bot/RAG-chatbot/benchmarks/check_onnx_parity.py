@@ -0,0 +1,77 @@
+"""
+Parity check: ONNX (fp32 and int8) embeddings vs. the PyTorch
+SentenceTransformer, by per-text cosine similarity and top-k neighbour
+agreement.  Exits non-zero when a backend falls below its threshold, so it
+can gate switching EMBED_BACKEND.  Run from the RAG-chatbot directory:
+
+    python -m benchmarks.check_onnx_parity
+    python -m benchmarks.check_onnx_parity --texts chunks.txt --limit 2000 --min-cos-int8 0.98
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from RAG_Model.AiClient import EMBED_MODEL_REPO
+from RAG_Model.logic.onnx_embedder import load_onnx_embedder
+
+SAMPLE = [
+    "What is the warranty period for the pump?",
+    "How do I reset the controller to factory settings?",
+    "Before servicing, isolate the unit from the mains supply and wait five minutes for capacitors to discharge.",
+    "Error E12 indicates low inlet pressure; check the supply valve and the inlet filter.",
+    "Tighten M8 bolts to 25 Nm in a cross pattern.",
+    "Tabelle 3: Technische Daten – Nennleistung 2,2 kW, Schutzart IP55.",
+    "x" * 3000,  # longer than the 512-token window: checks truncation matches
+    "",
+]
+
+
+def load_texts(args):
+    if not args.texts:
+        return SAMPLE
+    with open(args.texts, "r", encoding="utf-8", errors="ignore") as f:
+        texts = [line.rstrip("\n") for line in f if line.strip()]
+    return texts[: args.limit]
+
+
+def topk_agreement(ref: np.ndarray, other: np.ndarray, k: int) -> float:
+    """Mean overlap of each text's k nearest neighbours under both embeddings."""
+    if len(ref) <= k:
+        return 1.0
+    a = np.argsort(-(ref @ ref.T), axis=1)[:, 1:k + 1]
+    b = np.argsort(-(other @ other.T), axis=1)[:, 1:k + 1]
+    return float(np.mean([len(set(x) & set(y)) / k for x, y in zip(a, b)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", help="file with one text per line (default: a built-in sample)")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5, help="neighbours compared for top-k agreement")
+    parser.add_argument("--min-cos-fp32", type=float, default=0.999)
+    parser.add_argument("--min-cos-int8", type=float, default=0.97)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    texts = load_texts(args)
+    ref = SentenceTransformer(EMBED_MODEL_REPO).encode(texts, batch_size=32, normalize_embeddings=True)
+
+    failed = False
+    print(f"{len(texts)} texts, reference: torch SentenceTransformer\n")
+    print(f"{'backend':>10} {'min_cos':>9} {'p1_cos':>9} {'mean_cos':>9} {f'top{args.k}_agree':>11} {'status':>7}")
+    for name, quantized, threshold in (("onnx", False, args.min_cos_fp32), ("onnx-int8", True, args.min_cos_int8)):
+        vecs = load_onnx_embedder(EMBED_MODEL_REPO, quantized=quantized).encode(
+            texts, batch_size=32, normalize_embeddings=True
+        )
+        cos = np.sum(ref * vecs, axis=1)
+        ok = cos.min() >= threshold
+        failed |= not ok
+        print(f"{name:>10} {cos.min():>9.5f} {np.percentile(cos, 1):>9.5f} {cos.mean():>9.5f} "
+              f"{topk_agreement(ref, vecs, args.k):>11.3f} {'ok' if ok else 'FAIL':>7}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
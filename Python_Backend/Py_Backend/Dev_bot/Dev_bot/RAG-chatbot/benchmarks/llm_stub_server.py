@@ -0,0 +1,135 @@
+"""
+Local OpenAI-compatible stub for exercising the LLM gateway without
+OpenRouter.  POST /chat/completions answers with a fixed JSON-array answer
+after a configurable latency, and can inject 429 / 5xx failures or reject
+specific models (to trigger fallback).  Run from the RAG-chatbot directory:
+
+    python -m benchmarks.llm_stub_server --port 8901 --latency 0.3 --tail 0.05:3.0 --error-rate 0.1
+
+then point the backend at it:
+
+    LLM_BASE_URL=http://127.0.0.1:8901 OPENROUTER_API_KEY=stub uvicorn RAG_Model.backend:app
+
+Requests with "stream": true (the /query/stream path) are answered as SSE chunks.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = json.dumps([{
+    "name": "Stub answer",
+    "description": "Returned by benchmarks.llm_stub_server.",
+    "sources": [{"file_name": "stub.pdf", "page_no": 1}],
+}])
+
+
+class StubConfig:
+    def __init__(self, latency=0.2, tail="", error_rate=0.0, error_status=503,
+                 bad_models=(), answer=ANSWER):
+        self.latency = latency
+        # "p:seconds": with probability p the reply takes `seconds` instead.
+        p, _, slow = tail.partition(":") if tail else ("0", "", "0")
+        self.tail_p, self.tail_s = float(p), float(slow or 0)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.bad_models = set(bad_models)
+        self.answer = answer
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(cfg: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            try:
+                self._reply()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (deadline, or the losing side of a hedge)
+
+        def _reply(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with cfg.lock:
+                cfg.requests += 1
+            model = payload.get("model", "")
+
+            if model in cfg.bad_models:
+                return self._send(404, {"error": {"message": f"No endpoints found for {model}", "code": 404}})
+            delay = cfg.tail_s if random.random() < cfg.tail_p else cfg.latency
+            time.sleep(delay)
+            if random.random() < cfg.error_rate:
+                headers = {"Retry-After": "0.2"} if cfg.error_status == 429 else None
+                return self._send(cfg.error_status, {"error": {"message": "injected failure", "code": cfg.error_status}}, headers)
+
+            if payload.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for i in range(0, len(cfg.answer), 16):
+                    delta = {"choices": [{"index": 0, "delta": {"content": cfg.answer[i:i + 16]}}]}
+                    self.wfile.write(f"data: {json.dumps(delta)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+                return
+            self._send(200, {
+                "id": "stub", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": cfg.answer}}],
+            })
+
+    return Handler
+
+
+def start(port: int = 0, **config) -> ThreadingHTTPServer:
+    """Starts the stub on a daemon thread; `server.server_address` has the port."""
+    cfg = StubConfig(**config)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(cfg))
+    server.daemon_threads = True
+    server.stub_config = cfg
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.2, help="normal reply latency (s)")
+    parser.add_argument("--tail", default="", help="slow-tail injection as probability:seconds, e.g. 0.05:3")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="status for injected failures")
+    parser.add_argument("--bad-models", default="", help="comma-separated models answered with 404")
+    args = parser.parse_args()
+
+    server = start(args.port, latency=args.latency, tail=args.tail, error_rate=args.error_rate,
+                   error_status=args.error_status,
+                   bad_models=[m for m in args.bad_models.split(",") if m])
+    print(f"LLM stub listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()